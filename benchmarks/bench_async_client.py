@@ -0,0 +1,70 @@
+""" Compares the throughput of the blocking EventsService and its asynchronous counterpart
+
+Both run against the local mock server (threaded, with a simulated network latency):
+
+    $ python -m benchmarks.bench_async_client --batches 200 --latency 0.02 --workers 20
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from smartobjects.api_manager import APIManager
+from smartobjects.async_client import AsyncService
+from smartobjects.ingestion.events import EventsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def make_batch(size):
+    return [{'x_object': {'x_device_id': 'device_{}'.format(i)}, 'x_event_type': 'bench'} for i in range(size)]
+
+
+def bench_sync(api, batches, batch_size):
+    events = EventsService(api)
+    start = time.time()
+    for _ in range(batches):
+        events.send(make_batch(batch_size))
+    return time.time() - start
+
+
+def bench_async(api, batches, batch_size, workers):
+    executor = ThreadPoolExecutor(max_workers=workers)
+    events = AsyncService(EventsService(api), executor)
+    start = time.time()
+    futures = [events.send(make_batch(batch_size)) for _ in range(batches)]
+    [future.result() for future in futures]
+    elapsed = time.time() - start
+    executor.shutdown()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.02, help="simulated round trip in seconds")
+    parser.add_argument('--workers', type=int, default=10)
+    args = parser.parse_args()
+
+    server = LocalApiServer(threaded=True, latency=args.latency)
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False)
+
+        sync_elapsed = bench_sync(api, args.batches, args.batch_size)
+        server.server.backend.clear()
+        async_elapsed = bench_async(api, args.batches, args.batch_size, args.workers)
+
+        for name, elapsed in (("sync", sync_elapsed), ("async", async_elapsed)):
+            print("{:>6}: {:8.3f}s {:10.1f} requests/s {:10.1f} events/s".format(
+                name, elapsed, args.batches / elapsed, args.batches * args.batch_size / elapsed))
+        print("speedup: {:.1f}x".format(sync_elapsed / async_elapsed))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+""" Events per second when events are produced one at a time: one request per event vs BatchingEventSender
+
+Runs against the local mock server (threaded, with a simulated network latency):
+
+    $ python -m benchmarks.bench_batching_sender --events 2000 --latency 0.01
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.events import EventsService
+from smartobjects.ingestion.producer import BatchingEventSender
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def make_event(i):
+    return {'x_object': {'x_device_id': 'device_{}'.format(i % 100)}, 'x_event_type': 'bench'}
+
+
+def bench_one_by_one(events, count):
+    start = time.time()
+    for i in range(count):
+        events.send([make_event(i)])
+    return time.time() - start
+
+
+def bench_sender(events, count, linger, workers):
+    start = time.time()
+    with BatchingEventSender(events, linger=linger, workers=workers) as sender:
+        for i in range(count):
+            sender.send(make_event(i))
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.01, help="simulated round trip in seconds")
+    parser.add_argument('--linger', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    server = LocalApiServer(threaded=True, latency=args.latency)
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False)
+        events = EventsService(api)
+
+        one_by_one = bench_one_by_one(events, args.events)
+        server.server.backend.clear()
+        batched = bench_sender(events, args.events, args.linger, args.workers)
+        requests = len(server.server.backend.event_batches)
+
+        print("one request per event: {:8.3f}s {:10.0f} events/s".format(one_by_one, args.events / one_by_one))
+        print("  BatchingEventSender: {:8.3f}s {:10.0f} events/s ({} requests)".format(
+            batched, args.events / batched, requests))
+        api.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+""" Throughput of the bulk ingestion of a synthetic NDJSON dump, read through a memory map
+
+Generates the file in a temporary directory (unless --file is given) and sends it to the local mock server, which
+does not keep the events so that the memory stays flat:
+
+    $ python -m benchmarks.bench_bulk_ingestion --size-mb 2048 --concurrency 8 --latency 0.01
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.bulk import format_progress, ingest_file
+from smartobjects.ingestion.events import EventsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def generate(path, size_mb):
+    """ Writes events until the file reaches `size_mb` megabytes """
+    target = size_mb * 1024 * 1024
+    written, count = 0, 0
+    with open(path, 'wb') as f:
+        while written < target:
+            lines = []
+            for i in range(count, count + 1000):
+                lines.append(json.dumps({
+                    'event_id': str(uuid.uuid4()),
+                    'x_object': {'x_device_id': 'device_{}'.format(i % 10000)},
+                    'x_event_type': 'bench',
+                    'x_timestamp': '2017-01-01T00:00:{:02d}.000Z'.format(i % 60),
+                    'ts_number_attribute': i * 0.5,
+                    'ts_text_attribute': 'value_{}'.format(i)
+                }))
+            count += 1000
+            block = '\n'.join(lines) + '\n'
+            f.write(block)
+            written += len(block)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=2048, help="size of the generated file")
+    parser.add_argument('--file', help="existing NDJSON file to send instead of a generated one")
+    parser.add_argument('--concurrency', type=int, default=8, help="maximum number of requests in flight")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated round trip in seconds")
+    parser.add_argument('--progress-interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    directory = None
+    path = args.file
+    if path is None:
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'events.ndjson')
+        start = time.time()
+        count = generate(path, args.size_mb)
+        print("generated {:,} events ({:,} MB) in {:.1f}s".format(
+            count, os.path.getsize(path) // (1024 * 1024), time.time() - start), file=sys.stderr)
+
+    server = LocalApiServer(threaded=True, latency=args.latency)
+    server.server.backend.keep_events = False
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False, pool_maxsize=args.concurrency)
+        events = EventsService(api)
+
+        def print_progress(progress):
+            print(format_progress(progress), file=sys.stderr)
+
+        progress = ingest_file(events, path, max_concurrency=args.concurrency, on_progress=print_progress,
+                               progress_interval=args.progress_interval)
+        api.close()
+    finally:
+        server.stop()
+        if directory:
+            shutil.rmtree(directory)
+
+    print("{:,} events in {:.1f}s: {:,.0f} events/s, {:.1f} MB/s, max RSS {:,} MB".format(
+        progress['events'], progress['seconds'], progress['events_per_second'],
+        progress['bytes_total'] / 1e6 / progress['seconds'],
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024))
+
+
+if __name__ == '__main__':
+    main()
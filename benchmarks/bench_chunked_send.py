@@ -0,0 +1,53 @@
+""" Events per second of a large EventsService.send, split into chunks sent sequentially or concurrently
+
+Runs against the local mock server (threaded, with a simulated network latency):
+
+    $ python -m benchmarks.bench_chunked_send --events 20000 --latency 0.05 --concurrency 8
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.events import EventsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def make_events(count):
+    return [{'x_object': {'x_device_id': 'device_{}'.format(i % 100)}, 'x_event_type': 'bench'} for i in range(count)]
+
+
+def bench_send(server, count, concurrency):
+    api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False, pool_maxsize=concurrency)
+    events = make_events(count)
+
+    start = time.time()
+    EventsService(api).send(events, max_concurrency=concurrency)
+    elapsed = time.time() - start
+
+    api.close()
+    server.server.backend.clear()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=0.05, help="simulated round trip in seconds")
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    server = LocalApiServer(threaded=True, latency=args.latency)
+    server.start()
+    try:
+        for concurrency in sorted({1, args.concurrency}):
+            elapsed = bench_send(server, args.events, concurrency)
+            print("concurrency {:>3}: {:8.3f}s {:10.0f} events/s".format(concurrency, elapsed, args.events / elapsed))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+""" Onboarding of devices with OwnersService.batch_claim: sequential chunks against concurrent chunks
+
+The claims are generated lazily and sent to the local mock server (with a simulated latency per request) in chunks of
+1000, one at a time and then with several chunks in flight:
+
+    $ python -m benchmarks.bench_claims --claims 100000 --concurrency 8 --latency 0.02
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.owners import OwnersService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--claims', type=int, default=100000)
+    parser.add_argument('--owners', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    server = LocalApiServer(threaded=True, latency=args.latency)
+    server.server.backend.owners = {'owner_{}'.format(i): {} for i in range(args.owners)}
+    server.server.backend.objects = {'device_{}'.format(i): {} for i in range(args.claims)}
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False, pool_maxsize=args.concurrency)
+        service = OwnersService(api)
+        for concurrency in (1, args.concurrency):
+            claims = (('owner_{}'.format(i % args.owners), 'device_{}'.format(i)) for i in range(args.claims))
+            start = time.time()
+            summary = service.batch_claim(claims, summary=True, max_concurrency=concurrency)
+            seconds = time.time() - start
+            print("{:>2} chunks in flight: {:7.3f}s {:9.0f} claims/s, {} succeeded".format(
+                concurrency, seconds, args.claims / seconds, summary.succeeded))
+        api.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+""" Events per second of EventsService.send with each JSON codec available
+
+Reports the client-side encode/decode throughput of each codec and the end-to-end throughput against the local mock
+server (where the server parsing is included in the measure):
+
+    $ pip install simplejson ujson   # optional, to compare them with the standard library
+    $ python -m benchmarks.bench_codecs --batches 20 --batch-size 1000
+"""
+from __future__ import print_function
+
+import argparse
+import datetime
+import time
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.codec import available_codecs, get_codec
+from smartobjects.ingestion.events import EventsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def make_batch(size):
+    return [{
+        'event_id': uuid.uuid4(),
+        'x_object': {'x_device_id': 'device_{}'.format(i % 100)},
+        'x_event_type': 'bench',
+        'x_timestamp': datetime.datetime.now(),
+        'temperature': 21.5 + i % 10,
+        'status': 'running',
+        'tags': ['a', 'b', 'c']
+    } for i in range(size)]
+
+
+def bench_codec(codec, batches):
+    start = time.time()
+    encoded = [codec.dumps(batch) for batch in batches]
+    encode = time.time() - start
+
+    start = time.time()
+    [codec.loads(data) for data in encoded]
+    decode = time.time() - start
+    return encode, decode
+
+
+def bench_send(server, codec_name, batches):
+    api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False, codec=codec_name)
+    events = EventsService(api)
+
+    start = time.time()
+    for batch in batches:
+        events.send(batch)
+    elapsed = time.time() - start
+
+    server.server.backend.clear()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    total = args.batches * args.batch_size
+    server = LocalApiServer()
+    server.start()
+    try:
+        for name in available_codecs():
+            codec = get_codec(name)
+            encode, decode = bench_codec(codec, [make_batch(args.batch_size) for _ in range(args.batches)])
+            send = bench_send(server, name, [make_batch(args.batch_size) for _ in range(args.batches)])
+            print("{:>10}: encode {:10.0f} events/s, decode {:10.0f} events/s, send {:8.0f} events/s".format(
+                name, total / encode, total / decode, total / send))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+""" Inventory sync with ObjectsService.create_update: sequential chunks against concurrent chunks
+
+The objects are sent to the local mock server (with a simulated latency per request and a shared uplink) in chunks of
+1000, one at a time and then with several chunks in flight:
+
+    $ python -m benchmarks.bench_create_update --objects 100000 --concurrency 8 --latency 0.02
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.objects import ObjectsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--objects', type=int, default=100000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02, help="simulated round trip in seconds")
+    parser.add_argument('--bandwidth', type=float, default=None, help="simulated uplink in bytes per second")
+    args = parser.parse_args()
+
+    objects = [{'x_device_id': 'device_{}'.format(i), 'x_object_type': 'sensor', 'firmware': '1.0.{}'.format(i % 10)}
+               for i in range(args.objects)]
+
+    server = LocalApiServer(threaded=True, latency=args.latency, bandwidth=args.bandwidth)
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False, pool_maxsize=args.concurrency)
+        service = ObjectsService(api)
+        for concurrency in (1, args.concurrency):
+            server.server.backend.objects = {}
+            start = time.time()
+            summary = service.create_update(objects, summary=True, max_concurrency=concurrency)
+            seconds = time.time() - start
+            print("{:>2} chunks in flight: {:7.3f}s {:9.0f} objects/s, {} succeeded".format(
+                concurrency, seconds, args.objects / seconds, summary.succeeded))
+        api.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
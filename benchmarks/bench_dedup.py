@@ -0,0 +1,91 @@
+""" Cost of the events redelivered by an at-least-once upstream, with and without a client-side dedup index
+
+A stream of batches is built where a fraction of the events are sent again in a later batch, as an MQTT broker
+retrying its deliveries would. The batches are sent to the local mock server without an index, with an
+LruEventIdIndex and with a BloomEventIdIndex; the hit rate and memory of each index are reported:
+
+    $ python -m benchmarks.bench_dedup --batches 200 --batch-size 500 --redelivered 0.1 --latency 0.005
+"""
+from __future__ import print_function
+
+import argparse
+import random
+import time
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.dedup import LruEventIdIndex, BloomEventIdIndex
+from smartobjects.ingestion.events import EventsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def make_batches(batches, batch_size, redelivered, window):
+    """ :return: list of batches, `redelivered` of the events of a batch being copies of events of the `window`
+        previous batches """
+    result = []
+    for _ in range(batches):
+        batch = []
+        ids = set()
+        for i in range(batch_size):
+            if result and random.random() < redelivered:
+                event = random.choice(random.choice(result[-window:]))
+                if event['event_id'] in ids:
+                    continue
+            else:
+                event = {'event_id': str(uuid.uuid4()), 'x_object': {'x_device_id': 'device_{}'.format(i % 100)},
+                         'x_event_type': 'bench', 'temperature': 21.5}
+            ids.add(event['event_id'])
+            batch.append(event)
+        result.append(batch)
+    return result
+
+
+def bench(api, backend, batches, index):
+    backend.event_batches = []
+    events = EventsService(api, dedup_index=index)
+    start = time.time()
+    for batch in batches:
+        events.send(batch)
+    return time.time() - start, sum(backend.event_batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--redelivered', type=float, default=0.1, help="fraction of the events sent again")
+    parser.add_argument('--window', type=int, default=20, help="how many batches back a redelivery comes from")
+    parser.add_argument('--latency', type=float, default=0.005, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    batches = make_batches(args.batches, args.batch_size, args.redelivered, args.window)
+    total = sum(len(batch) for batch in batches)
+    capacity = args.window * args.batch_size
+
+    server = LocalApiServer(latency=args.latency)
+    backend = server.server.backend
+    backend.keep_events = False
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False)
+        indexes = [
+            ("no index", None),
+            ("LruEventIdIndex", LruEventIdIndex(capacity)),
+            ("BloomEventIdIndex 0.1%", BloomEventIdIndex(capacity, error_rate=0.001)),
+        ]
+        for name, index in indexes:
+            seconds, sent = bench(api, backend, batches, index)
+            line = "{:>22}: {:7.3f}s {:9.0f} events/s, {:7d} events sent".format(name, seconds, total / seconds, sent)
+            if index is not None:
+                stats = index.stats()
+                line += ", hit rate {:5.1%}, {:,} bytes for {:,} ids".format(
+                    stats['hit_rate'], stats['memory_bytes'], stats['ids'])
+            print(line)
+        api.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
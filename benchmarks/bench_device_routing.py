@@ -0,0 +1,81 @@
+""" Bytes sent and events per second of EventsService.send vs send_by_device, for objects emitting many events
+
+Runs against the local mock server (threaded, with a simulated network latency and uplink bandwidth). Fewer bytes
+only pay off when the bandwidth is the bottleneck and the body is not compressed: gzip already removes most of the
+repeated `x_object`, and the additional requests then cost more than they save.
+
+    $ python -m benchmarks.bench_device_routing --devices 50 --events-per-device 200 --latency 0.02 --bandwidth 1000000
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.events import EventsService
+from smartobjects.metrics import MetricsRegistry
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def device_id(i):
+    return 'gateway-{:05d}-temperature-sensor'.format(i)
+
+
+def make_events(devices, per_device):
+    return [{'x_object': {'x_device_id': device_id(i % devices)}, 'x_event_type': 'measure', 'temperature': i * 0.1}
+            for i in range(devices * per_device)]
+
+
+def bench(server, args, compression, by_device):
+    backend = server.server.backend
+    backend.clear()
+    for i in range(args.devices):
+        backend.objects[device_id(i)] = {'x_device_id': device_id(i)}
+
+    registry = MetricsRegistry()
+    api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, compression, pool_maxsize=args.concurrency,
+                     observers=[registry])
+    service = EventsService(api)
+    events = make_events(args.devices, args.events_per_device)
+
+    start = time.time()
+    if by_device:
+        service.send_by_device(events, max_concurrency=args.concurrency)
+    else:
+        service.send(events, must_exist=True, max_concurrency=args.concurrency)
+    elapsed = time.time() - start
+    api.close()
+
+    routes = registry.snapshot()
+    requests = sum(route['requests'] for name, route in routes.items() if name != 'oauth')
+    sent_bytes = sum(route['sent_bytes'] for name, route in routes.items() if name != 'oauth')
+    return elapsed, len(events) / elapsed, requests, sent_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=50)
+    parser.add_argument('--events-per-device', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help="simulated round trip in seconds")
+    parser.add_argument('--bandwidth', type=int, default=1000000, help="simulated uplink in bytes/s, 0: unlimited")
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    server = LocalApiServer(threaded=True, latency=args.latency, bandwidth=args.bandwidth)
+    server.start()
+    try:
+        for compression in (False, True):
+            baseline = None
+            for by_device in (False, True):
+                elapsed, rate, requests, sent_bytes = bench(server, args, compression, by_device)
+                baseline = baseline or sent_bytes
+                print("{:>14} {:>15}: {:8.3f}s {:10.0f} events/s {:5} requests {:12,} bytes ({:+.1f}%)".format(
+                    "gzip" if compression else "no compression", "send_by_device" if by_device else "send",
+                    elapsed, rate, requests, sent_bytes, 100.0 * (sent_bytes - baseline) / baseline))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
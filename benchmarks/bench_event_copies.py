@@ -0,0 +1,94 @@
+""" Memory allocated and time spent to send batches of events which are kept by the caller (for retries, persistence)
+
+Before the events were serialized without being modified, callers reusing their events had to send a deep copy of each
+batch. This compares that defensive copy with sending the batch itself, against the local mock server:
+
+    $ python -m benchmarks.bench_event_copies --batches 50 --batch-size 1000
+"""
+from __future__ import print_function
+
+import argparse
+import copy
+import datetime
+import sys
+import time
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.events import EventsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def make_batch(size):
+    return [{
+        'event_id': uuid.uuid4(),
+        'x_object': {'x_device_id': 'device_{}'.format(i % 100)},
+        'x_event_type': 'bench',
+        'x_timestamp': datetime.datetime.now(),
+        'temperature': 21.5 + i % 10,
+        'tags': ['a', 'b', 'c']
+    } for i in range(size)]
+
+
+def deep_size(obj, seen=None):
+    """ :return: bytes allocated for `obj` and every object it references, each object counted once """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif isinstance(obj, uuid.UUID):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+
+def copied_bytes(batch):
+    """ :return: bytes allocated by a deep copy of `batch`: the objects of the copy which are not shared with it """
+    original = set()
+    deep_size(batch, original)
+    return deep_size(copy.deepcopy(batch), original)
+
+
+def bench(events, batches, copy_first):
+    start = time.time()
+    for batch in batches:
+        events.send(copy.deepcopy(batch) if copy_first else batch)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    batches = [make_batch(args.batch_size) for _ in range(args.batches)]
+    per_batch = copied_bytes(batches[0])
+
+    server = LocalApiServer()
+    server.server.backend.keep_events = False
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False)
+        events = EventsService(api)
+        # the same events are sent twice: the mock backend must not remember their ids
+        copied = bench(events, batches, copy_first=True)
+        direct = bench(events, batches, copy_first=False)
+        api.close()
+    finally:
+        server.stop()
+
+    total = args.batches * args.batch_size
+    print("deep copy then send: {:8.3f}s {:10.0f} events/s, {:,} bytes copied per batch ({:,} MB in total)".format(
+        copied, total / copied, per_batch, per_batch * args.batches // (1024 * 1024)))
+    print("     send the batch: {:8.3f}s {:10.0f} events/s, 0 bytes copied".format(direct, total / direct))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+""" Existence checks of an ingestion path seeing the same objects again and again, with and without an ExistenceCache
+
+Each check picks a deviceId with a skewed distribution (a few objects are very active) and calls `object_exists`
+against the local mock server, with a simulated latency per request:
+
+    $ python -m benchmarks.bench_existence_cache --checks 2000 --objects 2000 --latency 0.002
+"""
+from __future__ import print_function
+
+import argparse
+import random
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.cache import ExistenceCache
+from smartobjects.ingestion.objects import ObjectsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=2000)
+    parser.add_argument('--objects', type=int, default=2000)
+    parser.add_argument('--missing', type=float, default=0.2, help="fraction of the objects which do not exist")
+    parser.add_argument('--latency', type=float, default=0.002, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    random.seed(1)
+    device_ids = ['device_{}'.format(min(int(random.paretovariate(1.2)) - 1, args.objects - 1))
+                  for _ in range(args.checks)]
+
+    server = LocalApiServer(latency=args.latency)
+    step = int(1 / args.missing) if args.missing else args.objects + 1
+    server.server.backend.objects = {'device_{}'.format(i): {} for i in range(args.objects) if i % step}
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False)
+        for name, cache in (("no cache", None), ("ExistenceCache", ExistenceCache(max_size=1000))):
+            objects = ObjectsService(api, existence_cache=cache)
+            start = time.time()
+            for device_id in device_ids:
+                objects.object_exists(device_id)
+            seconds = time.time() - start
+
+            line = "{:>15}: {:7.3f}s {:9.0f} checks/s".format(name, seconds, args.checks / seconds)
+            if cache is not None:
+                stats = cache.stats()
+                line += ", hit rate {:5.1%} ({} hits, {} misses)".format(stats['hit_rate'], stats['hits'],
+                                                                       stats['misses'])
+            print(line)
+        api.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
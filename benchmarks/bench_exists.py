@@ -0,0 +1,59 @@
+""" Reconciliation of a large list of deviceIds: one `objects_exist` request against chunked, concurrent checks
+
+Time of each approach against the local mock server, and memory of each output format (dict of every id, set of the
+missing ids, bitmap aligned with the input):
+
+    $ python -m benchmarks.bench_exists --ids 200000 --missing 0.01 --concurrency 8 --latency 0.01
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.objects import ObjectsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def timed(func, *args, **kwargs):
+    start = time.time()
+    result = func(*args, **kwargs)
+    return time.time() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ids', type=int, default=200000)
+    parser.add_argument('--missing', type=float, default=0.01, help="fraction of the ids which do not exist")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.01, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    device_ids = ['device_{}'.format(i) for i in range(args.ids)]
+    step = int(1 / args.missing) if args.missing else args.ids + 1
+
+    server = LocalApiServer(threaded=True, latency=args.latency)
+    server.server.backend.objects = {device_id: {} for i, device_id in enumerate(device_ids) if i % step}
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False, pool_maxsize=args.concurrency)
+        objects = ObjectsService(api)
+
+        single, as_dict = timed(objects.objects_exist, device_ids, max_batch_size=len(device_ids), max_concurrency=1)
+        chunked, _ = timed(objects.objects_exist, device_ids, max_concurrency=args.concurrency)
+        _, missing = timed(objects.missing_objects, iter(device_ids), max_concurrency=args.concurrency)
+        _, bitmap = timed(objects.objects_exist_bitmap, iter(device_ids), max_concurrency=args.concurrency)
+        api.close()
+    finally:
+        server.stop()
+
+    print("{:>30}: {:7.3f}s".format("one request", single))
+    print("{:>30}: {:7.3f}s".format("chunks of 1000, {} in flight".format(args.concurrency), chunked))
+    print("output sizes: dict {:,} bytes, missing set {:,} bytes ({} ids), bitmap {:,} bytes".format(
+        sys.getsizeof(as_dict), sys.getsizeof(missing), len(missing), sys.getsizeof(bitmap.to_bytes())))
+
+
+if __name__ == '__main__':
+    main()
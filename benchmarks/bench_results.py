@@ -0,0 +1,91 @@
+""" Memory and time spent building the results of a batch of events, from the parsed response of the platform
+
+Compares the previous EventResult (instance dict, copy of the response entry, UUID parsed for every result) with the
+current one (__slots__, UUID parsed on access) and with the summary mode (`send(..., summary=True)`), which only
+builds a result for the events which were not ingested:
+
+    $ python -m benchmarks.bench_results --batches 200 --batch-size 1000 --failures 0.01
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+import uuid
+
+from smartobjects.ingestion import EventResult, BatchSummary
+
+
+class DictEventResult(object):
+    """ EventResult as it was before: the response entry kept in `_source`, the id parsed by the constructor """
+
+    def __init__(self, *args, **kwargs):
+        if len(args) == 1 and isinstance(args[0], dict):
+            self._source = args[0]
+        elif not args and kwargs:
+            self._source = kwargs
+        else:
+            raise ValueError()
+
+        self._id = self._source.get('id', None)
+        self._result = self._source.get('result', None)
+        self._message = self._source.get('message', None)
+        if self._id:
+            self._id = uuid.UUID(self._id)
+        self._object_exists = self._source.get('objectExists', None)
+
+
+def make_response(size, failures):
+    step = int(1 / failures) if failures else size + 1
+    return [{'id': str(uuid.uuid4()), 'result': 'success' if i % step else 'error', 'objectExists': True,
+             'message': None if i % step else 'Object not found'}
+            for i in range(size)]
+
+
+def retained_bytes(results):
+    """ :return: bytes allocated for the results, excluding the response entries they share with the parsed body """
+    size = 0
+    for result in results:
+        size += sys.getsizeof(result)
+        if hasattr(result, '__dict__'):
+            # the services called the constructor with keyword arguments: `_source` is a copy of the entry
+            size += sys.getsizeof(result.__dict__) + sys.getsizeof(result._source)
+            if isinstance(result._id, uuid.UUID):
+                size += sys.getsizeof(result._id) + sys.getsizeof(result._id.__dict__)
+    return size
+
+
+def bench(build, responses):
+    start = time.time()
+    built = [build(response) for response in responses]
+    return time.time() - start, built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--failures', type=float, default=0.01, help="fraction of the events not ingested")
+    args = parser.parse_args()
+
+    responses = [make_response(args.batch_size, args.failures) for _ in range(args.batches)]
+    total = args.batches * args.batch_size
+
+    modes = [
+        ("dict + eager UUID (before)", lambda entries: [DictEventResult(**entry) for entry in entries]),
+        ("__slots__ + lazy UUID", lambda entries: [EventResult(entry) for entry in entries]),
+        ("summary=True", lambda entries: BatchSummary.from_entries(entries, EventResult)),
+    ]
+    for name, build in modes:
+        seconds, built = bench(build, responses)
+        first = built[0]
+        if isinstance(first, BatchSummary):
+            size = sys.getsizeof(first) + sys.getsizeof(first.failed) + retained_bytes(r for _, r in first.failed)
+        else:
+            size = sys.getsizeof(first) + retained_bytes(first)
+        print("{:>28}: {:7.3f}s {:10.0f} results/s, {:9,} bytes per batch of {}".format(
+            name, seconds, total / seconds, size, args.batch_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+""" Append rate of EventSpool while the platform is unreachable, and drain rate once it is back
+
+The appends are measured while the local mock server answers every request with a 503 (events pile up on the disk),
+for each fsync policy. The failures then stop and the time to deliver the backlog is compared with sending the same
+events directly with EventsService.send:
+
+    $ python -m benchmarks.bench_spool --events 100000 --append-batch 100 --concurrency 8 --latency 0.01
+"""
+from __future__ import print_function
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.events import EventsService
+from smartobjects.ingestion.spool import EventSpool
+from smartobjects.retry import RetryPolicy
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def make_events(count):
+    return [{'x_object': {'x_device_id': 'device_{}'.format(i % 100)}, 'x_event_type': 'bench', 'temperature': i * 0.1}
+            for i in range(count)]
+
+
+def bench_outage(service, backend, events, append_batch, fsync):
+    """ :return: seconds spent appending during the outage, seconds spent draining once it is over """
+    directory = tempfile.mkdtemp()
+    try:
+        backend.transient_failures = [(503, {})] * 10000
+        spool = EventSpool(service, directory, fsync=fsync, retry_backoff=0.05, retry_backoff_max=0.05)
+
+        start = time.time()
+        for i in range(0, len(events), append_batch):
+            spool.append_many(events[i:i + append_batch])
+        appended = time.time() - start
+
+        backend.transient_failures = []
+        start = time.time()
+        spool.flush()
+        drained = time.time() - start
+        spool.close()
+        return appended, drained
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--append-batch', type=int, default=100, help="events per call to append_many")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.01, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    server = LocalApiServer(threaded=True, latency=args.latency)
+    server.server.backend.keep_events = False
+    server.start()
+    try:
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False, pool_maxsize=args.concurrency,
+                         retry_policy=RetryPolicy(statuses={}, connection_errors=0))
+        service = EventsService(api)
+
+        start = time.time()
+        service.send(events, max_concurrency=args.concurrency)
+        direct = time.time() - start
+        print("{:>26}: {:10.0f} events/s".format("EventsService.send", args.events / direct))
+
+        for fsync in (EventSpool.NEVER, EventSpool.INTERVAL, EventSpool.ALWAYS):
+            appended, drained = bench_outage(service, server.server.backend, events, args.append_batch, fsync)
+            print("{:>26}: {:10.0f} events/s appended during the outage, {:10.0f} events/s drained".format(
+                "spool, fsync " + fsync, args.events / appended, args.events / drained))
+        api.close()
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+""" Measures the time to build a client, eager vs lazy, and the time until its first request completes
+
+Runs against the local mock server with a simulated network round trip, which is what a cold start (batch job,
+serverless handler) pays for the host probe and the access token:
+
+    $ python -m benchmarks.bench_startup --runs 20 --latency 0.05
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from smartobjects.api_manager import APIManager
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+def bench_startup(server, lazy, runs):
+    init, first_request = 0.0, 0.0
+    for _ in range(runs):
+        start = time.time()
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False, background_token_refresh=False, lazy=lazy)
+        init += time.time() - start
+
+        api.get("api_manager")
+        first_request += time.time() - start
+        api.close()
+    return init / runs, first_request / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    server = LocalApiServer(threaded=True, latency=args.latency)
+    server.start()
+    try:
+        for name, lazy in (("eager", False), ("lazy", True)):
+            init, first_request = bench_startup(server, lazy, args.runs)
+            print("{:>6}: init {:8.1f} ms, first request completed after {:8.1f} ms".format(
+                name, init * 1000, first_request * 1000))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+""" Measures the peak memory used to encode a batch of events, buffered vs streamed
+
+Each mode runs in its own process and reports the growth of its peak resident memory (Linux/macOS only):
+
+    $ python -m benchmarks.bench_streaming_gzip --events 1000 --event-size 10000
+"""
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import resource
+import subprocess
+import sys
+import time
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.codec import get_codec
+from smartobjects.compression import CompressionPolicy
+
+
+def make_events(count, size):
+    # hex payloads barely compress, which is the worst case for the memory used by the body
+    return [{
+        'event_id': str(uuid.uuid4()),
+        'x_object': {'x_device_id': 'device_{}'.format(i)},
+        'x_event_type': 'bench',
+        'payload': ''.join(uuid.uuid4().hex for _ in range(size // 32 + 1))[:size]
+    } for i in range(count)]
+
+
+def peak_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_mode(mode, count, size, chunk_size):
+    # APIManager is not initialized: only its encoders are used, no request is sent
+    api = APIManager.__new__(APIManager)
+    api.stream_chunk_size = chunk_size
+    api.compression_policy = CompressionPolicy(min_size=0)
+    api.codec = get_codec()
+
+    events = make_events(count, size)
+    gc.collect()
+    before = peak_kb()
+
+    start = time.time()
+    if mode == 'buffer':
+        sent = len(api._gzip_encode(api.codec.dumps(events)))
+    else:
+        sent = sum(len(chunk) for chunk in api._gzip_stream(events))
+    elapsed = time.time() - start
+
+    print(json.dumps({'mode': mode, 'peak_growth_kb': peak_kb() - before, 'compressed_bytes': sent, 'seconds': elapsed}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--event-size', type=int, default=10000, help="size of the payload of each event in bytes")
+    parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+    parser.add_argument('--mode', choices=('buffer', 'stream'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.events, args.event_size, args.chunk_size)
+        return
+
+    print("{} events of {} bytes, chunk size {} bytes".format(args.events, args.event_size, args.chunk_size))
+    for mode in ('buffer', 'stream'):
+        output = subprocess.check_output([
+            sys.executable, '-m', 'benchmarks.bench_streaming_gzip', '--mode', mode, '--events', str(args.events),
+            '--event-size', str(args.event_size), '--chunk-size', str(args.chunk_size)
+        ])
+        result = json.loads(output)
+        print("{mode:>7}: peak memory +{peak_growth_kb:>8} KB, {compressed_bytes:>10} bytes sent in {seconds:.3f}s".format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+""" Micro-benchmarks of the validation of event batches, run before each request sent by EventsService
+
+Compares the single-pass validation with the former multi-pass one (kept below as a reference) on batches of typical
+shapes. With `--max-us-per-event`, exits with status 1 if a case is slower than that, to catch regressions in CI:
+
+    $ python -m benchmarks.bench_validation --batch-size 1000 --runs 200 --max-us-per-event 2
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+import uuid
+
+from smartobjects.ingestion.events import EventsService
+
+
+def multi_pass_validation(events):
+    """ validation done before the single pass: one walk per check, plus the conversion of the ids """
+    if not events:
+        raise ValueError("Event list cannot be null or empty.")
+    if not isinstance(events, list) or not all([isinstance(e, dict) for e in events]):
+        raise ValueError("Invalid argument type for event list")
+
+    unique = set()
+    for event in filter(lambda e: 'event_id' in e, events):
+        if event['event_id'] in unique:
+            raise ValueError("The event_id [{}] is duplicated in the list".format(event['event_id']))
+        unique.add(event['event_id'])
+
+    for event in events:
+        if 'x_object' not in event or 'x_device_id' not in event['x_object'] or not event['x_object']['x_device_id']:
+            raise ValueError("x_object.x_device_id cannot be null or empty.")
+        if 'x_event_type' not in event or not event['x_event_type']:
+            raise ValueError("x_event_type cannot be null or empty.")
+
+    for event in events:
+        if 'event_id' in event:
+            event['event_id'] = str(event['event_id'])
+    return events
+
+
+CASES = [
+    ('without event_id', lambda i: {'x_object': {'x_device_id': 'device_{}'.format(i % 100)}, 'x_event_type': 'bench',
+                                    'temperature': 21.5}),
+    ('uuid event_id', lambda i: {'event_id': uuid.uuid4(), 'x_object': {'x_device_id': 'device_{}'.format(i % 100)},
+                                 'x_event_type': 'bench', 'temperature': 21.5}),
+    ('string event_id', lambda i: {'event_id': str(uuid.uuid4()),
+                                   'x_object': {'x_device_id': 'device_{}'.format(i % 100)},
+                                   'x_event_type': 'bench', 'temperature': 21.5}),
+]
+
+
+def bench(validate, make_event, batch_size, runs):
+    """ :return: best time per event in microseconds of `validate` on a batch of `batch_size` events, over `runs`
+        runs (building the batch is not timed) """
+    best = None
+    for _ in range(runs):
+        batch = [make_event(i) for i in range(batch_size)]
+        start = time.time()
+        validate(batch)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e6 / batch_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--max-us-per-event', type=float, help="fail if the single pass is slower than that")
+    args = parser.parse_args()
+
+    service = EventsService(None)
+    failed = False
+    for name, make_event in CASES:
+        reference = bench(multi_pass_validation, make_event, args.batch_size, args.runs)
+        single = bench(service._validate_event_list, make_event, args.batch_size, args.runs)
+        print("{:>17}: multi-pass {:6.3f} us/event, single pass {:6.3f} us/event ({:.2f}x)".format(
+            name, reference, single, reference / single))
+        if args.max_us_per_event is not None and single > args.max_us_per_event:
+            print("{}: {:.3f} us/event is above the limit of {} us/event".format(name, single, args.max_us_per_event),
+                  file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
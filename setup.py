@@ -22,6 +22,9 @@ setup(
     url="https://github.com/mnubo/smartobjects-python-client",
     packages=["smartobjects", "smartobjects.ingestion", "smartobjects.restitution", "smartobjects.helpers", "smartobjects.model"],
     install_requires=requirements,
+    entry_points={
+        'console_scripts': ['smartobjects-bulk = smartobjects.ingestion.bulk:main'],
+    },
     keywords=['mnubo', 'api', 'sdk', 'iot', 'smartobjects'],
     classifiers=[
         'Operating System :: OS Independent',
@@ -1,4 +1,15 @@
 from smartobjects.smartobjects_client import SmartObjectsClient
 from smartobjects.smartobjects_client import Environments
+from smartobjects.async_client import AsyncSmartObjectsClient
 from smartobjects.api_manager import APIManager
+from smartobjects.retry import RetryPolicy
+from smartobjects.compression import CompressionPolicy
+from smartobjects.token_store import FileTokenStore, TokenStore
+from smartobjects.metrics import MetricsRegistry, RequestObserver
+from smartobjects.ingestion.producer import BatchingEventSender
+from smartobjects.ingestion.spool import EventSpool
+from smartobjects.ingestion.resend import Resender, ResendPolicy
+from smartobjects.ingestion.dedup import LruEventIdIndex, BloomEventIdIndex
+from smartobjects.ingestion.cache import ExistenceCache
+from smartobjects.ingestion import Result, EventResult, BatchSummary
 from smartobjects.helpers import Owner, SmartObject, Event
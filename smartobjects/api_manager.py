@@ -1,26 +1,62 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import base64
 import datetime
-import gzip
-import StringIO
+import logging
+import threading
+import time
+import zlib
 
-def authenticate(func):
-    def authenticate_and_call(*args):
-        if not args[0].is_access_token_valid():
-            args[0].access_token = args[0].fetch_access_token()
-        return func(*args)
-    return authenticate_and_call
+from concurrent.futures import ThreadPoolExecutor
+
+from smartobjects.codec import JsonCodec, get_codec
+from smartobjects.compression import CompressionPolicy
+from smartobjects.metrics import RequestMetrics
+from smartobjects.routes import route_template
+from smartobjects.retry import Retrier
+from smartobjects.token_manager import TokenManager
+
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
 
 
 class APIManager(object):
-    def __init__(self, client_id, client_secret, hostname, compression_enabled=True):
+    def __init__(self, client_id, client_secret, hostname, compression_enabled=True,
+                 pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True,
+                 token_refresh_margin=60, token_refresh_jitter=30, background_token_refresh=True, retry_policy=None,
+                 stream_chunk_size=None, codec=None, lazy=False, token_store=None, observers=None):
         """ Initializes the API Manager which is responsible for authenticating every request.
 
+        A single API manager can safely be shared by several threads: they all use the same access token and the
+        same pool of HTTP connections. The pool should be at least as large as the number of threads sending requests
+        concurrently, otherwise connections are discarded (or waited for when `pool_block` is True).
+
         :param client_id: the client id generated by mnubo
         :param client_secret: the client secret generated by mnubo
         :param hostname: the hostname to send the requests (sandbox or production)
-        :param compression_enabled: if True, enable compression in the HTTP requests (default: True)
+        :param compression_enabled: if True, compress every request body. A CompressionPolicy can be given instead to
+            control the compression level and which bodies are compressed (default: True)
+        :param pool_connections: number of per-host connection pools to cache (default: 10)
+        :param pool_maxsize: maximum number of connections kept open per host (default: 10)
+        :param pool_block: if True, a request waits for a free connection when the pool is exhausted instead of
+            opening a connection which is discarded afterwards (default: False)
+        :param keep_alive: if True, connections are reused across requests (default: True)
+        :param token_refresh_margin: number of seconds before its expiration the access token is renewed (default: 60)
+        :param token_refresh_jitter: maximum random delay added to the margin, in seconds (default: 30)
+        :param background_token_refresh: if True, the access token is renewed by a background timer so requests never
+            wait for it (default: True)
+        :param retry_policy: (optional) RetryPolicy applied to transient failures, no retry by default
+        :param stream_chunk_size: (optional) when set with compression enabled, request bodies are serialized and
+            compressed incrementally and sent as a chunked body of about that many bytes per chunk, so that the
+            memory used does not depend on the size of the batch
+        :param codec: (optional) JsonCodec instance or name (`orjson`, `ujson`, `simplejson` or `json`) used to
+            serialize requests and parse responses, the fastest library installed by default
+        :param lazy: if True, the host is not probed and the access token is only fetched by the first request (or
+            by `warmup`), so that building the API manager does not block on the network (default: False)
+        :param token_store: (optional) TokenStore sharing the access token with the other processes using the same
+            credentials, so that they do not all request their own
+        :param observers: (optional) list of RequestObserver notified of the measures of every request
         """
 
         if not client_id:
@@ -29,19 +65,93 @@ class APIManager(object):
         if not client_secret:
             raise ValueError("client_secret cannot be null or empty.")
 
+        if pool_connections < 1 or pool_maxsize < 1:
+            raise ValueError("pool_connections and pool_maxsize must be greater than 0.")
 
-        try:
-            requests.head(hostname)
-        except requests.exceptions.ConnectionError:
-            raise ValueError("Host at {} is not reachable".format(hostname))
+        if stream_chunk_size is not None and stream_chunk_size < 1:
+            raise ValueError("stream_chunk_size must be greater than 0.")
 
         self.__client_id = client_id
         self.__client_secret = client_secret
         self.__hostname = hostname
         self.__session = requests.Session()
 
-        self.compression_enabled = compression_enabled
-        self.access_token = self.fetch_access_token()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+        if not keep_alive:
+            self.__session.headers['Connection'] = 'close'
+
+        if isinstance(compression_enabled, CompressionPolicy):
+            self.compression_policy = compression_enabled
+        else:
+            self.compression_policy = CompressionPolicy(min_size=0) if compression_enabled else None
+        self.compression_enabled = self.compression_policy is not None
+        self.stream_chunk_size = stream_chunk_size
+        self.codec = codec if isinstance(codec, JsonCodec) else get_codec(codec)
+        self.retrier = Retrier(retry_policy) if retry_policy else None
+        self.observers = list(observers or [])
+        self.pool_maxsize = pool_maxsize
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.token_manager = TokenManager(self.fetch_access_token, token_refresh_margin, token_refresh_jitter,
+                                          background_token_refresh, token_store, "{}@{}".format(client_id, hostname))
+        if not lazy:
+            self.warmup()
+
+    @property
+    def access_token(self):
+        """the current access token: dict with `access_token`, `expires_in` and `requested_at`"""
+        return self.token_manager.token
+
+    @access_token.setter
+    def access_token(self, value):
+        self.token_manager.token = value
+
+    def warmup(self):
+        """ Checks that the host is reachable and fetches the access token
+
+        Called at initialization unless the API manager is lazy, in which case it can be called explicitly to pay the
+        connection and authentication round trips before the first request.
+        """
+        try:
+            self.__session.head(self.__hostname)
+        except requests.exceptions.ConnectionError:
+            raise ValueError("Host at {} is not reachable".format(self.__hostname))
+
+        self.token_manager.get_token()
+
+    def add_observer(self, observer):
+        """ Registers a RequestObserver notified of the measures of every request sent from now on """
+        self.observers.append(observer)
+
+    def _notify(self, event, *args):
+        for observer in self.observers:
+            try:
+                getattr(observer, event)(*args)
+            except Exception:
+                # a faulty observer must not fail a request which may already have been processed
+                logger.exception("Request observer %r failed", observer)
+
+    def retry_stats(self):
+        """ Retry counters: dict with `retries`, `give_ups` and `budget_exhausted` (None without retry policy) """
+        return self.retrier.stats() if self.retrier else None
+
+    @property
+    def executor(self):
+        """thread pool sending the chunks of large batches concurrently, as many threads as pooled connections"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.pool_maxsize)
+        return self._executor
+
+    def close(self):
+        """ Stops the background tasks and closes the HTTP connections """
+        self.token_manager.stop()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self.__session.close()
 
     def fetch_access_token(self):
         """ Requests the access token necessary to communicate with the smartobjects platform
@@ -50,7 +160,7 @@ class APIManager(object):
         requested_at = datetime.datetime.now()
 
         r = self.__session.post(self.get_auth_url(), headers=self.get_token_authorization_header())
-        json_response = r.json()
+        json_response = self.parse(r)
         r.raise_for_status()
 
         return {
@@ -65,7 +175,7 @@ class APIManager(object):
         :return: True of the token is still valid, False if it is expired
         """
 
-        return (self.access_token['requested_at'] + self.access_token['expires_in']) > datetime.datetime.now()
+        return self.token_manager.is_valid(margin=0)
 
     def get_token_authorization_header(self):
         """ Generates the authorization header used while requesting an access token
@@ -74,10 +184,13 @@ class APIManager(object):
         encoded = base64.b64encode("{0}:{1}".format(self.__client_id, self.__client_secret))
         return {'content-type': 'application/x-www-form-urlencoded', 'Authorization': "Basic {}".format(encoded)}
 
-    def get_authorization_header(self):
+    def get_authorization_header(self, token=None):
         """ Generates the authorization header used to access resources via smartobjects's API
+
+        :param token: (optional) the token to use instead of the current one
         """
-        return {'content-type': 'application/json', 'Authorization': 'Bearer ' + self.access_token['access_token']}
+        token = token or self.access_token
+        return {'content-type': 'application/json', 'Authorization': 'Bearer ' + token['access_token']}
 
     def get_api_url(self):
         """ Generates the general API url
@@ -91,6 +204,21 @@ class APIManager(object):
 
         return self.__hostname + '/oauth/token?grant_type=client_credentials&scope=ALL'
 
+    def parse(self, response):
+        """ Parses the JSON body of a response with the codec of the API manager """
+        if not self.observers:
+            return self.codec.loads(response.content)
+
+        start = time.time()
+        result = self.codec.loads(response.content)
+        seconds = time.time() - start
+
+        api_url = self.get_api_url()
+        if response.request is not None and response.request.url.startswith(api_url):
+            route = route_template(response.request.url[len(api_url):])
+            self._notify('on_parse', route, seconds, len(response.content))
+        return result
+
     def validate_response(self, response):
         """ Raises a ValueError instead of a HTTPError in case of a 400 or 409
 
@@ -100,14 +228,165 @@ class APIManager(object):
             raise ValueError(response.content)
         response.raise_for_status()
 
-    def _gzip_encode(self, data):
-        out = StringIO.StringIO()
-        f = gzip.GzipFile(mode='wb', fileobj=out)
-        f.write(data)
-        f.close()
-        return out.getvalue()
+    def _gzip_encode(self, data, level=zlib.Z_DEFAULT_COMPRESSION):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def _gzip_stream(self, body, route=None, metrics=None):
+        """ Serializes and compresses `body` incrementally
+
+        Elements of a list body are serialized one at a time, so only one element and one chunk of compressed data
+        are held in memory at once. The compression statistics of `route` and the request `metrics` are updated
+        once the body is sent.
+
+        :return: generator of gzip chunks of at least `stream_chunk_size` bytes (except the last one), or of the size
+            of the blocks produced by zlib if larger
+        """
+        policy = self.compression_policy
+        compressor = zlib.compressobj(policy.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        chunk, chunk_size = [], 0
+        raw_size, compressed_size, seconds, serialize_seconds = 0, 0, 0.0, 0.0
+
+        fragments = self._iter_json(body)
+        while True:
+            start = time.time()
+            fragment = next(fragments, None)
+            serialize_seconds += time.time() - start
+            if fragment is None:
+                break
+
+            start = time.time()
+            compressed = compressor.compress(fragment)
+            seconds += time.time() - start
+            raw_size += len(fragment)
+
+            if compressed:
+                chunk.append(compressed)
+                chunk_size += len(compressed)
+                if chunk_size >= self.stream_chunk_size:
+                    compressed_size += chunk_size
+                    yield ''.join(chunk)
+                    chunk, chunk_size = [], 0
+
+        start = time.time()
+        chunk.append(compressor.flush())
+        seconds += time.time() - start
+        compressed_size += chunk_size + len(chunk[-1])
+        if route:
+            policy.record(route, raw_size, compressed_size, seconds)
+        if metrics:
+            metrics.raw_bytes, metrics.sent_bytes = raw_size, compressed_size
+            metrics.serialize_seconds += serialize_seconds
+            metrics.compress_seconds += seconds
+        yield ''.join(chunk)
+
+    def _iter_json(self, body):
+        if not isinstance(body, list):
+            yield self.codec.dumps(body)
+            return
+
+        yield '['
+        for i, element in enumerate(body):
+            yield ', ' + self.codec.dumps(element) if i else self.codec.dumps(element)
+        yield ']'
+
+    def _encode_body(self, route, body, metrics):
+        """ Builds the headers and request arguments to send `body` according to the compression policy """
+        policy = self.compression_policy
+        if policy and self.stream_chunk_size and isinstance(body, list):
+            # the size of a streamed body is unknown: only the adaptive mode applies
+            if policy.should_compress(metrics.route):
+                # a new generator is needed each time the request is sent (retries, re-authentication)
+                return {"content-encoding": "gzip"}, {'data': lambda: self._gzip_stream(body, metrics.route, metrics)}
+            policy = None
+
+        start = time.time()
+        data = self.codec.dumps(body)
+        metrics.serialize_seconds = time.time() - start
+        metrics.raw_bytes = metrics.sent_bytes = len(data)
+
+        if not policy or not policy.should_compress(metrics.route, len(data)):
+            return None, {'data': data}
+
+        start = time.time()
+        compressed = self._gzip_encode(data, policy.level)
+        metrics.compress_seconds = time.time() - start
+        metrics.sent_bytes = len(compressed)
+        policy.record(metrics.route, len(data), len(compressed), metrics.compress_seconds)
+        return {"content-encoding": "gzip"}, {'data': compressed}
+
+    def _request(self, method, route, headers=None, idempotent=None, metrics=None, **kwargs):
+        """ Sends an authenticated request, re-authenticating once if the token is rejected
+
+        Transient failures are retried according to the retry policy, if any.
+
+        :param method: HTTP method
+        :param route: resource path (not including the API root)
+        :param headers: (optional) headers added to the authorization ones
+        :param idempotent: (optional) overrides the idempotency deduced from the HTTP method for the retries
+        :param metrics: (optional) RequestMetrics of the request, completed and passed to the observers
+        """
+        url = self.get_api_url() + route
+        metrics = metrics or RequestMetrics(method, route_template(route))
+
+        if self.retrier:
+            self.retrier.on_request()
+
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = self._send_authenticated(method, url, headers, metrics, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    delay = self.retrier.next_delay(method, attempt, idempotent, error=e) if self.retrier else None
+                    if delay is None:
+                        raise
+                else:
+                    delay = self.retrier.next_delay(method, attempt, idempotent, response=response) if self.retrier else None
+                    if delay is None:
+                        break
+                time.sleep(delay)
+                attempt += 1
+
+            metrics.response_bytes = len(response.content)
+            self.validate_response(response)
+            return response
+        except Exception as e:
+            metrics.error = e
+            raise
+        finally:
+            if self.observers:
+                metrics.total_seconds = time.time() - metrics.started_at
+                self._notify('on_request', metrics)
+
+    def _send_authenticated(self, method, url, headers, metrics, **kwargs):
+        token = self.token_manager.get_token()
+        response = self._send(method, url, token, headers, metrics, **kwargs)
+
+        if response.status_code == 401:
+            # the token was revoked or expired early: only the first thread to see this token rejected requests a
+            # new one, the others reuse it
+            token = self.token_manager.invalidate(token)
+            response = self._send(method, url, token, headers, metrics, **kwargs)
+
+        return response
+
+    def _send(self, method, url, token, headers, metrics, **kwargs):
+        all_headers = self.get_authorization_header(token)
+        if headers:
+            all_headers.update(headers)
+        if callable(kwargs.get('data')):
+            kwargs = dict(kwargs, data=kwargs['data']())
+
+        metrics.attempts += 1
+        start = time.time()
+        try:
+            response = self.__session.request(method, url, headers=all_headers, **kwargs)
+        finally:
+            metrics.network_seconds += time.time() - start
+        metrics.status = response.status_code
+        return response
 
-    @authenticate
     def get(self, route, params={}):
         """ Build and send a get request authenticated
 
@@ -115,37 +394,20 @@ class APIManager(object):
         :param params: (optional) additional parameters for the request string
         """
 
-        url = self.get_api_url() + route
-        headers = self.get_authorization_header()
-
-        response = self.__session.get(url, params=params, headers=headers)
-        self.validate_response(response)
+        return self._request('GET', route, params=params)
 
-        return response
-
-    @authenticate
-    def post(self, route, body={}):
+    def post(self, route, body={}, idempotent=False):
         """ Build and send a post request authenticated
 
         :param route: resource path (not including the API root)
         :param body: JSON body to be included in the HTTP request
+        :param idempotent: True if the request can safely be sent again after a failure (read-only requests)
         """
 
-        url = self.get_api_url() + route
-        headers = self.get_authorization_header()
-
-        if self.compression_enabled:
-            headers.update({"content-encoding": "gzip"})
-            encoded = self._gzip_encode(json.dumps(body))
-            response = self.__session.post(url, data=encoded, headers=headers)
-        else:
-            response = self.__session.post(url, json=body, headers=headers)
-
-        self.validate_response(response)
+        metrics = RequestMetrics('POST', route_template(route))
+        headers, kwargs = self._encode_body(route, body, metrics)
+        return self._request('POST', route, headers=headers, idempotent=idempotent, metrics=metrics, **kwargs)
 
-        return response
-
-    @authenticate
     def put(self, route, body={}):
         """ Build and send an authenticated put request
 
@@ -153,31 +415,14 @@ class APIManager(object):
         :param body: JSON body to be included in the HTTP request
         """
 
-        url = self.get_api_url() + route
-        headers = self.get_authorization_header()
-
-        if self.compression_enabled:
-            headers.update({"content-encoding": "gzip"})
-            encoded = self._gzip_encode(json.dumps(body))
-            response = self.__session.put(url, data=encoded, headers=headers)
-        else:
-            response = self.__session.put(url, json=body, headers=headers)
-
-        self.validate_response(response)
+        metrics = RequestMetrics('PUT', route_template(route))
+        headers, kwargs = self._encode_body(route, body, metrics)
+        return self._request('PUT', route, headers=headers, metrics=metrics, **kwargs)
 
-        return response
-
-    @authenticate
     def delete(self, route):
         """ Build and send a delete request authenticated
 
         :param route: which resource to access via the REST API
         """
 
-        url = self.get_api_url() + route
-        headers = self.get_authorization_header()
-
-        response = self.__session.delete(url, headers=headers)
-        self.validate_response(response)
-
-        return response
+        return self._request('DELETE', route)
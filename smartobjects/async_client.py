@@ -0,0 +1,154 @@
+import functools
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from smartobjects.ingestion.events import EventsService
+from smartobjects.ingestion.owners import OwnersService
+from smartobjects.ingestion.objects import ObjectsService
+from smartobjects.restitution.search import SearchService
+from smartobjects.model.model import ModelService
+from smartobjects.api_manager import APIManager
+from smartobjects.smartobjects_client import Environments
+
+
+class AsyncService(object):
+    """ Non-blocking version of a service: every public method is submitted to an executor and returns a Future
+
+    Validation and results are the ones of the wrapped service: the future resolves with the same value
+    (`Result`, `EventResult`, `ResultSet`, `Model`...) or raises the same exception as the blocking call.
+
+    Example:
+    >>> futures = [client.events.send(batch) for batch in batches]
+    >>> results = [future.result() for future in futures]
+    """
+
+    def __init__(self, service, executor):
+        self._service = service
+        self._executor = executor
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def submit(*args, **kwargs):
+            return self._executor.submit(attr, *args, **kwargs)
+        return submit
+
+
+class AsyncSmartObjectsClient(object):
+    """ Non-blocking version of the SmartObjectsClient
+
+    Every service method returns a `concurrent.futures.Future` instead of blocking until the API responds. All the
+    requests are issued by a pool of `max_workers` threads sharing the same API manager (and therefore the same
+    access token and HTTP connections), so that many requests can be in flight at once.
+    """
+
+    def __init__(self, client_id, client_secret, environment, compression_enabled=True, max_workers=10,
+                 pool_block=False, keep_alive=True, retry_policy=None, stream_chunk_size=None,
+                 codec=None, lazy=False, token_store=None, observers=None, event_dedup_index=None,
+                 object_existence_cache=None, owner_existence_cache=None, pool_connections=10,
+                 background_token_refresh=True, token_refresh_margin=60):
+        """ Initialization of the asynchronous smartobjects client
+
+        :param client_id (string): client_id part of the OAuth 2.0 credentials (available in your dashboard)
+        :param client_secret (string): client_secret part of the OAuth 2.0 credentials (available in your dashboard)
+        :param environment: either Environments.Sandbox or Environments.Production
+        :param compression_enabled: gzip compress the request body (default: True), or a CompressionPolicy
+        :param max_workers: maximum number of requests in flight at the same time, the connection pool is sized
+            accordingly (default: 10)
+        :param pool_block: wait for a free connection when all the connections are in use (default: False)
+        :param keep_alive: reuse connections across requests (default: True)
+        :param retry_policy: (optional) RetryPolicy applied to transient failures, no retry by default
+        :param stream_chunk_size: (optional) stream compressed request bodies in chunks of about that many bytes
+        :param codec: (optional) name of the JSON library used for requests and responses, the fastest one by default
+        :param lazy: do not contact the platform at initialization (default: False)
+        :param token_store: (optional) TokenStore sharing the access token between processes
+        :param observers: (optional) list of RequestObserver notified of the measures of every request
+        :param event_dedup_index: (optional) EventIdIndex of the event ids already delivered by the events service
+        :param object_existence_cache: (optional) ExistenceCache of the existence checks of the objects service
+        :param owner_existence_cache: (optional) ExistenceCache of the existence checks of the owners service
+        :param pool_connections: number of per-host connection pools to cache (default: 10)
+        :param background_token_refresh: renew the access token in the background before it expires (default: True)
+        :param token_refresh_margin: number of seconds before its expiration the access token is renewed (default: 60)
+
+        .. seealso:: SmartObjectsClient
+        """
+
+        if environment not in (Environments.Sandbox, Environments.Production):
+            raise ValueError("Invalid 'environment' argument, must be one of: Environments.Sandbox, Environments.Production")
+
+        if max_workers < 1:
+            raise ValueError("max_workers must be greater than 0.")
+
+        self._api_manager = APIManager(client_id, client_secret, environment, compression_enabled,
+                                       pool_connections=pool_connections, pool_maxsize=max_workers,
+                                       pool_block=pool_block, keep_alive=keep_alive,
+                                       token_refresh_margin=token_refresh_margin,
+                                       background_token_refresh=background_token_refresh,
+                                       retry_policy=retry_policy, stream_chunk_size=stream_chunk_size,
+                                       codec=codec, lazy=lazy, token_store=token_store, observers=observers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self.owners = AsyncService(OwnersService(self._api_manager, owner_existence_cache), self._executor)
+        self.events = AsyncService(EventsService(self._api_manager, event_dedup_index), self._executor)
+        self.objects = AsyncService(ObjectsService(self._api_manager, object_existence_cache), self._executor)
+        self.search = AsyncService(SearchService(self._api_manager), self._executor)
+        self.model = AsyncService(ModelService(self._api_manager), self._executor)
+
+    def warmup(self):
+        """ Checks that the platform is reachable and fetches the access token, in the background
+
+        :return: a Future completed once the client is ready
+        .. seealso:: SmartObjectsClient.warmup
+        """
+        return self._executor.submit(self._api_manager.warmup)
+
+    def token_stats(self):
+        """ Statistics about the access token refreshes
+
+        .. seealso:: SmartObjectsClient.token_stats
+        """
+        return self._api_manager.token_manager.stats()
+
+    def retry_stats(self):
+        """ Retry counters
+
+        .. seealso:: SmartObjectsClient.retry_stats
+        """
+        return self._api_manager.retry_stats()
+
+    def compression_stats(self):
+        """ Compression statistics per route
+
+        .. seealso:: SmartObjectsClient.compression_stats
+        """
+        policy = self._api_manager.compression_policy
+        return policy.stats() if policy else {}
+
+    def close(self, wait=True):
+        """ Stops accepting new requests and (optionally) waits for the pending ones to complete
+
+        The API manager (token refresh, HTTP connections) is closed once the pending requests are completed.
+
+        :param wait: if True, blocks until every pending request is completed (default: True)
+        """
+        self._executor.shutdown(wait=wait)
+        if wait:
+            self._api_manager.close()
+            return
+
+        def close_when_done():
+            self._executor.shutdown(wait=True)
+            self._api_manager.close()
+        closer = threading.Thread(target=close_when_done, name='smartobjects-async-close')
+        closer.daemon = True
+        closer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,88 @@
+import collections
+
+
+def chunked(items, max_count, max_bytes=None, size_of=None):
+    """ Splits `items` into consecutive lists of at most `max_count` elements and `max_bytes` bytes
+
+    An element larger than `max_bytes` on its own is sent alone, the API decides whether it is acceptable.
+
+    :param items: iterable of elements
+    :param max_count: maximum number of elements per chunk
+    :param max_bytes: (optional) maximum size of a chunk once serialized
+    :param size_of: function returning the serialized size of an element, required with `max_bytes`
+    :return: generator of lists
+    """
+    if max_count < 1:
+        raise ValueError("max_batch_size must be greater than 0.")
+    if max_bytes is not None and max_bytes < 1:
+        raise ValueError("max_batch_bytes must be greater than 0.")
+
+    chunk, chunk_bytes = [], 2
+    for item in items:
+        if max_bytes is not None:
+            # elements of a JSON list are separated by ', '
+            item_bytes = size_of(item) + 2
+            if chunk and chunk_bytes + item_bytes > max_bytes:
+                yield chunk
+                chunk, chunk_bytes = [], 2
+            chunk_bytes += item_bytes
+
+        chunk.append(item)
+        if len(chunk) >= max_count:
+            yield chunk
+            chunk, chunk_bytes = [], 2
+
+    if chunk:
+        yield chunk
+
+
+def dispatch(executor, func, chunks, max_concurrency):
+    """ Calls `func` on each chunk with at most `max_concurrency` calls in flight, and yields the results in order
+
+    Chunks are consumed lazily: only `max_concurrency` of them are held in memory at once. If a call raises, the
+    exception is raised once its turn comes and the following chunks are not sent.
+
+    :param executor: concurrent.futures.Executor running the calls
+    :param func: function called with a chunk
+    :param chunks: iterable of chunks
+    :param max_concurrency: maximum number of calls in flight
+    :return: generator of the results of `func`, in the order of `chunks`
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be greater than 0.")
+
+    if max_concurrency == 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    in_flight = collections.deque()
+    try:
+        for chunk in chunks:
+            if len(in_flight) >= max_concurrency:
+                yield in_flight.popleft().result()
+            in_flight.append(executor.submit(func, chunk))
+
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        # on error (or if the generator is not consumed), do not start the calls not yet running
+        for future in in_flight:
+            future.cancel()
+
+
+def isolate_errors(func, on_error, errors):
+    """ Wraps `func` so that a chunk raising one of `errors` does not stop the others
+
+    :param func: function called with a chunk
+    :param on_error: function called with the chunk and the exception raised by `func`, its return value replaces the
+        result of `func`
+    :param errors: exception class, or tuple of classes, to be isolated: the other exceptions are raised
+    :return: function to be passed to `dispatch`
+    """
+    def call(chunk):
+        try:
+            return func(chunk)
+        except errors as e:
+            return on_error(chunk, e)
+    return call
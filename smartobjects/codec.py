@@ -0,0 +1,130 @@
+import datetime
+import decimal
+import json
+import uuid
+
+
+def encode_default(obj):
+    """ Serializes the types not supported by JSON while the body is encoded, so that the objects sent are never
+    modified: UUIDs as strings, dates, datetimes and times in ISO 8601 format, decimals as numbers
+    """
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError("{!r} is not JSON serializable".format(obj))
+
+
+class JsonCodec(object):
+    """ Serializes request bodies and parses response bodies, based on the `json` module of the standard library
+
+    Subclasses use faster JSON libraries when they are installed.
+
+    .. seealso:: get_codec
+    """
+
+    name = 'json'
+
+    # False when UUIDs and datetimes make the codec fall back to a slower implementation
+    native_types = True
+
+    def dumps(self, obj):
+        """ :return: the JSON representation of `obj` as a string, UUIDs and datetimes are natively supported """
+        return json.dumps(obj, default=encode_default)
+
+    def loads(self, data):
+        """ :return: the object represented by the JSON string `data` """
+        return json.loads(data)
+
+
+class SimpleJsonCodec(JsonCodec):
+    name = 'simplejson'
+
+    def __init__(self):
+        import simplejson
+        self._simplejson = simplejson
+
+    def dumps(self, obj):
+        return self._simplejson.dumps(obj, default=encode_default)
+
+    def loads(self, data):
+        return self._simplejson.loads(data)
+
+
+class UJsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+        try:
+            ujson.dumps(uuid.uuid4(), default=encode_default)
+            self.native_types = True
+        except TypeError:
+            self.native_types = False
+
+    def dumps(self, obj):
+        if self.native_types:
+            return self._ujson.dumps(obj, default=encode_default, escape_forward_slashes=False)
+        try:
+            return self._ujson.dumps(obj, escape_forward_slashes=False)
+        except TypeError:
+            # older versions of ujson have no `default` hook: UUIDs and datetimes require the standard library
+            return super(UJsonCodec, self).dumps(obj)
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj):
+        return self._orjson.dumps(obj, default=encode_default).decode('utf-8')
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+# fastest first
+CODECS = (OrjsonCodec, UJsonCodec, SimpleJsonCodec, JsonCodec)
+
+
+def available_codecs():
+    """ :return: the names of the codecs which can be used in the current environment, fastest first """
+    names = []
+    for codec_class in CODECS:
+        try:
+            codec_class()
+            names.append(codec_class.name)
+        except ImportError:
+            pass
+    return names
+
+
+def get_codec(name=None):
+    """ Instantiates a JSON codec
+
+    :param name: one of `orjson`, `ujson`, `simplejson` or `json`. By default, the fastest library installed which
+        natively supports UUIDs and datetimes is used (falling back to the standard library)
+    :return: JsonCodec
+    """
+    for codec_class in CODECS:
+        if name is not None and codec_class.name != name:
+            continue
+        try:
+            codec = codec_class()
+        except ImportError:
+            if name is not None:
+                raise ValueError("JSON codec '{}' is not available, install the '{}' package.".format(name, name))
+            continue
+        if name is not None or codec.native_types:
+            return codec
+
+    raise ValueError("Unknown JSON codec '{}'".format(name))
@@ -0,0 +1,149 @@
+import threading
+import zlib
+
+
+class RouteCompressionStats(object):
+    """ Compression statistics of one API route
+
+    `ratio` (compressed size / raw size) and `cpu_per_byte` are moving averages of the last compressed requests, the
+    other values are totals since the creation of the client.
+    """
+
+    # weight of the last sample in the moving averages
+    SMOOTHING = 0.2
+
+    def __init__(self):
+        self.requests = 0
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.cpu_seconds = 0.0
+        self.ratio = None
+        self.cpu_per_byte = None
+        self.enabled = True
+        self._since_probe = 0
+
+    def add(self, raw_size, compressed_size, seconds):
+        self.compressed += 1
+        self.raw_bytes += raw_size
+        self.compressed_bytes += compressed_size
+        self.cpu_seconds += seconds
+
+        ratio = float(compressed_size) / raw_size if raw_size else 1.0
+        cpu_per_byte = seconds / raw_size if raw_size else 0.0
+        if self.ratio is None:
+            self.ratio, self.cpu_per_byte = ratio, cpu_per_byte
+        else:
+            self.ratio += self.SMOOTHING * (ratio - self.ratio)
+            self.cpu_per_byte += self.SMOOTHING * (cpu_per_byte - self.cpu_per_byte)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'compressed': self.compressed,
+            'raw_bytes': self.raw_bytes,
+            'compressed_bytes': self.compressed_bytes,
+            'cpu_seconds': self.cpu_seconds,
+            'ratio': self.ratio,
+            'cpu_per_byte': self.cpu_per_byte,
+            'enabled': self.enabled
+        }
+
+
+class CompressionPolicy(object):
+    """ Decides which request bodies are gzip compressed
+
+    Bodies smaller than `min_size` are always sent uncompressed. In adaptive mode, the policy measures the ratio
+    and the CPU time of the compression of each route: once `warmup` bodies have been compressed, compression is
+    turned off for a route when the time saved on the wire (bytes saved / `bandwidth`) is lower than the CPU time
+    spent, or when the ratio is above `max_ratio`. One request every `probe_interval` is still compressed on the
+    disabled routes so that compression is turned back on if the payloads change.
+
+    Example:
+    >>> policy = CompressionPolicy(min_size=2048, level=3, adaptive=True)
+    >>> client = SmartObjectsClient(CLIENT_ID, CLIENT_SECRET, Environments.Production, compression_enabled=policy)
+    >>> policy.stats()['events']
+    {'requests': 120, 'compressed': 120, 'raw_bytes': 10485760, 'compressed_bytes': 1048576, 'ratio': 0.1, ...}
+    """
+
+    def __init__(self, min_size=1024, level=zlib.Z_DEFAULT_COMPRESSION, adaptive=False, max_ratio=0.9,
+                 bandwidth=12500000, warmup=10, probe_interval=100):
+        """
+        :param min_size: bodies smaller than that many bytes are not compressed (default: 1024)
+        :param level: gzip compression level, from 1 (fastest) to 9 (smallest) (default: 6)
+        :param adaptive: turn compression off on the routes where it does not pay (default: False)
+        :param max_ratio: adaptive mode: maximum compressed size / raw size for compression to be worth it (default: 0.9)
+        :param bandwidth: adaptive mode: expected upload bandwidth in bytes per second (default: 12500000, 100 Mbps)
+        :param warmup: adaptive mode: number of compressed bodies before a route can be turned off (default: 10)
+        :param probe_interval: adaptive mode: one request every `probe_interval` is compressed on the routes
+            turned off (default: 100)
+        """
+        if not (1 <= level <= 9 or level == zlib.Z_DEFAULT_COMPRESSION):
+            raise ValueError("Compression level must be between 1 and 9.")
+        if min_size < 0:
+            raise ValueError("min_size cannot be negative.")
+
+        self.min_size = min_size
+        self.level = level
+        self.adaptive = adaptive
+        self.max_ratio = max_ratio
+        self.bandwidth = float(bandwidth)
+        self.warmup = warmup
+        self.probe_interval = probe_interval
+
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def _route(self, route):
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes.setdefault(route, RouteCompressionStats())
+        return stats
+
+    def should_compress(self, route, size=None):
+        """ Decides if a body sent to `route` must be compressed
+
+        :param route: route template (see `route_template`)
+        :param size: size of the serialized body in bytes, None if unknown (streamed body)
+        """
+        with self._lock:
+            stats = self._route(route)
+            stats.requests += 1
+
+            if size is not None and size < self.min_size:
+                return False
+            if not self.adaptive or stats.enabled:
+                return True
+
+            stats._since_probe += 1
+            if stats._since_probe >= self.probe_interval:
+                stats._since_probe = 0
+                return True
+            return False
+
+    def record(self, route, raw_size, compressed_size, seconds):
+        """ Records the result of the compression of a body
+
+        :param route: route template (see `route_template`)
+        :param raw_size: size of the body before compression, in bytes
+        :param compressed_size: size of the compressed body, in bytes
+        :param seconds: time spent compressing the body
+        """
+        with self._lock:
+            stats = self._route(route)
+            stats.add(raw_size, compressed_size, seconds)
+            if self.adaptive and stats.compressed >= self.warmup:
+                stats.enabled = self._pays(stats)
+
+    def _pays(self, stats):
+        saved_seconds_per_byte = (1.0 - stats.ratio) / self.bandwidth
+        return stats.ratio <= self.max_ratio and saved_seconds_per_byte >= stats.cpu_per_byte
+
+    def stats(self):
+        """ Compression statistics per route template
+
+        :return: dict of route template: dict with `requests`, `compressed`, `raw_bytes`, `compressed_bytes`,
+            `cpu_seconds`, `ratio`, `cpu_per_byte` and `enabled`
+        """
+        with self._lock:
+            return {route: stats.as_dict() for route, stats in self._routes.items()}
@@ -1,5 +1,10 @@
+import itertools
 import uuid
 
+import requests
+
+from smartobjects.batching import chunked, dispatch, isolate_errors
+
 
 class Result(object):
     """ Result object containing the information returned by an API call to Object or Owner services
@@ -13,17 +18,20 @@ class Result(object):
      >>> success = Result(id='device_id', result='success')
      >>> failure = Result(id='device_id', result='error', message='Invalid property "some invalid property"')
     """
+    # results are built for every item of every batch: no instance dict, no copy of the parsed response
+    __slots__ = ('_id', '_result', '_message')
+
     def __init__(self, *args, **kwargs):
         if len(args) == 1 and isinstance(args[0], dict):
-            self._source = args[0]
+            source = args[0]
         elif not args and kwargs:
-            self._source = kwargs
+            source = kwargs
         else:
             raise ValueError()
 
-        self._id = self._source.get('id', None)
-        self._result = self._source.get('result', None)
-        self._message = self._source.get('message', None)
+        self._id = source.get('id', None)
+        self._result = source.get('result', None)
+        self._message = source.get('message', None)
 
     @property
     def id(self):
@@ -42,15 +50,24 @@ class Result(object):
 
 
 class EventResult(Result):
+    __slots__ = ('_uuid', '_object_exists')
+
     def __init__(self, *args, **kwargs):
         """Specialized version of `Result` for the EventsService
 
         `result` property can be `success`, `failure`, `conflict`, `notfound`
         """
         super(EventResult, self).__init__(*args, **kwargs)
-        if self._id:
-            self._id = uuid.UUID(self._id)
-        self._object_exists = self._source.get('objectExists', None)
+        # the id is parsed on first access only
+        self._uuid = None
+        self._object_exists = (args[0] if args else kwargs).get('objectExists', None)
+
+    @property
+    def id(self):
+        """UUID of the event"""
+        if self._uuid is None and self._id:
+            self._uuid = self._id if isinstance(self._id, uuid.UUID) else uuid.UUID(self._id)
+        return self._uuid
 
     @property
     def object_exists(self):
@@ -60,3 +77,97 @@ class EventResult(Result):
         """
         return self._object_exists
 
+
+class BatchSummary(object):
+    """ Compact outcome of a batch: the number of items which succeeded, and only the items which did not
+
+    Returned instead of a list of results by the ingestion methods called with `summary=True`: no result object is
+    built for the items with a `success` result.
+
+    Example:
+    >>> summary = client.events.send(events, summary=True)
+    >>> summary.succeeded, len(summary.failed)
+    (998, 2)
+    >>> for index, result in summary.failed:
+    ...     print(events[index], result.result, result.message)
+    """
+
+    __slots__ = ('succeeded', 'failed')
+
+    def __init__(self, succeeded=0, failed=None):
+        """
+        :param succeeded: number of items with a `success` result
+        :param failed: list of (index, Result) of the other items, `index` being the position of the item in the input
+        """
+        self.succeeded = succeeded
+        self.failed = failed if failed is not None else []
+
+    @classmethod
+    def from_entries(cls, entries, result_type=Result):
+        """ :return: BatchSummary of the results parsed from a response (dicts), in the order of the input """
+        succeeded = 0
+        failed = []
+        for index, entry in enumerate(entries):
+            if entry.get('result') == 'success':
+                succeeded += 1
+            else:
+                failed.append((index, result_type(entry)))
+        return cls(succeeded, failed)
+
+    @property
+    def total(self):
+        """number of items in the batch"""
+        return self.succeeded + len(self.failed)
+
+    @property
+    def all_succeeded(self):
+        return not self.failed
+
+
+# errors of a request: refused by the platform (ValueError, see APIManager.validate_response), server or connection
+# error. The other exceptions (a value the codec cannot serialize...) are bugs of the caller and are raised.
+REQUEST_ERRORS = (ValueError, requests.RequestException)
+
+
+def failed_chunk_entries(chunk, error, key):
+    """ Results of the items of a chunk whose request failed, in the format of the platform
+
+    The result is `error` if the platform refused the request (ValueError): sending it again would fail the same way.
+    It is `failure` otherwise (server or connection error), the items can be sent again (see Resender).
+    """
+    result = 'error' if isinstance(error, ValueError) else 'failure'
+    message = str(error)
+    return [{'id': key(item), 'result': result, 'message': message} for item in chunk]
+
+
+def send_batches(api_manager, send_chunk, items, key, max_batch_size=1000, max_batch_bytes=None,
+                 max_concurrency=None):
+    """ Sends a batch of items by chunks of `max_batch_size` items (and `max_batch_bytes` once serialized), up to
+    `max_concurrency` chunks at the same time
+
+    A chunk whose request fails (REQUEST_ERRORS) does not stop the others: its items get a result built by
+    `failed_chunk_entries`. Any other exception is raised.
+
+    :param api_manager: APIManager sending the requests
+    :param send_chunk: function sending a list of items and returning the parsed results
+    :param items: iterable of items, read as the chunks are sent
+    :param key: function returning the identifier of an item, for the results of a failed chunk
+    :return: list of the parsed results (dicts), in the order of `items`
+    """
+    if max_concurrency is None:
+        max_concurrency = api_manager.pool_maxsize
+    size_of = (lambda item: len(api_manager.codec.dumps(item))) if max_batch_bytes else None
+
+    chunks = chunked(items, max_batch_size, max_batch_bytes, size_of)
+    send = isolate_errors(send_chunk, lambda chunk, error: failed_chunk_entries(chunk, error, key), REQUEST_ERRORS)
+
+    first, second = next(chunks, None), next(chunks, None)
+    if second is None:
+        # a single request: no need for the thread pool, which may be busy
+        return send(first) if first is not None else []
+    chunks = itertools.chain([first, second], chunks)
+
+    entries = []
+    for chunk_entries in dispatch(api_manager.executor, send, chunks, max_concurrency):
+        entries.extend(chunk_entries)
+    return entries
@@ -0,0 +1,308 @@
+""" Bulk ingestion of event dumps (NDJSON or CSV files)
+
+Files are read through a memory map and parsed lazily, one record at a time, then sent in concurrent batches by
+`EventsService.send_stream`: the memory used does not depend on the size of the file.
+
+From the command line:
+
+    $ export SMARTOBJECTS_CLIENT_ID=... SMARTOBJECTS_CLIENT_SECRET=...
+    $ python -m smartobjects.ingestion.bulk --environment sandbox --concurrency 8 events.ndjson
+"""
+from __future__ import print_function
+
+import argparse
+import csv
+import mmap
+import os
+import sys
+import time
+
+from smartobjects.codec import get_codec
+
+
+# high level types of the timeseries and the conversion of their CSV values, the other types are kept as text
+NUMBER_TYPES = frozenset([
+    'DOUBLE', 'FLOAT', 'ACCELERATION', 'AREA', 'LENGTH', 'MASS', 'SPEED', 'TEMPERATURE', 'VOLUME', 'LATITUDE',
+    'LONGITUDE'
+])
+INTEGER_TYPES = frozenset(['INT', 'LONG', 'DURATION'])
+BOOLEAN_TYPES = frozenset(['BOOLEAN'])
+
+# CSV columns which are not timeseries
+EVENT_FIELDS = frozenset(['event_id', 'x_event_type', 'x_timestamp'])
+DEVICE_ID_COLUMNS = frozenset(['x_device_id', 'x_object.x_device_id'])
+
+
+def _parse_boolean(value):
+    return value.lower() in ('true', '1', 'yes')
+
+
+def _converter(high_level_type):
+    if high_level_type in NUMBER_TYPES:
+        return float
+    if high_level_type in INTEGER_TYPES:
+        return int
+    if high_level_type in BOOLEAN_TYPES:
+        return _parse_boolean
+    return None
+
+
+class MappedFile(object):
+    """ Memory-mapped file read line by line, keeps track of the position for the progress reports """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+        # an empty file cannot be mapped
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    @property
+    def position(self):
+        """number of bytes read"""
+        return self._map.tell() if self._map else 0
+
+    def lines(self):
+        if self._map is None:
+            return iter([])
+        return iter(self._map.readline, '')
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class NdjsonReader(MappedFile):
+    """ Reads a file of one JSON event per line
+
+    Example:
+    >>> with NdjsonReader('events.ndjson') as reader:
+    ...     for event in reader:
+    ...         print(event['x_event_type'])
+    """
+
+    def __init__(self, path, codec=None):
+        """
+        :param path: path of the file
+        :param codec: (optional) JsonCodec parsing the lines, the fastest one installed by default
+        """
+        super(NdjsonReader, self).__init__(path)
+        self.codec = codec or get_codec()
+
+    def __iter__(self):
+        for number, line in enumerate(self.lines(), 1):
+            if not line.strip():
+                continue
+            try:
+                yield self.codec.loads(line)
+            except ValueError as e:
+                raise ValueError("Invalid JSON at line {} of {}: {}".format(number, self.path, e))
+
+
+class CsvReader(MappedFile):
+    """ Reads a CSV file of events, with a header row naming the field of each column
+
+    The device of the event is read from the `x_device_id` (or `x_object.x_device_id`) column. The other columns
+    are `event_id`, `x_event_type`, `x_timestamp` or the key of a timeseries. With a Model, the values of the
+    timeseries are converted according to their type (numbers, booleans), and a column which is not a timeseries
+    of the model is rejected. Empty cells are omitted from the events.
+
+    Example:
+    >>> with CsvReader('events.csv', client.model.export()) as reader:
+    ...     for event in reader:
+    ...         print(event['x_object']['x_device_id'])
+    """
+
+    def __init__(self, path, model=None, delimiter=','):
+        """
+        :param path: path of the file
+        :param model: (optional) Model used to convert the values of the timeseries, values are kept as text
+            without model
+        :param delimiter: character separating the columns (default: ',')
+        """
+        super(CsvReader, self).__init__(path)
+        self.model = model
+        self.delimiter = delimiter
+
+    def _columns(self, header):
+        types = {ts.key: ts.high_level_type for ts in self.model.timeseries} if self.model else None
+
+        columns = []
+        for name in header:
+            if name in DEVICE_ID_COLUMNS or name in EVENT_FIELDS:
+                columns.append((name, None))
+            elif types is None:
+                columns.append((name, None))
+            elif name in types:
+                columns.append((name, _converter(types[name])))
+            else:
+                raise ValueError("Column '{}' of {} is not a timeseries of the model".format(name, self.path))
+        return columns
+
+    def __iter__(self):
+        rows = csv.reader(self.lines(), delimiter=self.delimiter)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = self._columns(header)
+
+        for row in rows:
+            if not row:
+                continue
+            event = {}
+            for (name, convert), value in zip(columns, row):
+                if value == '':
+                    continue
+                if name in DEVICE_ID_COLUMNS:
+                    event['x_object'] = {'x_device_id': value}
+                    continue
+                try:
+                    event[name] = convert(value) if convert else value
+                except ValueError:
+                    raise ValueError("Invalid value '{}' for {} at line {} of {}".format(
+                        value, name, rows.line_num, self.path))
+            yield event
+
+
+def open_reader(path, file_format=None, model=None, codec=None):
+    """ Opens a reader for an event dump
+
+    :param path: path of the file
+    :param file_format: `ndjson` or `csv`, deduced from the extension of the file by default
+    :param model: (optional) Model converting the values of a CSV file
+    :param codec: (optional) JsonCodec parsing a NDJSON file
+    :return: NdjsonReader or CsvReader
+    """
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            file_format = 'csv'
+        elif extension in ('.ndjson', '.jsonl', '.json'):
+            file_format = 'ndjson'
+    if file_format == 'ndjson':
+        return NdjsonReader(path, codec)
+    if file_format == 'csv':
+        return CsvReader(path, model)
+    raise ValueError("Unknown file format, must be one of: ndjson, csv")
+
+
+def ingest_file(events_service, path, file_format=None, model=None, must_exist=False, max_batch_size=1000,
+                max_batch_bytes=None, max_concurrency=None, on_progress=None, progress_interval=5.0,
+                on_failure=None):
+    """ Sends the events of a NDJSON or CSV file
+
+    :param events_service: EventsService sending the events
+    :param path: path of the file
+    :param file_format: `ndjson` or `csv`, deduced from the extension of the file by default
+    :param model: (optional) Model converting the values of a CSV file, see CsvReader
+    :param must_exist: reject the events of unknown objects (default: False)
+    :param max_batch_size: maximum number of events per request (default: 1000)
+    :param max_batch_bytes: (optional) maximum size of the body of a request before compression
+    :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+    :param on_progress: (optional) function called every `progress_interval` seconds and at the end with the
+        progress, a dict with `events`, `succeeded`, `failed`, `bytes_read`, `bytes_total`, `seconds` and
+        `events_per_second`
+    :param progress_interval: seconds between two progress reports (default: 5)
+    :param on_failure: (optional) function called with the EventResult of each event not ingested
+    :return: the final progress dict
+    """
+    reader = open_reader(path, file_format, model, events_service.api_manager.codec)
+    start = time.time()
+    progress = {'events': 0, 'succeeded': 0, 'failed': 0, 'bytes_read': 0, 'bytes_total': reader.size,
+                'seconds': 0.0, 'events_per_second': 0.0}
+
+    def update():
+        progress['bytes_read'] = reader.position
+        progress['seconds'] = time.time() - start
+        progress['events_per_second'] = progress['events'] / progress['seconds'] if progress['seconds'] else 0.0
+
+    with reader:
+        next_report = start + progress_interval
+        results = events_service.send_stream(iter(reader), must_exist=must_exist, max_batch_size=max_batch_size,
+                                             max_batch_bytes=max_batch_bytes, max_concurrency=max_concurrency)
+        for result in results:
+            progress['events'] += 1
+            if result.result == 'success':
+                progress['succeeded'] += 1
+            else:
+                progress['failed'] += 1
+                if on_failure:
+                    on_failure(result)
+
+            if on_progress and progress['events'] % 1000 == 0 and time.time() >= next_report:
+                update()
+                on_progress(dict(progress))
+                next_report = time.time() + progress_interval
+
+        update()
+    if on_progress:
+        on_progress(dict(progress))
+    return progress
+
+
+def format_progress(progress):
+    """ :return: a one line summary of a progress dict, see ingest_file """
+    percent = 100.0 * progress['bytes_read'] / progress['bytes_total'] if progress['bytes_total'] else 100.0
+    return "{:5.1f}% {:>12,} events ({:,} failed) in {:.1f}s, {:,.0f} events/s, {:.1f} MB/s".format(
+        percent, progress['events'], progress['failed'], progress['seconds'], progress['events_per_second'],
+        progress['bytes_read'] / 1e6 / progress['seconds'] if progress['seconds'] else 0.0)
+
+
+def main(argv=None):
+    from smartobjects.smartobjects_client import Environments, SmartObjectsClient
+
+    parser = argparse.ArgumentParser(
+        description="Sends the events of NDJSON or CSV files to the SmartObjects platform",
+        epilog="The credentials are read from the SMARTOBJECTS_CLIENT_ID and SMARTOBJECTS_CLIENT_SECRET environment "
+               "variables when not given.")
+    parser.add_argument('files', nargs='+', help="NDJSON (.ndjson, .jsonl) or CSV (.csv) files")
+    parser.add_argument('--client-id', default=os.environ.get('SMARTOBJECTS_CLIENT_ID'))
+    parser.add_argument('--client-secret', default=os.environ.get('SMARTOBJECTS_CLIENT_SECRET'))
+    parser.add_argument('--environment', choices=('sandbox', 'production'), default='sandbox')
+    parser.add_argument('--format', choices=('ndjson', 'csv'), help="format of the files, deduced from the extension")
+    parser.add_argument('--batch-size', type=int, default=1000, help="maximum number of events per request")
+    parser.add_argument('--concurrency', type=int, default=8, help="maximum number of requests in flight")
+    parser.add_argument('--must-exist', action='store_true', help="reject the events of unknown objects")
+    parser.add_argument('--no-model', action='store_true', help="do not convert the CSV values with the model")
+    parser.add_argument('--progress-interval', type=float, default=5.0, help="seconds between progress reports")
+    args = parser.parse_args(argv)
+
+    if not args.client_id or not args.client_secret:
+        parser.error("the client id and secret are required")
+
+    environment = Environments.Production if args.environment == 'production' else Environments.Sandbox
+    client = SmartObjectsClient(args.client_id, args.client_secret, environment, pool_maxsize=args.concurrency)
+
+    model = None
+    reads_csv = args.format == 'csv' or (args.format is None and any(f.lower().endswith('.csv') for f in args.files))
+    if reads_csv and not args.no_model:
+        model = client.model.export()
+
+    def print_progress(progress):
+        print(format_progress(progress), file=sys.stderr)
+
+    def print_failure(result):
+        print("{} {}: {}".format(result.id, result.result, result.message), file=sys.stderr)
+
+    failed = 0
+    try:
+        for path in args.files:
+            print("{}:".format(path), file=sys.stderr)
+            progress = ingest_file(client.events, path, args.format, model, args.must_exist, args.batch_size,
+                                   max_concurrency=args.concurrency, on_progress=print_progress,
+                                   progress_interval=args.progress_interval, on_failure=print_failure)
+            failed += progress['failed']
+    finally:
+        client.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import collections
+import threading
+import time
+
+
+class ExistenceCache(object):
+    """ Bounded cache of the answers of the platform to the existence checks of objects or owners
+
+    An object (owner) seen as existing is remembered for `positive_ttl` seconds, a missing one for `negative_ttl`
+    seconds: the entities of this client are created and deleted through the services, which invalidate their
+    entries, but other clients may create them at any time. Once `max_size` identifiers are held, the least recently
+    used are evicted. A cache must not be shared between the objects and the owners services.
+
+    Example:
+    >>> client = SmartObjectsClient(client_id, client_secret, Environments.Production,
+    ...                             object_existence_cache=ExistenceCache(positive_ttl=3600, negative_ttl=60))
+    >>> client.objects.object_exists('device_1')  # GET
+    >>> client.objects.object_exists('device_1')  # from the cache
+    """
+
+    def __init__(self, max_size=100000, positive_ttl=300.0, negative_ttl=30.0, clock=time.time):
+        """
+        :param max_size: maximum number of identifiers held (default: 100000)
+        :param positive_ttl: seconds an identifier which exists is remembered (default: 300)
+        :param negative_ttl: seconds an identifier which does not exist is remembered, 0 to never cache the missing
+            ones (default: 30)
+        :param clock: function returning the current time in seconds (default: time.time)
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be greater than 0.")
+        if positive_ttl < 0 or negative_ttl < 0:
+            raise ValueError("TTLs cannot be negative.")
+
+        self.max_size = max_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # identifier -> (exists, expiration time), the least recently used first
+        self._entries = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, identifier):
+        """ :return: True or False if the existence of `identifier` is cached, None otherwise """
+        with self._lock:
+            entry = self._entries.pop(identifier, None)
+            if entry is None:
+                self._misses += 1
+                return None
+            exists, expires_at = entry
+            if expires_at <= self._clock():
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries[identifier] = entry
+            self._hits += 1
+            return exists
+
+    def put(self, identifier, exists):
+        ttl = self.positive_ttl if exists else self.negative_ttl
+        with self._lock:
+            self._entries.pop(identifier, None)
+            if ttl <= 0:
+                return
+            if len(self._entries) >= self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            self._entries[identifier] = (exists, self._clock() + ttl)
+
+    def invalidate(self, identifier):
+        """ Forgets `identifier`, called by the services when this client creates or deletes it """
+        with self._lock:
+            if self._entries.pop(identifier, None) is not None:
+                self._invalidations += 1
+
+    def invalidate_many(self, identifiers):
+        with self._lock:
+            for identifier in identifiers:
+                if self._entries.pop(identifier, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """ :return: dict with the number of `entries`, `hits`, `misses`, `hit_rate`, `evictions` (LRU),
+            `expirations` (TTL) and `invalidations` """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': float(self._hits) / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations
+            }
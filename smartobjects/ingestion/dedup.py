@@ -0,0 +1,241 @@
+import collections
+import hashlib
+import math
+import struct
+import sys
+import threading
+
+from six import string_types
+
+
+def event_id_key(event_id):
+    """ :return: the string form of an event id: a UUID and its string are the same id for the platform """
+    if type(event_id) is not str and not isinstance(event_id, string_types):
+        return str(event_id)
+    return event_id
+
+
+class EventIdIndex(object):
+    """ Bounded set of the event ids already delivered, shared by the threads of an EventsService
+
+    The EventsService looks up the id of each event before serializing it: the events already delivered are not sent
+    again, their result is a `conflict`, as the platform would answer. An id is added once the platform accepted it.
+    Subclasses implement `_contains`, `_add`, `__len__` and `memory_bytes`.
+
+    .. seealso:: LruEventIdIndex, BloomEventIdIndex
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._hits = 0
+
+    def __contains__(self, event_id):
+        key = event_id_key(event_id)
+        with self._lock:
+            self._lookups += 1
+            if self._contains(key):
+                self._hits += 1
+                return True
+            return False
+
+    def add(self, event_id):
+        key = event_id_key(event_id)
+        with self._lock:
+            self._add(key)
+
+    def add_many(self, event_ids):
+        keys = [event_id_key(event_id) for event_id in event_ids]
+        with self._lock:
+            for key in keys:
+                self._add(key)
+
+    def stats(self):
+        """ :return: dict with the number of `ids` held, `lookups`, `hits`, `hit_rate` and `memory_bytes` """
+        with self._lock:
+            return {
+                'ids': len(self),
+                'lookups': self._lookups,
+                'hits': self._hits,
+                'hit_rate': float(self._hits) / self._lookups if self._lookups else 0.0,
+                'memory_bytes': self.memory_bytes()
+            }
+
+    def _contains(self, key):
+        raise NotImplementedError()
+
+    def _add(self, key):
+        raise NotImplementedError()
+
+    def __len__(self):
+        raise NotImplementedError()
+
+    def memory_bytes(self):
+        """ :return: approximate memory used by the index, in bytes """
+        raise NotImplementedError()
+
+
+class LruEventIdIndex(EventIdIndex):
+    """ The `capacity` event ids delivered or looked up the most recently, exactly
+
+    No false positive, but each id costs a few hundred bytes: fits windows up to about a million ids.
+
+    Example:
+    >>> events = EventsService(api_manager, dedup_index=LruEventIdIndex(100000))
+    """
+
+    # linked list node of an entry of a pure Python OrderedDict, 0 when it is implemented in C
+    _LINK_BYTES = sys.getsizeof([None, None, None]) if sys.version_info[0] == 2 else 0
+
+    def __init__(self, capacity):
+        """
+        :param capacity: maximum number of ids held, the least recently used ones are forgotten first
+        """
+        super(LruEventIdIndex, self).__init__()
+        if capacity < 1:
+            raise ValueError("capacity must be greater than 0.")
+        self.capacity = capacity
+        self._ids = collections.OrderedDict()
+        self._key_bytes = 0
+
+    def _contains(self, key):
+        if key not in self._ids:
+            return False
+        # moved to the most recent end
+        del self._ids[key]
+        self._ids[key] = None
+        return True
+
+    def _add(self, key):
+        if key in self._ids:
+            del self._ids[key]
+        else:
+            self._key_bytes += sys.getsizeof(key)
+            if len(self._ids) >= self.capacity:
+                oldest, _ = self._ids.popitem(last=False)
+                self._key_bytes -= sys.getsizeof(oldest)
+        self._ids[key] = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def memory_bytes(self):
+        # the table of the OrderedDict is counted twice: its own and the one of its internal map of links
+        return 2 * sys.getsizeof(self._ids) + len(self._ids) * self._LINK_BYTES + self._key_bytes
+
+
+class _BloomFilter(object):
+    """ Fixed size Bloom filter of `capacity` keys with a false positive rate of `error_rate` once full """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+        self.hashes = max(1, int(math.ceil(math.log(1.0 / error_rate, 2))))
+        self.bits = max(8, int(math.ceil(capacity * abs(math.log(error_rate)) / (math.log(2) ** 2))))
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def __contains__(self, hashes):
+        # double hashing: the positions are h1, h1 + h2, h1 + 2 * h2... modulo the number of bits, read until a
+        # bit is not set (most lookups of a new id stop after one or two bits)
+        bits, array = self.bits, self.array
+        position, step = int(hashes[0] % bits), int(hashes[1] % bits) or 1
+        for _ in range(self.hashes):
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+            position += step
+            if position >= bits:
+                position -= bits
+        return True
+
+    def add(self, hashes):
+        bits, array = self.bits, self.array
+        position, step = int(hashes[0] % bits), int(hashes[1] % bits) or 1
+        for _ in range(self.hashes):
+            array[position >> 3] |= 1 << (position & 7)
+            position += step
+            if position >= bits:
+                position -= bits
+        self.count += 1
+
+
+class BloomEventIdIndex(EventIdIndex):
+    """ Scalable Bloom filter of the event ids delivered, with a bounded false positive rate
+
+    The index starts with a filter of `initial_capacity` ids and adds filters twice as large as the previous one (up
+    to `capacity` ids in total) as they fill up, each with a lower error rate so that the rate of the whole index
+    stays under `error_rate`. Once the filters hold `capacity` ids, the oldest filter is emptied and reused for the new
+    ids: the index forgets the oldest ids in blocks instead of growing. Each id costs about 1.44 * log2(1 / error_rate)
+    bits (about 2 bytes at 0.1%).
+
+    A false positive drops an event which was never sent: `error_rate` is the fraction of new events which can be
+    lost, use an LruEventIdIndex if none is acceptable.
+
+    Example:
+    >>> events = EventsService(api_manager, dedup_index=BloomEventIdIndex(10000000, error_rate=0.0001))
+    """
+
+    # error rate of each new filter relative to the previous one
+    TIGHTENING_RATIO = 0.5
+
+    def __init__(self, capacity, error_rate=0.001, initial_capacity=None):
+        """
+        :param capacity: number of ids remembered before the oldest ones are forgotten
+        :param error_rate: maximum false positive rate of the whole index (default: 0.1%)
+        :param initial_capacity: (optional) number of ids of the first filter (default: capacity / 16)
+        """
+        super(BloomEventIdIndex, self).__init__()
+        if capacity < 1:
+            raise ValueError("capacity must be greater than 0.")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1.")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.initial_capacity = max(1, min(capacity, initial_capacity or capacity // 16))
+        self._generations = 0
+        self._filters = []
+        self._new_filter()
+
+    def _new_filter(self):
+        ratio = self.TIGHTENING_RATIO
+        held = sum(bloom.capacity for bloom in self._filters)
+        capacity = min(self.initial_capacity * 2 ** self._generations, self.capacity - held)
+        error_rate = self.error_rate * (1 - ratio) * ratio ** self._generations
+        self._generations += 1
+        self._filters.append(_BloomFilter(capacity, error_rate))
+
+    def _hashes(self, key):
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        h1, h2 = struct.unpack('<QQ', hashlib.md5(key).digest())
+        return h1, h2 | 1
+
+    def _contains(self, key):
+        hashes = self._hashes(key)
+        # the newest filters first: a recent id is the most likely duplicate
+        for bloom in reversed(self._filters):
+            if hashes in bloom:
+                return True
+        return False
+
+    def _add(self, key):
+        hashes = self._hashes(key)
+        current = self._filters[-1]
+        if current.count >= current.capacity:
+            if sum(bloom.capacity for bloom in self._filters) >= self.capacity:
+                # bounded: the oldest filter is recycled, the set of error rates (and their sum) does not change
+                oldest = self._filters.pop(0)
+                oldest.array = bytearray(len(oldest.array))
+                oldest.count = 0
+                self._filters.append(oldest)
+            else:
+                self._new_filter()
+            current = self._filters[-1]
+        current.add(hashes)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self._filters)
+
+    def memory_bytes(self):
+        return sum(sys.getsizeof(bloom.array) for bloom in self._filters)
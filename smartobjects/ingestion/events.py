@@ -1,19 +1,39 @@
+import collections
+import functools
 import uuid
-from smartobjects.ingestion import EventResult
+
+from six import string_types
+
+from smartobjects.batching import chunked, dispatch
+from smartobjects.ingestion import EventResult, BatchSummary
+from smartobjects.ingestion.dedup import event_id_key
+from smartobjects.ingestion.existence import iter_exist, missing, bitmap
 
 
 class EventsService(object):
-    def __init__(self, api_manager):
+    # results of the events the platform holds: their id is added to the dedup index
+    DELIVERED_RESULTS = ('success', 'conflict')
+
+    def __init__(self, api_manager, dedup_index=None):
         """ Initializes EventServices with the api manager
+
+        :param dedup_index: (optional) EventIdIndex of the event ids already delivered, shared by all the calls: an
+            event whose `event_id` is in the index is not sent again, its result is a `conflict`
         """
 
         self.api_manager = api_manager
+        self.dedup_index = dedup_index
 
-    def send(self, events, must_exist=False, report_results=True):
+    def send(self, events, must_exist=False, report_results=True, max_batch_size=1000, max_batch_bytes=None,
+             max_concurrency=None, summary=False):
         """ Sends list of events to smartobjects
 
         https://smartobjects.mnubo.com/apps/doc/api_ingestion.html#post-api-v3-events-batch
 
+        Lists larger than `max_batch_size` events (or `max_batch_bytes` once serialized) are split into several
+        requests, up to `max_concurrency` of them being sent at the same time. If a request fails, its exception is
+        raised and the following chunks are not sent (the previous ones may have been ingested).
+
         :param events: a list of dictionaries representing the events to be sent
         :param must_exist (bool): toggles checking that the device actually exist
             if True, event will be rejected if no object can be matched, otherwise it will be processed
@@ -21,24 +41,54 @@ class EventsService(object):
             sent (success, failure, conflict, notfound)
             if False, an exception will be raised if at least one event failed, None otherwise
             see https://smartobjects.mnubo.com/apps/doc/api_ingestion.html#post-api-v3-events for more details
-        :return: list of EventResult or None (report_results=False)
+        :param max_batch_size: maximum number of events per request (default: 1000, the limit of the API)
+        :param max_batch_bytes: (optional) maximum size of the body of a request before compression
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :param summary: return a BatchSummary (number of events ingested, and only the other results with the index
+            of their event) instead of a result per event (default: False)
+        :return: list of EventResult in the order of `events`, BatchSummary (summary=True), or None
+            (report_results=False)
         """
         self._validate_event_list(events)
-        [self._validate_event(event) for event in events]
 
-        params = []
-        if must_exist:
-            params.append("must_exist=true")
-        if report_results:
-            params.append("report_results=true")
+        path = self._events_path(must_exist, report_results)
+        return self._send_batches(path, events, report_results, max_batch_size, max_batch_bytes, max_concurrency,
+                                  summary)
 
-        path = "events?{0}".format('&'.join(params)) if params else "events"
+    def send_stream(self, events, must_exist=False, max_batch_size=1000, max_batch_bytes=None, max_concurrency=None):
+        """ Sends the events of any iterable (generator, file reader...), batch by batch as they are read
 
-        r = self.api_manager.post(path, self._ensure_serializable(events))
+        Unlike `send`, the events are not held in memory: each event is validated as it is read, batches are sent
+        as soon as they are full and the results are yielded as the responses come back. At most `max_concurrency`
+        batches are held in memory at once, whatever the length of the stream.
 
-        return [EventResult(**result) for result in r.json()] if report_results else None
+        Duplicated event ids are only detected within a batch, the platform reports the other ones as errors. If a
+        request fails or an invalid event is read, the exception is raised by the generator and the following events
+        are not sent (the previous batches may have been ingested).
+
+        :param events: an iterable of dictionaries representing the events to be sent
+        :param must_exist (bool): reject the events of unknown objects, see `send`
+        :param max_batch_size: maximum number of events per request (default: 1000, the limit of the API)
+        :param max_batch_bytes: (optional) maximum size of the body of a request before compression
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :return: generator of EventResult, in the order of `events`. The events are only read and sent as the
+            generator is consumed.
+        """
+        max_concurrency = self._max_concurrency(max_concurrency)
+        send_chunk = self._chunk_sender(self._events_path(must_exist, True), True)
 
-    def send_from_device(self, device_id, events, report_results=True):
+        # each batch is validated as it is read, before being handed to the thread pool
+        chunks = chunked(events, max_batch_size, max_batch_bytes, self._size_of(max_batch_bytes))
+        validated = (self._validate_event_list(chunk) for chunk in chunks)
+        return self._stream_results(dispatch(self.api_manager.executor, send_chunk, validated, max_concurrency))
+
+    def _stream_results(self, chunk_results):
+        for entries in chunk_results:
+            for entry in entries:
+                yield EventResult(entry)
+
+    def send_from_device(self, device_id, events, report_results=True, max_batch_size=1000, max_batch_bytes=None,
+                         max_concurrency=None, summary=False):
         """ Sends a list of events directly associated with an object
 
         https://smartobjects.mnubo.com/apps/doc/api_ingestion.html#post-api-v3-objects-x-device-id-events
@@ -50,20 +100,81 @@ class EventsService(object):
             sent (success, failure, conflict, notfound)
             if False, an exception will be raised if at least one event failed, None otherwise
             see https://smartobjects.mnubo.com/apps/doc/api_ingestion.html#post-api-v3-events for more details
-        :return: list of EventResult or None (report_results=False)
+        :param max_batch_size: maximum number of events per request (default: 1000, the limit of the API)
+        :param max_batch_bytes: (optional) maximum size of the body of a request before compression
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :param summary: return a BatchSummary instead of a result per event, see `send` (default: False)
+        :return: list of EventResult in the order of `events`, BatchSummary (summary=True), or None
+            (report_results=False)
         """
-        self._validate_event_list(events)
         if not device_id:
             raise ValueError("device_id cannot be null or empty.")
-        if not all(['x_event_type' in event and event['x_event_type'] for event in events]):
-            raise ValueError("x_event_type cannot be null or empty.")
+        self._validate_event_list(events, device_required=False)
 
         path = "objects/{}/events".format(device_id)
         if report_results:
             path += "?report_results=true"
-        r = self.api_manager.post(path, self._ensure_serializable(events))
 
-        return [EventResult(**result) for result in r.json()] if report_results else None
+        return self._send_batches(path, events, report_results, max_batch_size, max_batch_bytes, max_concurrency,
+                                  summary)
+
+    def send_by_device(self, events, min_group_size=20, max_batch_size=1000, max_batch_bytes=None,
+                       max_concurrency=None, summary=False):
+        """ Sends a list of events of many objects, grouped by object
+
+        The events of an object sending at least `min_group_size` of them are sent without their `x_object` through
+        the route of the object (see `send_from_device`), which makes the requests smaller. The events of the other
+        objects are sent together through the `events` route, where grouping would cost more requests than it saves
+        bytes. All the requests are sent concurrently. The gain is the largest without compression: gzip already
+        removes most of the repeated `x_object`.
+
+        The route of an object only accepts events of existing objects: for a consistent behavior, the other events
+        are sent with `must_exist=True`, every event of an unknown object is rejected.
+
+        :param events: a list of dictionaries representing the events to be sent
+        :param min_group_size: minimum number of events of an object to send them through its route (default: 20)
+        :param max_batch_size: maximum number of events per request (default: 1000, the limit of the API)
+        :param max_batch_bytes: (optional) maximum size of the body of a request before compression
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :param summary: return a BatchSummary instead of a result per event, see `send` (default: False)
+        :return: list of EventResult in the order of `events`, or BatchSummary (summary=True)
+        """
+        self._validate_event_list(events)
+        if min_group_size < 1:
+            raise ValueError("min_group_size must be greater than 0.")
+        max_concurrency = self._max_concurrency(max_concurrency)
+
+        groups = collections.OrderedDict()
+        for index, event in enumerate(events):
+            groups.setdefault(event['x_object']['x_device_id'], []).append(index)
+
+        size_of = self._size_of(max_batch_bytes)
+        size_of_entry = (lambda entry: size_of(entry[1])) if size_of else None
+
+        requests, ungrouped = [], []
+        for device_id, indices in groups.items():
+            if len(indices) < min_group_size:
+                ungrouped.extend(indices)
+                continue
+            path = "objects/{}/events?report_results=true".format(device_id)
+            entries = [(index, self._without_object(events[index])) for index in indices]
+            requests.extend((path, chunk) for chunk in chunked(entries, max_batch_size, max_batch_bytes, size_of_entry))
+
+        if ungrouped:
+            path = self._events_path(True, True)
+            entries = [(index, events[index]) for index in sorted(ungrouped)]
+            requests.extend((path, chunk) for chunk in chunked(entries, max_batch_size, max_batch_bytes, size_of_entry))
+
+        def send_request(request):
+            path, chunk = request
+            return self._chunk_sender(path, True)([event for _, event in chunk])
+
+        entries = [None] * len(events)
+        responses = dispatch(self.api_manager.executor, send_request, requests, min(max_concurrency, len(requests)))
+        for (_, chunk), chunk_entries in zip(requests, responses):
+            for (index, _), entry in zip(chunk, chunk_entries):
+                entries[index] = entry
+        return self._results(entries, summary)
 
     def event_exists(self, event_id):
         """ Checks if an event with UUID `uuid_id` exists in the platform
@@ -75,22 +186,124 @@ class EventsService(object):
         str_id = str(event_id)
 
         r = self.api_manager.get('events/exists/{0}'.format(str_id))
-        json = r.json()
+        json = self.api_manager.parse(r)
 
         assert str_id in json and isinstance(json[str_id], bool)
         return json[str_id]
 
-    def events_exist(self, event_ids):
+    def events_exist(self, event_ids, max_batch_size=1000, max_concurrency=None):
         """ Checks if events with UUID as specified in `event_ids` exist in the platform
 
         :param event_ids (list): list of event_ids we want to check if existing
+        :param max_batch_size: maximum number of event_ids per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
         :return: dictionary with the event_id as the key and a boolean as the value
         """
 
         assert all(isinstance(id, uuid.UUID) for id in event_ids)
+        return dict(self.iter_events_exist(event_ids, max_batch_size, max_concurrency))
 
-        r = self.api_manager.post('events/exists', [str(id) for id in event_ids])
-        return {uuid.UUID(key): value for entry in r.json() for key, value in entry.items()}
+    def iter_events_exist(self, event_ids, max_batch_size=1000, max_concurrency=None):
+        """ Checks the existence of the events of any iterable of event_ids, by chunks sent concurrently
+
+        The event_ids are read as the generator is consumed, only `max_concurrency` chunks are held in memory at once.
+        They are returned as given, UUIDs or strings, without parsing the ids of the response.
+
+        :param event_ids: iterable of event_ids (UUID or string)
+        :param max_batch_size: maximum number of event_ids per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :return: generator of (event_id, exists) tuples, in the order of `event_ids`
+        """
+        return iter_exist(self.api_manager, 'events/exists', event_ids, event_id_key, max_batch_size,
+                          self._max_concurrency(max_concurrency))
+
+    def missing_events(self, event_ids, max_batch_size=1000, max_concurrency=None):
+        """ :return: set of the event_ids of `event_ids` which do not exist, see `iter_events_exist` """
+        return missing(self.iter_events_exist(event_ids, max_batch_size, max_concurrency))
+
+    def events_exist_bitmap(self, event_ids, max_batch_size=1000, max_concurrency=None):
+        """ :return: ExistenceBitmap with a bit set for each event_id of `event_ids` which exists, see
+            `iter_events_exist` """
+        return bitmap(self.iter_events_exist(event_ids, max_batch_size, max_concurrency))
+
+    def _events_path(self, must_exist, report_results):
+        params = []
+        if must_exist:
+            params.append("must_exist=true")
+        if report_results:
+            params.append("report_results=true")
+
+        return "events?{0}".format('&'.join(params)) if params else "events"
+
+    def _max_concurrency(self, max_concurrency):
+        if max_concurrency is None:
+            return self.api_manager.pool_maxsize
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be greater than 0.")
+        return max_concurrency
+
+    def _size_of(self, max_batch_bytes):
+        return (lambda event: len(self.api_manager.codec.dumps(event))) if max_batch_bytes else None
+
+    def _chunk_sender(self, path, report_results):
+        # returns the results as parsed, the EventResult objects are only built once the caller needs them
+        def send_chunk(chunk):
+            # the platform rejects the events whose id it already holds: a chunk of events with ids can be sent again
+            # after a failure, the copies are reported as conflicts
+            idempotent = report_results and all('event_id' in event for event in chunk)
+            r = self.api_manager.post(path, chunk, idempotent=idempotent)
+            return self.api_manager.parse(r) if report_results else None
+        if self.dedup_index is None:
+            return send_chunk
+        return functools.partial(self._send_new_events, send_chunk, report_results)
+
+    def _send_new_events(self, send_chunk, report_results, chunk):
+        """ Sends the events of `chunk` whose id is not in the dedup index, then adds the ids delivered to the index
+
+        :return: the parsed results of `send_chunk`, with a `conflict` for each event dropped
+        """
+        index = self.dedup_index
+        new, dropped = [], []
+        for position, event in enumerate(chunk):
+            (dropped if 'event_id' in event and event['event_id'] in index else new).append(position)
+
+        results = send_chunk([chunk[position] for position in new]) if new else []
+        if not report_results:
+            # no exception: every event was ingested
+            index.add_many(chunk[position]['event_id'] for position in new if 'event_id' in chunk[position])
+            return None
+
+        index.add_many(chunk[position]['event_id'] for position, result in zip(new, results)
+                       if 'event_id' in chunk[position] and result.get('result') in self.DELIVERED_RESULTS)
+        if not dropped:
+            return results
+
+        merged = [None] * len(chunk)
+        for position, result in zip(new, results):
+            merged[position] = result
+        for position in dropped:
+            merged[position] = {'id': event_id_key(chunk[position]['event_id']), 'result': 'conflict',
+                                'message': "Already sent, dropped by the dedup index"}
+        return merged
+
+    def _send_batches(self, path, events, report_results, max_batch_size, max_batch_bytes, max_concurrency,
+                      summary=False):
+        max_concurrency = self._max_concurrency(max_concurrency)
+        send_chunk = self._chunk_sender(path, report_results)
+
+        chunks = list(chunked(events, max_batch_size, max_batch_bytes, self._size_of(max_batch_bytes)))
+        if len(chunks) == 1:
+            # a single request: no need for the thread pool
+            entries = send_chunk(chunks[0])
+        else:
+            responses = list(dispatch(self.api_manager.executor, send_chunk, chunks, max_concurrency))
+            entries = [entry for chunk_entries in responses for entry in chunk_entries] if report_results else None
+        return self._results(entries, summary) if report_results else None
+
+    def _results(self, entries, summary):
+        if summary:
+            return BatchSummary.from_entries(entries, EventResult)
+        return [EventResult(entry) for entry in entries]
 
     def _validate_event(self, event):
         if 'x_object' not in event or 'x_device_id' not in event['x_object'] or not event['x_object']['x_device_id']:
@@ -99,24 +312,44 @@ class EventsService(object):
         if 'x_event_type' not in event or not event['x_event_type']:
             raise ValueError("x_event_type cannot be null or empty.")
 
-    def _validate_event_list(self, events):
+    def _validate_event_list(self, events, device_required=True):
+        """ Validates a batch in a single pass: type and mandatory fields of each event, unique event ids. The events
+        are not modified.
+
+        :return: `events`
+        """
         if not events:
             raise ValueError("Event list cannot be null or empty.")
-
-        if not isinstance(events, list) or not all([isinstance(e, dict) for e in events]):
+        if not isinstance(events, list):
             raise ValueError("Invalid argument type for event list")
 
+        # called for every batch sent: the checks of _validate_event are inlined and the common cases take the
+        # shortest path (exact dict and str types, no exception)
         unique = set()
-        for event in filter(lambda e: 'event_id' in e, events):
-            if event['event_id'] in unique:
-                raise ValueError("The event_id [{}] is duplicated in the list".format(event['event_id']))
-            else:
-                unique.add(event['event_id'])
-
-    def _ensure_serializable(self, events):
-        def on_event(e):
-            if 'event_id' in e:
-                e['event_id'] = str(e['event_id'])
-            return e
-
-        return [on_event(e) for e in events]
+        add_id = unique.add
+        for event in events:
+            if type(event) is not dict and not isinstance(event, dict):
+                raise ValueError("Invalid argument type for event list")
+            if device_required:
+                try:
+                    device_id = event['x_object']['x_device_id']
+                except (KeyError, TypeError):
+                    device_id = None
+                if not device_id:
+                    raise ValueError("x_object.x_device_id cannot be null or empty.")
+            if not event.get('x_event_type'):
+                raise ValueError("x_event_type cannot be null or empty.")
+
+            if 'event_id' in event:
+                # compared as strings: a UUID and its string are the same id for the platform. The event is left
+                # untouched, UUIDs are serialized by the codec.
+                event_id = event['event_id']
+                if type(event_id) is not str and not isinstance(event_id, string_types):
+                    event_id = str(event_id)
+                if event_id in unique:
+                    raise ValueError("The event_id [{}] is duplicated in the list".format(event_id))
+                add_id(event_id)
+        return events
+
+    def _without_object(self, event):
+        return {key: value for key, value in event.items() if key != 'x_object'}
@@ -0,0 +1,131 @@
+from smartobjects.batching import chunked, dispatch
+
+
+class ExistenceBitmap(object):
+    """ One bit per identifier checked, in the order of the input: set if the identifier exists
+
+    Example:
+    >>> bitmap = client.objects.objects_exist_bitmap(device_ids)
+    >>> bitmap[0], len(bitmap), bitmap.count()
+    (True, 1000000, 999988)
+    >>> [device_ids[i] for i in bitmap.missing_indices()]
+    """
+
+    def __init__(self):
+        self._bytes = bytearray()
+        self._length = 0
+
+    def append(self, exists):
+        if not self._length & 7:
+            self._bytes.append(0)
+        if exists:
+            self._bytes[-1] |= 1 << (self._length & 7)
+        self._length += 1
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("bitmap index out of range")
+        return bool(self._bytes[index >> 3] & (1 << (index & 7)))
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield bool(self._bytes[index >> 3] & (1 << (index & 7)))
+
+    def count(self):
+        """ :return: number of identifiers which exist """
+        return sum(bin(byte).count('1') for byte in self._bytes)
+
+    def missing_indices(self):
+        """ :return: generator of the positions of the identifiers which do not exist """
+        for index, exists in enumerate(self):
+            if not exists:
+                yield index
+
+    def to_bytes(self):
+        """ :return: the bitmap, bit `i` of the input being the bit `i % 8` of the byte `i // 8` """
+        return bytes(self._bytes)
+
+
+def iter_exist(api_manager, route, ids, key=str, max_batch_size=1000, max_concurrency=None, cache=None):
+    """ Checks the existence of identifiers with requests of `max_batch_size` of them, sent concurrently
+
+    The identifiers are read lazily, only `max_concurrency` chunks are held in memory at once. The platform answers a
+    list of one-entry dicts in the order of the request: they are matched by position, the identifiers are not parsed.
+
+    :param api_manager: APIManager sending the requests
+    :param route: route of the `exists` API, e.g. `objects/exists`
+    :param ids: iterable of identifiers
+    :param key: function returning the identifier sent to the platform (default: str)
+    :param max_batch_size: maximum number of identifiers per request (default: 1000)
+    :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+    :param cache: (optional) ExistenceCache: only the identifiers it does not hold are sent, the answers are added
+    :return: generator of (identifier, exists) tuples in the order of `ids`, the identifiers as given
+    :raise ValueError: if the platform did not answer for an identifier
+    """
+    if max_concurrency is None:
+        max_concurrency = api_manager.pool_maxsize
+    if cache is not None:
+        return _iter_exist_cached(api_manager, route, ids, key, max_batch_size, max_concurrency, cache)
+    return _iter_exist(api_manager, route, ids, key, max_batch_size, max_concurrency)
+
+
+def _iter_exist_cached(api_manager, route, ids, key, max_batch_size, max_concurrency, cache):
+    # the identifiers are read by windows of as many chunks as requests in flight: the misses of a window are sent
+    # together, then merged with the hits in the order of the input
+    for window in chunked(ids, max_batch_size * max_concurrency):
+        keys = [key(identifier) for identifier in window]
+        cached = [cache.get(sent) for sent in keys]
+        misses = [sent for sent, exists in zip(keys, cached) if exists is None]
+
+        fetched = {}
+        for sent, exists in _iter_exist(api_manager, route, misses, lambda sent: sent, max_batch_size,
+                                        max_concurrency):
+            cache.put(sent, exists)
+            fetched[sent] = exists
+
+        for identifier, sent, exists in zip(window, keys, cached):
+            yield identifier, exists if exists is not None else fetched[sent]
+
+
+def _iter_exist(api_manager, route, ids, key, max_batch_size, max_concurrency):
+    def check_chunk(chunk):
+        keys = [key(identifier) for identifier in chunk]
+        r = api_manager.post(route, keys, idempotent=True)
+        entries = api_manager.parse(r)
+
+        if len(entries) == len(keys) and all(sent in entry for sent, entry in zip(keys, entries)):
+            return chunk, [entry[sent] for sent, entry in zip(keys, entries)]
+
+        # not in the order of the request: matched by key
+        found = {}
+        for entry in entries:
+            found.update(entry)
+        unknown = [sent for sent in keys if sent not in found]
+        if unknown:
+            # a missing answer does not mean that the entity does not exist
+            raise ValueError("The platform did not report the existence of {} ids: {}".format(
+                len(unknown), ', '.join(str(sent) for sent in unknown[:10])))
+        return chunk, [found[sent] for sent in keys]
+
+    chunks = chunked(ids, max_batch_size)
+    for chunk, exists in dispatch(api_manager.executor, check_chunk, chunks, max_concurrency):
+        for identifier, value in zip(chunk, exists):
+            yield identifier, value
+
+
+def missing(pairs):
+    """ :return: the set of the identifiers which do not exist, from the (identifier, exists) tuples of `iter_exist` """
+    return set(identifier for identifier, exists in pairs if not exists)
+
+
+def bitmap(pairs):
+    """ :return: ExistenceBitmap from the (identifier, exists) tuples of `iter_exist` """
+    result = ExistenceBitmap()
+    for _, exists in pairs:
+        result.append(exists)
+    return result
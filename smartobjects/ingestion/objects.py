@@ -1,12 +1,19 @@
-from smartobjects.ingestion import Result
+from operator import itemgetter
+
+from smartobjects.ingestion import Result, BatchSummary, send_batches
+from smartobjects.ingestion.existence import iter_exist, missing, bitmap
 
 class ObjectsService(object):
 
-    def __init__(self, api_manager):
+    def __init__(self, api_manager, existence_cache=None):
         """ Initializes ObjectServices with the api manager
+
+        :param existence_cache: (optional) ExistenceCache of the answers to `object_exists` and `objects_exist`, the
+            entries of the objects sent to `create`, `create_update` and `delete` are invalidated
         """
 
         self.api_manager = api_manager
+        self.existence_cache = existence_cache
 
     def _validate_object(self, object, validate_object_type=True):
         if not object:
@@ -24,7 +31,10 @@ class ObjectsService(object):
         :param object: dictionary representing the object to be created
         """
         self._validate_object(object)
-        self.api_manager.post('objects', object)
+        try:
+            self.api_manager.post('objects', object)
+        finally:
+            self._invalidate([object['x_device_id']])
 
     def update(self, device_id, object):
         """ Updates an object in the smartobjects platform
@@ -39,19 +49,34 @@ class ObjectsService(object):
             raise ValueError("Object body cannot be null or empty.")
         self.api_manager.put('objects/{}'.format(device_id), object)
 
-    def create_update(self, objects):
+    def create_update(self, objects, summary=False, max_batch_size=1000, max_batch_bytes=None, max_concurrency=None):
         """ create or update a batch of objects
 
         https://smartobjects.mnubo.com/apps/doc/api_ingestion.html#put-api-v3-objects-batch
-        a single batch can contain up to 1000 objects.
+        a single batch can contain up to 1000 objects: larger lists are split into several requests, up to
+        `max_concurrency` of them being sent at the same time. A request which fails does not stop the others, the
+        result of its objects is `error` if the platform refused it, `failure` otherwise (they can be sent again).
 
         :param objects: list of objects to be sent to smartobjects. If the object already exists, it will be
             updated with the new content, otherwise it will be created
-        :return: list of Result objects with the status of each operations
+        :param summary: return a BatchSummary (number of objects created or updated, and only the other results with
+            the index of their object) instead of a result per object (default: False)
+        :param max_batch_size: maximum number of objects per request (default: 1000, the limit of the API)
+        :param max_batch_bytes: (optional) maximum size of the body of a request before compression
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :return: list of Result objects with the status of each operations, or BatchSummary (summary=True)
         """
         [self._validate_object(obj, validate_object_type=False) for obj in objects]
-        r = self.api_manager.put('objects', objects)
-        return [Result(**result) for result in r.json()]
+
+        def send_chunk(chunk):
+            return self.api_manager.parse(self.api_manager.put('objects', chunk))
+
+        try:
+            entries = send_batches(self.api_manager, send_chunk, objects, itemgetter('x_device_id'), max_batch_size,
+                                   max_batch_bytes, max_concurrency)
+        finally:
+            self._invalidate(obj['x_device_id'] for obj in objects)
+        return BatchSummary.from_entries(entries) if summary else [Result(entry) for entry in entries]
 
     def delete(self, device_id):
         """ Deletes an object from the platform
@@ -60,7 +85,10 @@ class ObjectsService(object):
         """
         if not device_id:
             raise ValueError('x_device_id cannot be null or empty.')
-        self.api_manager.delete('objects/{}'.format(device_id))
+        try:
+            self.api_manager.delete('objects/{}'.format(device_id))
+        finally:
+            self._invalidate([device_id])
 
     def object_exists(self, device_id):
         """ Checks if an object with deviceId `uuid_id` exists in the platform
@@ -71,23 +99,58 @@ class ObjectsService(object):
 
         if not device_id:
             raise ValueError('deviceId cannot be null or empty.')
+        if self.existence_cache is not None:
+            exists = self.existence_cache.get(device_id)
+            if exists is not None:
+                return exists
+
         r = self.api_manager.get('objects/exists/{0}'.format(device_id))
-        json = r.json()
+        json = self.api_manager.parse(r)
         assert device_id in json
+        if self.existence_cache is not None:
+            self.existence_cache.put(device_id, json[device_id])
         return json[device_id]
 
-    def objects_exist(self, device_ids):
+    def objects_exist(self, device_ids, max_batch_size=1000, max_concurrency=None):
         """ Checks if events with deviceIds as specified in `device_ids` exist in the platform
 
         :param device_ids (list): list of deviceIds we want to check if existing
+        :param max_batch_size: maximum number of deviceIds per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
         :return: result dict with the deviceId as the key and a boolean as the value
         """
 
         if not device_ids:
             raise ValueError('List of deviceId cannot be null or empty.')
-        r = self.api_manager.post('objects/exists', device_ids)
+        return dict(self.iter_objects_exist(device_ids, max_batch_size, max_concurrency))
+
+    def iter_objects_exist(self, device_ids, max_batch_size=1000, max_concurrency=None):
+        """ Checks the existence of the objects of any iterable of deviceIds, by chunks sent concurrently
+
+        The deviceIds are read as the generator is consumed, only `max_concurrency` chunks are held in memory at once.
 
-        result = {}
-        for object in r.json():
-            result.update(object)
-        return result
+        :param device_ids: iterable of deviceIds
+        :param max_batch_size: maximum number of deviceIds per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :return: generator of (deviceId, exists) tuples, in the order of `device_ids`
+        """
+        return iter_exist(self.api_manager, 'objects/exists', device_ids, self._exists_key, max_batch_size,
+                          max_concurrency, self.existence_cache)
+
+    def missing_objects(self, device_ids, max_batch_size=1000, max_concurrency=None):
+        """ :return: set of the deviceIds of `device_ids` which do not exist, see `iter_objects_exist` """
+        return missing(self.iter_objects_exist(device_ids, max_batch_size, max_concurrency))
+
+    def objects_exist_bitmap(self, device_ids, max_batch_size=1000, max_concurrency=None):
+        """ :return: ExistenceBitmap with a bit set for each deviceId of `device_ids` which exists, see
+            `iter_objects_exist` """
+        return bitmap(self.iter_objects_exist(device_ids, max_batch_size, max_concurrency))
+
+    def _invalidate(self, device_ids):
+        if self.existence_cache is not None:
+            self.existence_cache.invalidate_many(device_ids)
+
+    def _exists_key(self, device_id):
+        if not device_id:
+            raise ValueError('deviceId cannot be null or empty.')
+        return device_id
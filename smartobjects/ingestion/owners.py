@@ -1,13 +1,20 @@
-from smartobjects.ingestion import Result
+from operator import itemgetter
+
+from smartobjects.ingestion import Result, BatchSummary, send_batches
+from smartobjects.ingestion.existence import iter_exist, missing, bitmap
 
 
 class OwnersService(object):
 
-    def __init__(self, api_manager):
+    def __init__(self, api_manager, existence_cache=None):
         """ Initializes OwnerServices with the api manager
+
+        :param existence_cache: (optional) ExistenceCache of the answers to `owner_exists` and `owners_exist`, the
+            entries of the owners sent to `create`, `create_update` and `delete` are invalidated
         """
 
         self.api_manager = api_manager
+        self.existence_cache = existence_cache
 
     def _validate_owner(self, owner):
         if not owner:
@@ -29,7 +36,10 @@ class OwnersService(object):
         :param owner: the owner of the object to be deleted
         """
         self._validate_owner(owner)
-        self.api_manager.post('owners', owner)
+        try:
+            self.api_manager.post('owners', owner)
+        finally:
+            self._invalidate([owner['username']])
 
     def claim(self, username, device_id, optionalBody = None):
         """ Owner claims an object
@@ -77,53 +87,90 @@ class OwnersService(object):
         else:
             self.api_manager.post('owners/{}/objects/{}/unclaim'.format(username, device_id))
 
-    def batch_claim(self, claims):
+    def batch_claim(self, claims, summary=False, max_batch_size=1000, max_concurrency=None):
         """ Batch claims of owner to object
 
         https://smartobjects.mnubo.com/apps/doc/api_ingestion.html#post-api-v3-owners-claim-batch
+        The claims are sent by chunks of `max_batch_size`, up to `max_concurrency` chunks at the same time. A list is
+        validated before anything is sent: an invalid claim raises a ValueError. Any other iterable is read as the
+        chunks are sent, an invalid claim is not sent and its result is `error`. A request which fails does not stop
+        the others, the result of its claims is `error` if the platform refused it, `failure` otherwise (they can be
+        sent again, see Resender).
 
         :param claims:
             the claims argument can either a fully constructed batch-claim object as specified in the documentation
-            or a list of pair (username, deviceId)
-        :return: list of Result objects with the status of each operation
+            or a list of pair (username, deviceId), or any iterable (generator...) of them
+        :param summary: return a BatchSummary (number of claims which succeeded, and only the other results with the
+            index of their claim) instead of a result per claim (default: False)
+        :param max_batch_size: maximum number of claims per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :return: list of Result objects with the status of each operation, or BatchSummary (summary=True)
 
         Example:
         >>> client.owners.claim([{ "x_device_id": "object1", "username": "usertest1", "x_timestamp": "2015-01-22T00:01:25-02:00" }, { "x_device_id": "object2", "username": "usertest2" }])
         or
         >>> client.owners.claim([("usertest1","object1"), ("usertest2", "object2")])
         """
-        if isinstance(claims, list) and all([isinstance(claim, tuple) and len(claim) == 2 for claim in claims]):
-            # transform a list of (user, device) pair to a claim dictionary
-            claims = map(lambda claim: {"username": claim[0], "x_device_id": claim[1]}, claims)
-
-        [self._validate_claim(claim) for claim in claims]
+        return self._send_claims('owners/claim', claims, summary, max_batch_size, max_concurrency)
 
-        r = self.api_manager.post('owners/claim', claims)
-        return [Result(**result) for result in r.json()]
-
-    def batch_unclaim(self, unclaims):
+    def batch_unclaim(self, unclaims, summary=False, max_batch_size=1000, max_concurrency=None):
         """ Batch unclaims of owner-object combination
 
         https://smartobjects.mnubo.com/apps/doc/api_ingestion.html#post-api-v3-owners-unclaim-batch
+        Sent by chunks like `batch_claim`.
 
         :param unclaims:
             the unclaims argument can either a fully constructed batch-unclaim object as specified in the documentation
-            or a list of pair (username, deviceId)
-        :return: list of Result objects with the status of each operation
+            or a list of pair (username, deviceId), or any iterable of them
+        :param summary: return a BatchSummary instead of a result per unclaim (default: False)
+        :param max_batch_size: maximum number of unclaims per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :return: list of Result objects with the status of each operation, or BatchSummary (summary=True)
 
         Example:
         >>> client.owners.unclaim([{ "x_device_id": "object1", "username": "usertest1", "x_timestamp": "2015-01-22T00:01:25-02:00" }, { "x_device_id": "object2", "username": "usertest2" }])
         or
         >>> client.owners.unclaim([("usertest1","object1"), ("usertest2", "object2")])
         """
-        if isinstance(unclaims, list) and all([isinstance(unclaim, tuple) and len(unclaim) == 2 for unclaim in unclaims]):
-            # transform a list of (user, device) pair to a unclaim dictionary
-            unclaims = map(lambda claim: {"username": claim[0], "x_device_id": claim[1]}, unclaims)
-
-        [self._validate_claim(unclaim) for unclaim in unclaims]
-
-        r = self.api_manager.post('owners/unclaim', unclaims)
-        return [Result(**result) for result in r.json()]
+        return self._send_claims('owners/unclaim', unclaims, summary, max_batch_size, max_concurrency)
+
+    def _send_claims(self, route, claims, summary, max_batch_size, max_concurrency):
+        checked = self._check_claims(claims)
+        if isinstance(claims, (list, tuple)):
+            # nothing is sent if a claim of a list is invalid
+            checked = list(checked)
+            for _, error in checked:
+                if error is not None:
+                    raise error
+
+        def send_chunk(chunk):
+            valid = [claim for claim, error in chunk if error is None]
+            entries = iter(self.api_manager.parse(self.api_manager.post(route, valid)) if valid else [])
+            return [next(entries) if error is None else
+                    {'id': self._claim_key(claim), 'result': 'error', 'message': str(error)}
+                    for claim, error in chunk]
+
+        entries = send_batches(self.api_manager, send_chunk, checked, lambda checked: self._claim_key(checked[0]),
+                               max_batch_size, max_concurrency=max_concurrency)
+        return BatchSummary.from_entries(entries) if summary else [Result(entry) for entry in entries]
+
+    def _check_claims(self, claims):
+        """ Transforms the (username, device_id) pairs to claim dictionaries and validates the claims, as they are read
+
+        :return: generator of (claim, None), or (claim, ValueError) for the invalid claims
+        """
+        for claim in claims:
+            if isinstance(claim, tuple) and len(claim) == 2:
+                claim = {"username": claim[0], "x_device_id": claim[1]}
+            try:
+                self._validate_claim(claim)
+            except ValueError as e:
+                yield claim, e
+            else:
+                yield claim, None
+
+    def _claim_key(self, claim):
+        return claim.get('x_device_id') if isinstance(claim, dict) else None
 
     def update(self, username, owner):
         """ Updates an owner from smartobjects
@@ -137,19 +184,34 @@ class OwnersService(object):
 
         self.api_manager.put('owners/{}'.format(username), owner)
 
-    def create_update(self, owners):
+    def create_update(self, owners, summary=False, max_batch_size=1000, max_batch_bytes=None, max_concurrency=None):
         """ Create or update a batch of owners at once
 
         https://smartobjects.mnubo.com/apps/doc/api_ingestion.html#put-api-v3-owners-batch
+        Lists larger than `max_batch_size` owners are split into several requests, up to `max_concurrency` of them
+        being sent at the same time. A request which fails does not stop the others, the result of its owners is
+        `error` if the platform refused it, `failure` otherwise (they can be sent again).
 
         :param owners: list of owners to be sent to the smartobjects platform. If the owner already exists, it will be
             updated with the new content, otherwise it will be created
-        :return: list of Result objects with the status of each operation
+        :param summary: return a BatchSummary (number of owners created or updated, and only the other results with
+            the index of their owner) instead of a result per owner (default: False)
+        :param max_batch_size: maximum number of owners per request (default: 1000)
+        :param max_batch_bytes: (optional) maximum size of the body of a request before compression
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :return: list of Result objects with the status of each operation, or BatchSummary (summary=True)
         """
         [self._validate_owner(owner) for owner in owners]
 
-        r = self.api_manager.put('owners', owners)
-        return [Result(**result) for result in r.json()]
+        def send_chunk(chunk):
+            return self.api_manager.parse(self.api_manager.put('owners', chunk))
+
+        try:
+            entries = send_batches(self.api_manager, send_chunk, owners, itemgetter('username'), max_batch_size,
+                                   max_batch_bytes, max_concurrency)
+        finally:
+            self._invalidate(owner['username'] for owner in owners)
+        return BatchSummary.from_entries(entries) if summary else [Result(entry) for entry in entries]
 
     def delete(self, username):
         """ Deletes an owner from the smartobjects platform
@@ -159,7 +221,10 @@ class OwnersService(object):
         if not username:
             raise ValueError("username cannot be null or empty.")
 
-        return self.api_manager.delete('owners/{}'.format(username))
+        try:
+            return self.api_manager.delete('owners/{}'.format(username))
+        finally:
+            self._invalidate([username])
 
     def owner_exists(self, username):
         """ Checks if an owner with username `username` exists in the platform
@@ -170,24 +235,58 @@ class OwnersService(object):
 
         if not username:
             raise ValueError("username cannot be null or empty.")
+        if self.existence_cache is not None:
+            exists = self.existence_cache.get(username)
+            if exists is not None:
+                return exists
 
         r = self.api_manager.get('owners/exists/{}'.format(username))
-        json = r.json()
+        json = self.api_manager.parse(r)
         assert username in json
+        if self.existence_cache is not None:
+            self.existence_cache.put(username, json[username])
         return json[username]
 
-    def owners_exist(self, usernames):
+    def owners_exist(self, usernames, max_batch_size=1000, max_concurrency=None):
         """ Checks if owners with usernames as specified in `usernames` exist in the platform
 
         :param usernames (list): list of owner username we want to check if existing
+        :param max_batch_size: maximum number of usernames per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
         :return: result dict with the username as the key and a boolean as the value
         """
 
         if not usernames:
             raise ValueError("List of username cannot be null or empty.")
-        r = self.api_manager.post('owners/exists', usernames)
+        return dict(self.iter_owners_exist(usernames, max_batch_size, max_concurrency))
+
+    def iter_owners_exist(self, usernames, max_batch_size=1000, max_concurrency=None):
+        """ Checks the existence of the owners of any iterable of usernames, by chunks sent concurrently
 
-        result = {}
-        for owner in r.json():
-            result.update(owner)
-        return result
+        The usernames are read as the generator is consumed, only `max_concurrency` chunks are held in memory at once.
+
+        :param usernames: iterable of usernames
+        :param max_batch_size: maximum number of usernames per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :return: generator of (username, exists) tuples, in the order of `usernames`
+        """
+        return iter_exist(self.api_manager, 'owners/exists', usernames, self._exists_key, max_batch_size,
+                          max_concurrency, self.existence_cache)
+
+    def missing_owners(self, usernames, max_batch_size=1000, max_concurrency=None):
+        """ :return: set of the usernames of `usernames` which do not exist, see `iter_owners_exist` """
+        return missing(self.iter_owners_exist(usernames, max_batch_size, max_concurrency))
+
+    def owners_exist_bitmap(self, usernames, max_batch_size=1000, max_concurrency=None):
+        """ :return: ExistenceBitmap with a bit set for each username of `usernames` which exists, see
+            `iter_owners_exist` """
+        return bitmap(self.iter_owners_exist(usernames, max_batch_size, max_concurrency))
+
+    def _invalidate(self, usernames):
+        if self.existence_cache is not None:
+            self.existence_cache.invalidate_many(usernames)
+
+    def _exists_key(self, username):
+        if not username:
+            raise ValueError("username cannot be null or empty.")
+        return username
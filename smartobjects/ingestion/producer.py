@@ -0,0 +1,320 @@
+import Queue
+import atexit
+import collections
+import logging
+import threading
+import time
+import weakref
+
+from smartobjects.ingestion.dedup import event_id_key
+
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+_open_senders = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_senders():
+    # events still queued when the interpreter exits are sent rather than silently lost, for a bounded time: the exit
+    # must not hang while the platform is unreachable
+    for sender in list(_open_senders):
+        sender.close(sender.exit_timeout)
+
+
+class BatchingEventSender(object):
+    """ Sends events one at a time, grouped in batches by background workers
+
+    Events are queued by `send` and sent by `workers` background threads as soon as `max_batch_size` events (or
+    `max_batch_bytes` of serialized events) are queued, or when the oldest queued event has waited `linger` seconds.
+    The outcome of each event is reported to its delivery callback, called from a worker thread with the event, its
+    EventResult (None if the request failed) and the exception raised by the request (None if it succeeded).
+
+    When `max_queue_size` events are waiting, `send` applies the `backpressure` strategy:
+        - `block`: waits for room in the queue (at most `timeout` seconds, then raises Queue.Full)
+        - `drop_oldest`: discards the oldest queued event, whose callback receives a Queue.Full error
+        - `raise`: raises Queue.Full
+
+    Example:
+    >>> def on_delivery(event, result, error):
+    ...     if error or result.result != 'success':
+    ...         print("event not ingested", event, error or result.message)
+    >>> with BatchingEventSender(client.events, linger=0.2, on_delivery=on_delivery) as sender:
+    ...     for event in device_events():
+    ...         sender.send(event)
+    """
+
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop_oldest'
+    RAISE = 'raise'
+
+    def __init__(self, events_service, max_batch_size=1000, max_batch_bytes=None, linger=0.5, max_queue_size=10000,
+                 workers=2, backpressure=BLOCK, must_exist=False, on_delivery=None, exit_timeout=5.0):
+        """
+        :param events_service: EventsService sending the batches (the blocking one, not the asynchronous client's)
+        :param max_batch_size: maximum number of events per request (default: 1000)
+        :param max_batch_bytes: (optional) maximum size of the serialized events of a request
+        :param linger: maximum number of seconds an event waits for a batch to fill up (default: 0.5)
+        :param max_queue_size: maximum number of events waiting to be sent (default: 10000)
+        :param workers: number of batches sent concurrently (default: 2)
+        :param backpressure: behavior of `send` when the queue is full: `block`, `drop_oldest` or `raise`
+            (default: `block`)
+        :param must_exist: reject the events of unknown objects, see EventsService.send (default: False)
+        :param on_delivery: (optional) default delivery callback, called with (event, EventResult, exception)
+        :param exit_timeout: maximum number of seconds spent sending the queued events when the interpreter exits
+            without the sender being closed, the events still queued are then dropped (default: 5)
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be greater than 0.")
+        if max_batch_bytes is not None and max_batch_bytes < 1:
+            raise ValueError("max_batch_bytes must be greater than 0.")
+        if linger < 0:
+            raise ValueError("linger cannot be negative.")
+        if max_queue_size < 1 or workers < 1:
+            raise ValueError("max_queue_size and workers must be greater than 0.")
+        if backpressure not in (self.BLOCK, self.DROP_OLDEST, self.RAISE):
+            raise ValueError("Invalid 'backpressure' argument, must be one of: block, drop_oldest, raise")
+        if exit_timeout is not None and exit_timeout < 0:
+            raise ValueError("exit_timeout cannot be negative.")
+
+        self.events_service = events_service
+        self.max_batch_size = max_batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.linger = linger
+        self.max_queue_size = max_queue_size
+        self.backpressure = backpressure
+        self.must_exist = must_exist
+        self.on_delivery = on_delivery
+        self.exit_timeout = exit_timeout
+
+        self._queue = collections.deque()
+        self._queued_bytes = 0
+        self._in_flight = 0
+        self._flushing = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        self._sent = 0
+        self._failed = 0
+        self._dropped = 0
+        self._batches = 0
+
+        self._workers = [threading.Thread(target=self._run, name='smartobjects-sender-{}'.format(i))
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+        _open_senders.add(self)
+
+    def send(self, event, callback=None, timeout=None):
+        """ Queues an event
+
+        :param event: dictionary representing the event, validated immediately
+        :param callback: (optional) delivery callback of this event, `on_delivery` by default
+        :param timeout: with the `block` backpressure, maximum number of seconds to wait for room in the queue
+        :raise Queue.Full: if the queue is full (`raise` backpressure, or `block` after `timeout` seconds)
+        """
+        if not isinstance(event, dict):
+            raise ValueError("Invalid argument type for event")
+        self.events_service._validate_event(event)
+
+        size = len(self.events_service.api_manager.codec.dumps(event)) + 2 if self.max_batch_bytes else 0
+        entry = (event, size, callback or self.on_delivery, time.time())
+
+        dropped = None
+        with self._condition:
+            if self._closed:
+                raise ValueError("The sender is closed.")
+
+            if len(self._queue) >= self.max_queue_size:
+                if self.backpressure == self.RAISE:
+                    raise Queue.Full("The event queue is full.")
+                elif self.backpressure == self.DROP_OLDEST:
+                    dropped = self._queue.popleft()
+                    self._queued_bytes -= dropped[1]
+                    self._dropped += 1
+                else:
+                    self._wait_for_room(timeout)
+
+            self._queue.append(entry)
+            self._queued_bytes += size
+            self._condition.notify_all()
+
+        if dropped:
+            self._notify(dropped, None, Queue.Full("The event was dropped, the event queue is full."))
+
+    def _wait_for_room(self, timeout):
+        deadline = time.time() + timeout if timeout is not None else None
+        while len(self._queue) >= self.max_queue_size and not self._closed:
+            remaining = deadline - time.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise Queue.Full("The event queue is full.")
+            self._condition.wait(remaining)
+
+        if self._closed:
+            raise ValueError("The sender is closed.")
+
+    def flush(self, timeout=None):
+        """ Sends the queued events without waiting for the linger, and waits until they are delivered
+
+        :param timeout: (optional) maximum number of seconds to wait
+        :return: True if every event was delivered, False if the timeout expired first
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                while self._queue or self._in_flight:
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout=None):
+        """ Sends the queued events, then stops the workers. No event can be sent afterwards.
+
+        If the timeout expires first, the events still queued are dropped: their callback receives a ValueError and
+        they are counted in the `dropped` stat. The requests in flight are completed in the background.
+
+        :param timeout: (optional) maximum number of seconds to wait for the queued events to be delivered
+        :return: True if every event was delivered, False if the timeout expired first
+        """
+        delivered = self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            dropped = list(self._queue)
+            self._queue.clear()
+            self._queued_bytes = 0
+            self._dropped += len(dropped)
+            self._condition.notify_all()
+
+        if dropped:
+            logger.warning("Closing the sender: %d queued events dropped", len(dropped))
+            for entry in dropped:
+                self._notify(entry, None, ValueError("The sender was closed before the event was sent."))
+
+        if delivered:
+            for worker in self._workers:
+                if worker is not threading.current_thread():
+                    worker.join()
+        _open_senders.discard(self)
+        return delivered
+
+    def stats(self):
+        """ Delivery counters
+
+        :return: dict with `sent` (events accepted by the platform), `failed` (events rejected or whose request
+            failed), `dropped` (by the `drop_oldest` backpressure, or by `close` once its timeout expired), `batches`
+            (requests sent) and `queued`
+        """
+        with self._condition:
+            return {
+                'sent': self._sent,
+                'failed': self._failed,
+                'dropped': self._dropped,
+                'batches': self._batches,
+                'queued': len(self._queue)
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                self._in_flight += len(batch)
+                # room was made in the queue
+                self._condition.notify_all()
+
+            try:
+                self._deliver(batch)
+            finally:
+                with self._condition:
+                    self._in_flight -= len(batch)
+                    self._condition.notify_all()
+
+    def _next_batch(self):
+        """ Waits until a batch is ready and takes it from the queue, returns None once closed and empty """
+        while True:
+            if self._queue:
+                waited = time.time() - self._queue[0][3]
+                full = len(self._queue) >= self.max_batch_size or \
+                    (self.max_batch_bytes is not None and self._queued_bytes >= self.max_batch_bytes)
+                if full or self._flushing or self._closed or waited >= self.linger:
+                    return self._take_batch()
+                timeout = self.linger - waited
+            elif self._closed:
+                return None
+            else:
+                timeout = None
+            self._condition.wait(timeout)
+
+    def _take_batch(self):
+        batch, batch_bytes = [], 2
+        while self._queue and len(batch) < self.max_batch_size:
+            size = self._queue[0][1]
+            if batch and self.max_batch_bytes is not None and batch_bytes + size > self.max_batch_bytes:
+                break
+            batch.append(self._queue.popleft())
+            batch_bytes += size
+            self._queued_bytes -= size
+        return batch
+
+    def _deliver(self, entries):
+        batch, duplicates, unique = [], [], set()
+        for entry in entries:
+            # compared as strings, as by EventsService: a UUID and its string are the same id
+            event_id = event_id_key(entry[0]['event_id']) if 'event_id' in entry[0] else None
+            if event_id is not None and event_id in unique:
+                # queued twice: the whole request would be refused
+                duplicates.append(entry)
+            else:
+                unique.add(event_id)
+                batch.append(entry)
+
+        if duplicates:
+            with self._condition:
+                self._failed += len(duplicates)
+            for entry in duplicates:
+                self._notify(entry, None, ValueError("The event_id [{}] is duplicated in the batch".format(
+                    entry[0]['event_id'])))
+
+        try:
+            results = self.events_service.send([entry[0] for entry in batch], must_exist=self.must_exist,
+                                               max_batch_size=len(batch), max_concurrency=1)
+        except Exception as e:
+            with self._condition:
+                self._batches += 1
+                self._failed += len(batch)
+            for entry in batch:
+                self._notify(entry, None, e)
+            return
+
+        succeeded = sum(1 for result in results if result.result == 'success')
+        with self._condition:
+            self._batches += 1
+            self._sent += succeeded
+            self._failed += len(batch) - succeeded
+        for entry, result in zip(batch, results):
+            self._notify(entry, result, None)
+
+    def _notify(self, entry, result, error):
+        callback = entry[2]
+        if callback is None:
+            return
+        try:
+            callback(entry[0], result, error)
+        except Exception:
+            # a faulty callback must not stop the worker, the other events would never be sent
+            logger.exception("Delivery callback %r failed", callback)
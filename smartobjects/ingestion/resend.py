@@ -0,0 +1,143 @@
+import logging
+import random
+import time
+
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class ResendPolicy(object):
+    """ Decides which items of a batch are sent again, from their Result, and how many times
+
+    By default, only the `failure` results (a transient error of the platform for that item) are sent again. A
+    `conflict` means the item was already ingested, by a previous attempt for instance: it counts as delivered. The
+    other results (`notfound`, `error`...) are permanent, sending the item again would not change them.
+
+    Example:
+    >>> policy = ResendPolicy(max_attempts=5, retryable=('failure', 'notfound'), backoff_base=1)
+    """
+
+    DEFAULT_RETRYABLE = ('failure',)
+    DEFAULT_DELIVERED = ('success', 'conflict')
+
+    def __init__(self, max_attempts=3, retryable=DEFAULT_RETRYABLE, delivered=DEFAULT_DELIVERED, retry_errors=True,
+                 backoff_base=0.5, backoff_max=30.0):
+        """
+        :param max_attempts: maximum number of times an item is sent, including the first one (default: 3)
+        :param retryable: results sent again (default: `failure`)
+        :param delivered: results counted as delivered (default: `success` and `conflict`)
+        :param retry_errors: send the items again when the whole request failed with an exception (connection error,
+            server error once the retries of the API manager are exhausted), except a ValueError: the platform refused
+            the request, it would refuse it again (default: True)
+        :param backoff_base: delay in seconds before the first resend, doubled at each attempt (default: 0.5)
+        :param backoff_max: maximum delay in seconds between two attempts (default: 30)
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be greater than 0.")
+        if backoff_base < 0 or backoff_max < 0:
+            raise ValueError("Backoff delays cannot be negative.")
+
+        self.max_attempts = max_attempts
+        self.retryable = frozenset(retryable)
+        self.delivered = frozenset(delivered)
+        self.retry_errors = retry_errors
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def is_delivered(self, result):
+        return result.result in self.delivered
+
+    def is_retryable(self, result):
+        return result.result in self.retryable
+
+    def backoff(self, attempt):
+        """ Exponential backoff with full jitter: a random delay between 0 and `backoff_base` * 2 ^ attempt """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class ResendReport(object):
+    """ Outcome of each item sent by a Resender
+
+    `delivered` and `failed` are lists of (index, item, result, error) tuples sorted by index, the position of the
+    item in the list sent. `result` is the last Result of the item (None if the last attempt raised `error`).
+    """
+
+    def __init__(self):
+        self.delivered = []
+        self.failed = []
+        self.attempts = 0
+
+    @property
+    def all_delivered(self):
+        return not self.failed
+
+    def failed_items(self):
+        """ :return: the items which were not delivered, in the order they were sent """
+        return [item for _, item, _, _ in self.failed]
+
+
+class Resender(object):
+    """ Sends a batch, then sends again only the items whose result is retryable
+
+    `send` is any function taking a list of items and returning one Result per item, in the same order:
+    `EventsService.send` (with `report_results=True`), `ObjectsService.create_update` or `OwnersService.create_update`.
+
+    Example:
+    >>> resender = Resender(client.objects.create_update, ResendPolicy(max_attempts=5))
+    >>> report = resender.send(objects)
+    >>> for index, obj, result, error in report.failed:
+    ...     print(obj['x_device_id'], result.message if result else error)
+    """
+
+    def __init__(self, send, policy=None):
+        """
+        :param send: function sending a list of items and returning their Results, in order
+        :param policy: (optional) ResendPolicy, the default policy if None
+        """
+        self._send = send
+        self.policy = policy or ResendPolicy()
+
+    def send(self, items):
+        """ Sends `items` until each of them is delivered, permanently failed, or sent `max_attempts` times
+
+        :param items: list of items
+        :return: ResendReport
+        :raise ValueError: if the platform refused the whole request
+        """
+        report = ResendReport()
+        pending = [(index, item, None, None) for index, item in enumerate(items)]
+
+        while pending:
+            if report.attempts:
+                time.sleep(self.policy.backoff(report.attempts - 1))
+            report.attempts += 1
+            last_attempt = report.attempts >= self.policy.max_attempts
+
+            try:
+                results = self._send([item for _, item, _, _ in pending])
+            except ValueError:
+                raise
+            except Exception as e:
+                if last_attempt or not self.policy.retry_errors:
+                    report.failed.extend((index, item, None, e) for index, item, _, _ in pending)
+                    break
+                logger.warning("Sending %d items failed, sending them again: %s", len(pending), e)
+                continue
+
+            if len(results) != len(pending):
+                raise ValueError("Expected {} results, got {}".format(len(pending), len(results)))
+
+            retry = []
+            for (index, item, _, _), result in zip(pending, results):
+                if self.policy.is_delivered(result):
+                    report.delivered.append((index, item, result, None))
+                elif self.policy.is_retryable(result) and not last_attempt:
+                    retry.append((index, item, result, None))
+                else:
+                    report.failed.append((index, item, result, None))
+            pending = retry
+
+        report.delivered.sort(key=lambda outcome: outcome[0])
+        report.failed.sort(key=lambda outcome: outcome[0])
+        return report
@@ -0,0 +1,527 @@
+import atexit
+import binascii
+import errno
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from six import text_type
+
+from smartobjects.batching import chunked, dispatch
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+_open_spools = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_spools():
+    # the events not delivered stay on disk, they are synced so that the next process sends them
+    for spool in list(_open_spools):
+        spool.close()
+
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+CHECKPOINT = 'checkpoint'
+
+
+def _segment_name(sequence):
+    return '{}{:020d}{}'.format(SEGMENT_PREFIX, sequence, SEGMENT_SUFFIX)
+
+
+def _random_ids(count):
+    """ :return: `count` random UUIDs (version 4) as strings, from a single call to the random generator """
+    data = binascii.hexlify(os.urandom(16 * count))
+    for start in range(0, 32 * count, 32):
+        h = data[start:start + 32]
+        yield '{}-{}-4{}-{}{}-{}'.format(h[:8], h[8:12], h[13:16], '89ab'[int(h[16], 16) & 3], h[17:20], h[20:])
+
+
+def _encode_record(payload):
+    if isinstance(payload, text_type):
+        payload = payload.encode('utf-8')
+    return '{:08x} {}\n'.format(zlib.crc32(payload) & 0xffffffff, payload)
+
+
+def _decode_record(line):
+    """ :return: the payload of a record, None if it is incomplete or corrupted """
+    if len(line) < 10 or not line.endswith('\n') or line[8] != ' ':
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload) & 0xffffffff:
+            return None
+    except ValueError:
+        return None
+    return payload
+
+
+class EventSpool(object):
+    """ Write-ahead spool: events are written to the local disk first, then sent by a background thread
+
+    Appending an event only writes it to the current segment, an append-only file of the spool directory, so producers
+    keep their pace while the platform is slow or unreachable. The background thread reads the segments in order and
+    sends their events in batches (`max_batch_size` events, `max_concurrency` batches at once). A batch is only
+    acknowledged, in the `checkpoint` file, once the platform has answered: the failed requests are retried until they
+    succeed and, after a crash, the spool resumes from the last checkpoint. The delivery is at least once: a batch sent
+    right before a crash is sent again, which is why the spool gives an `event_id` to the events without one, the
+    platform rejecting the second copy instead of ingesting it twice.
+
+    Segments are rotated once they reach `segment_size` bytes and deleted once all their events are delivered.
+
+    The durability of the appended events depends on `fsync`:
+        - `always`: every call to `append`/`append_many` returns once its events are on the disk
+        - `interval`: the segment is synced at most every `fsync_interval` seconds, a crash of the host (not of the
+          process) loses the events appended in the meantime
+        - `never`: the operating system decides when to write the data
+
+    Events rejected by the platform (and batches answered with a 400 or 409 status) are not retried: they are reported
+    to the `on_delivery` callback, with their EventResult or the error, like the delivered events.
+
+    Example:
+    >>> with EventSpool(client.events, '/var/spool/smartobjects', fsync='always') as spool:
+    ...     for event in device_events():
+    ...         spool.append(event)
+    """
+
+    ALWAYS = 'always'
+    INTERVAL = 'interval'
+    NEVER = 'never'
+
+    def __init__(self, events_service, directory, segment_size=64 * 1024 * 1024, fsync=INTERVAL, fsync_interval=1.0,
+                 max_batch_size=1000, max_concurrency=None, must_exist=False, assign_ids=True, retry_backoff=0.5,
+                 retry_backoff_max=30.0, on_delivery=None):
+        """
+        :param events_service: EventsService sending the events (the blocking one, not the asynchronous client's)
+        :param directory: directory of the segments, created if needed. Only one spool at a time can use it.
+        :param segment_size: size in bytes from which a new segment is started (default: 64 MB)
+        :param fsync: when the appended events are synced to the disk: `always`, `interval` or `never`
+            (default: `interval`)
+        :param fsync_interval: with `interval`, maximum number of seconds between two syncs (default: 1)
+        :param max_batch_size: maximum number of events per request (default: 1000)
+        :param max_concurrency: maximum number of requests in flight (default: the size of the connection pool)
+        :param must_exist: reject the events of unknown objects, see EventsService.send (default: False)
+        :param assign_ids: give a random `event_id` to the events without one, so that a batch sent twice is not
+            ingested twice (default: True)
+        :param retry_backoff: delay in seconds before retrying a failed request, doubled after each failure
+            (default: 0.5)
+        :param retry_backoff_max: maximum delay in seconds between two attempts (default: 30)
+        :param on_delivery: (optional) function called from the background thread with each event (as read back
+            from the spool), its EventResult (None if the batch was rejected) and the error (None if the platform
+            answered for the event)
+        """
+        if fsync not in (self.ALWAYS, self.INTERVAL, self.NEVER):
+            raise ValueError("Invalid 'fsync' argument, must be one of: always, interval, never")
+        if segment_size < 1 or max_batch_size < 1:
+            raise ValueError("segment_size and max_batch_size must be greater than 0.")
+        if fsync_interval < 0 or retry_backoff < 0 or retry_backoff_max < 0:
+            raise ValueError("fsync_interval and retry delays cannot be negative.")
+
+        self.events_service = events_service
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = events_service._max_concurrency(max_concurrency)
+        self.must_exist = must_exist
+        self.assign_ids = assign_ids
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.on_delivery = on_delivery
+        self._codec = events_service.api_manager.codec
+
+        # the chunks are retried until the platform answers: not in the thread pool of the API manager, which would be
+        # held by the spool during an outage
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._appended = 0
+        self._delivered = 0
+        self._rejected = 0
+        self._retries = 0
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock_directory()
+        self._recover()
+
+        self._thread = threading.Thread(target=self._run, name='smartobjects-spool')
+        self._thread.daemon = True
+        self._thread.start()
+        _open_spools.add(self)
+
+    # writer
+
+    def append(self, event):
+        """ Writes an event to the spool, see `append_many` """
+        self.append_many([event])
+
+    def append_many(self, events):
+        """ Writes events to the spool, they are sent in the background
+
+        The events are validated, then written with a single write: appending many events at once is faster.
+
+        :param events: list of dictionaries representing the events
+        """
+        records = []
+        ids = _random_ids(len(events)) if self.assign_ids else None
+        for event in events:
+            if not isinstance(event, dict):
+                raise ValueError("Invalid argument type for event")
+            self.events_service._validate_event(event)
+            if ids is not None and 'event_id' not in event:
+                event = dict(event, event_id=next(ids))
+            records.append(_encode_record(self._codec.dumps(event)))
+        data = ''.join(records)
+
+        with self._condition:
+            if self._closed:
+                raise ValueError("The spool is closed.")
+            if self._write_offset and self._write_offset + len(data) > self.segment_size:
+                self._rotate()
+
+            self._writer.write(data)
+            self._writer.flush()
+            self._write_offset += len(data)
+            self._appended += len(records)
+            self._dirty = True
+            if self.fsync == self.ALWAYS or \
+                    (self.fsync == self.INTERVAL and time.time() - self._synced_at >= self.fsync_interval):
+                self._sync()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """ Waits until every appended event is delivered (or rejected)
+
+        :param timeout: (optional) maximum number of seconds to wait
+        :return: True if the spool is empty, False if the timeout expired first
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._condition:
+            while self._pending() and not self._closed:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return not self._pending()
+
+    def close(self, timeout=0):
+        """ Stops the background thread, after at most `timeout` seconds spent delivering the pending events
+
+        The events not delivered stay in the spool: they are sent once a spool is opened again on the directory. A
+        request in flight is completed first, its events are not acknowledged and sent again.
+
+        :param timeout: maximum number of seconds to wait for the pending events to be delivered, None to wait until
+            they are (default: 0)
+        :return: True if every event was delivered
+        """
+        delivered = self.flush(timeout) if timeout != 0 else not self._pending()
+        with self._condition:
+            if self._closed:
+                return delivered
+            self._closed = True
+            self._condition.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._executor.shutdown(wait=self._thread is not threading.current_thread())
+        with self._condition:
+            if self.fsync != self.NEVER:
+                self._sync()
+            self._writer.close()
+        if self._reader is not None:
+            self._reader.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+        _open_spools.discard(self)
+        return delivered
+
+    def stats(self):
+        """ Delivery counters
+
+        :return: dict with `appended` (events appended by this instance), `delivered` (events accepted by the
+            platform, or already ingested), `rejected` (events refused by the platform), `retries` (failed requests
+            retried), `pending_bytes` (size of the events not delivered yet, including the ones of a previous process)
+            and `segments` (number of segment files)
+        """
+        with self._condition:
+            return {
+                'appended': self._appended,
+                'delivered': self._delivered,
+                'rejected': self._rejected,
+                'retries': self._retries,
+                'pending_bytes': self._pending_bytes(),
+                'segments': self._write_segment - self._read_segment + 1
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # files
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _lock_directory(self):
+        self._lock_fd = None
+        if fcntl is None:
+            return
+        fd = os.open(self._path('.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            os.close(fd)
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                raise ValueError("Spool directory {} is used by another spool.".format(self.directory))
+            raise
+        self._lock_fd = fd
+
+    def _segments(self):
+        return sorted(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+
+    def _load_checkpoint(self):
+        try:
+            with open(self._path(CHECKPOINT)) as f:
+                data = json.load(f)
+            return data['segment'], data['offset']
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def _save_checkpoint(self, segment, offset):
+        temporary = self._path(CHECKPOINT + '.tmp')
+        with open(temporary, 'w') as f:
+            json.dump({'segment': segment, 'offset': offset}, f)
+            if self.fsync != self.NEVER:
+                f.flush()
+                os.fsync(f.fileno())
+        # atomic: a crash leaves either the previous checkpoint or the new one
+        os.rename(temporary, self._path(CHECKPOINT))
+
+    def _recover(self):
+        """ Resumes from the checkpoint and truncates the record torn by a crash, if any """
+        segments = self._segments()
+        checkpoint = self._load_checkpoint() or (segments[0] if segments else 0, 0)
+
+        # segments already delivered, left by a crash during the compaction
+        for sequence in segments:
+            if sequence < checkpoint[0]:
+                os.remove(self._path(_segment_name(sequence)))
+        segments = [sequence for sequence in segments if sequence >= checkpoint[0]]
+
+        if segments and segments[0] > checkpoint[0]:
+            checkpoint = (segments[0], 0)
+        self._read_segment, self._read_offset = checkpoint
+        self._reader = None
+
+        self._write_segment = segments[-1] if segments else self._read_segment
+        path = self._path(_segment_name(self._write_segment))
+        self._write_offset = self._valid_length(path) if os.path.exists(path) else 0
+        self._writer = open(path, 'ab')
+        self._writer.truncate(self._write_offset)
+        if self._read_segment == self._write_segment:
+            # without fsync, a crash of the host can lose records already acknowledged
+            self._read_offset = min(self._read_offset, self._write_offset)
+        self._synced_at = time.time()
+        self._dirty = False
+
+    def _valid_length(self, path):
+        """ :return: the size of the complete and valid records at the beginning of the segment """
+        length = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if _decode_record(line) is None:
+                    logger.warning("Discarding the incomplete record at offset %d of %s", length, path)
+                    break
+                length += len(line)
+        return length
+
+    def _sync(self):
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._synced_at = time.time()
+        self._dirty = False
+
+    def _rotate(self):
+        if self.fsync != self.NEVER:
+            self._sync()
+        self._writer.close()
+        self._write_segment += 1
+        self._write_offset = 0
+        self._writer = open(self._path(_segment_name(self._write_segment)), 'ab')
+
+    def _pending(self):
+        return (self._read_segment, self._read_offset) < (self._write_segment, self._write_offset)
+
+    def _pending_bytes(self):
+        total = self._write_offset - (self._read_offset if self._read_segment == self._write_segment else 0)
+        for sequence in range(self._read_segment, self._write_segment):
+            try:
+                total += os.path.getsize(self._path(_segment_name(sequence)))
+            except OSError:
+                pass
+            if sequence == self._read_segment:
+                total -= self._read_offset
+        return total
+
+    # background sender
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending() and not self._closed:
+                    timeout = None
+                    if self._dirty and self.fsync == self.INTERVAL:
+                        timeout = max(0, self._synced_at + self.fsync_interval - time.time())
+                        if timeout == 0:
+                            self._sync()
+                            continue
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                end = self._write_offset if self._read_segment == self._write_segment else None
+
+            if not self._drain_segment(end):
+                return
+
+    def _drain_segment(self, end):
+        """ Sends the next events of the segment being read, up to `end` (the end of the file if None)
+
+        :return: False if the spool was closed in the meantime
+        """
+        if self._reader is None:
+            self._reader = open(self._path(_segment_name(self._read_segment)), 'rb')
+        self._reader.seek(self._read_offset)
+
+        # (event, offset of the end of its record)
+        records, start = [], self._read_offset
+        offset = start
+        limit = self.max_batch_size * self.max_concurrency
+        while len(records) < limit and (end is None or offset < end):
+            line = self._reader.readline()
+            if not line:
+                break
+            offset += len(line)
+            payload = _decode_record(line)
+            if payload is None:
+                logger.error("Skipping the corrupted record at offset %d of %s", offset - len(line), self._reader.name)
+                continue
+            records.append((self._codec.loads(payload), offset))
+
+        if records and not self._deliver(records):
+            return False
+
+        if offset == start and end is None:
+            # nothing left before the end of a complete segment: the next one is read, this one is deleted
+            self._reader.close()
+            self._reader = None
+            self._acknowledge(self._read_segment + 1, 0)
+            os.remove(self._path(_segment_name(self._read_segment - 1)))
+        else:
+            self._acknowledge(self._read_segment, offset)
+        return True
+
+    def _acknowledge(self, segment, offset):
+        self._save_checkpoint(segment, offset)
+        with self._condition:
+            self._read_segment, self._read_offset = segment, offset
+            self._condition.notify_all()
+
+    def _deliver(self, records):
+        """ Sends the events of `records` by chunks of `max_batch_size`, `max_concurrency` chunks at once
+
+        Each chunk is acknowledged, in order, once the platform has answered for its events: a failed request only
+        retries its own chunk.
+
+        :param records: list of (event, offset of the end of its record)
+        :return: False if the spool was closed before every chunk was answered
+        """
+        batch, duplicates, unique = [], [], set()
+        for record in records:
+            event_id = record[0].get('event_id')
+            if event_id is not None and event_id in unique:
+                # appended twice: the whole request would be refused
+                duplicates.append(record[0])
+            else:
+                unique.add(event_id)
+                batch.append(record)
+
+        chunks = list(chunked(batch, self.max_batch_size))
+        outcomes = dispatch(self._executor, self._deliver_chunk, chunks, self.max_concurrency)
+        try:
+            for index, outcome in enumerate(outcomes):
+                chunk = chunks[index]
+                if outcome is None:
+                    return False
+                results, error = outcome
+                # a conflict is an event already ingested: sent right before a crash, or by a retried request
+                delivered = sum(1 for result in results
+                                if result is not None and result.result in self.events_service.DELIVERED_RESULTS)
+                with self._condition:
+                    self._delivered += delivered
+                    self._rejected += len(chunk) - delivered
+                for (event, _), result in zip(chunk, results):
+                    self._notify(event, result, error)
+                self._acknowledge(self._read_segment, chunk[-1][1])
+        finally:
+            outcomes.close()
+
+        with self._condition:
+            self._rejected += len(duplicates)
+        for event in duplicates:
+            self._notify(event, None, ValueError("The event_id [{}] is duplicated in the spool".format(
+                event['event_id'])))
+        return True
+
+    def _deliver_chunk(self, chunk):
+        """ Sends a chunk until the platform answers for its events
+
+        :return: (list of EventResult, None), or (list of None, error) if the platform refused the request, None if
+            the spool was closed before
+        """
+        events = [event for event, _ in chunk]
+        attempt = 0
+        while True:
+            try:
+                # a single request: the chunks are already sent concurrently
+                return self.events_service.send(events, must_exist=self.must_exist,
+                                                max_batch_size=self.max_batch_size, max_concurrency=1), None
+            except ValueError as e:
+                # refused by the platform (400, 409): sending it again would fail again
+                return [None] * len(events), e
+            except Exception as e:
+                delay = min(self.retry_backoff_max, self.retry_backoff * 2 ** attempt)
+                logger.warning("Sending %d spooled events failed, retrying in %.1fs: %s", len(events), delay, e)
+                attempt += 1
+                with self._condition:
+                    self._retries += 1
+                    if not self._closed:
+                        self._condition.wait(delay)
+                    if self._closed:
+                        return None
+
+    def _notify(self, event, result, error):
+        if self.on_delivery is None:
+            return
+        try:
+            self.on_delivery(event, result, error)
+        except Exception:
+            # a faulty callback must not stop the spool, the events would never be acknowledged
+            logger.exception("Delivery callback %r failed", self.on_delivery)
@@ -0,0 +1,210 @@
+import math
+import threading
+import time
+
+
+class RequestMetrics(object):
+    """ Measures of one API request, passed to the observers once the request is completed
+
+    Times are in seconds. For a streamed body, serialization and compression happen while the body is sent: their
+    time is also included in `network_seconds`.
+    """
+
+    def __init__(self, method, route):
+        """
+        :param method: HTTP method
+        :param route: route template (see `route_template`)
+        """
+        self.method = method
+        self.route = route
+        self.started_at = time.time()
+        self.status = None
+        self.error = None
+        self.attempts = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.response_bytes = 0
+        self.serialize_seconds = 0.0
+        self.compress_seconds = 0.0
+        self.network_seconds = 0.0
+        self.total_seconds = 0.0
+
+
+class RequestObserver(object):
+    """ Receives the measures of the requests sent by an API manager
+
+    Observers are called synchronously by the thread which sent the request: they must be fast and thread-safe.
+    Subclasses override the methods they need.
+    """
+
+    def on_request(self, metrics):
+        """ Called once a request is completed (or failed)
+
+        :param metrics: RequestMetrics
+        """
+        pass
+
+    def on_parse(self, route, seconds, size):
+        """ Called once the body of a response is parsed
+
+        :param route: route template of the request
+        :param seconds: time spent parsing
+        :param size: size of the body in bytes
+        """
+        pass
+
+
+class Histogram(object):
+    """ Distribution of positive values in logarithmic buckets
+
+    Each bucket is `growth` times as wide as the previous one, so a percentile is reported with a relative error of at
+    most `growth - 1`, with a constant memory whatever the number of values.
+    """
+
+    def __init__(self, minimum=1e-5, growth=1.05):
+        """
+        :param minimum: values lower than that are counted in the first bucket (default: 10 microseconds)
+        :param growth: ratio between the bounds of two consecutive buckets (default: 1.05)
+        """
+        self.minimum = minimum
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self._buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+        self.min = None
+
+    def add(self, value):
+        index = int(math.log(value / self.minimum) / self._log_growth) if value > self.minimum else 0
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = value if self.max is None else max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def percentile(self, percent):
+        """ :return: the value under which `percent` percent of the values are, None if the histogram is empty """
+        if not self.count:
+            return None
+
+        rank = math.ceil(self.count * percent / 100.0)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                # upper bound of the bucket, never above the largest value seen
+                return min(self.minimum * self.growth ** (index + 1), self.max)
+        return self.max
+
+    def snapshot(self, percentiles=(50, 90, 99)):
+        """ :return: dict with `count`, `mean`, `min`, `max` and `p<percent>` for each of `percentiles` """
+        result = {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max
+        }
+        for percent in percentiles:
+            result['p{}'.format(percent)] = self.percentile(percent)
+        return result
+
+
+class RouteMetrics(object):
+    """ Aggregated measures of one route """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.attempts = 0
+        self.statuses = {}
+        self.latency = Histogram()
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.response_bytes = 0
+        self.serialize_seconds = 0.0
+        self.compress_seconds = 0.0
+        self.network_seconds = 0.0
+        self.parse_seconds = 0.0
+
+    def add(self, metrics):
+        self.requests += 1
+        self.attempts += metrics.attempts
+        if metrics.error is not None:
+            self.errors += 1
+        if metrics.status is not None:
+            self.statuses[metrics.status] = self.statuses.get(metrics.status, 0) + 1
+        self.latency.add(metrics.total_seconds)
+        self.raw_bytes += metrics.raw_bytes
+        self.sent_bytes += metrics.sent_bytes
+        self.response_bytes += metrics.response_bytes
+        self.serialize_seconds += metrics.serialize_seconds
+        self.compress_seconds += metrics.compress_seconds
+        self.network_seconds += metrics.network_seconds
+
+    def as_dict(self, percentiles):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'attempts': self.attempts,
+            'statuses': dict(self.statuses),
+            'latency': self.latency.snapshot(percentiles),
+            'raw_bytes': self.raw_bytes,
+            'sent_bytes': self.sent_bytes,
+            'response_bytes': self.response_bytes,
+            'serialize_seconds': self.serialize_seconds,
+            'compress_seconds': self.compress_seconds,
+            'network_seconds': self.network_seconds,
+            'parse_seconds': self.parse_seconds
+        }
+
+
+class MetricsRegistry(RequestObserver):
+    """ Observer aggregating the measures of the requests per route template, in memory
+
+    Example:
+    >>> registry = MetricsRegistry()
+    >>> client = SmartObjectsClient(CLIENT_ID, CLIENT_SECRET, Environments.Production, observers=[registry])
+    >>> client.events.send(events)
+    >>> registry.snapshot()['events']
+    {'requests': 1, 'statuses': {200: 1}, 'latency': {'p50': 0.105, 'p99': 0.105, ...}, 'sent_bytes': 1520, ...}
+    """
+
+    def __init__(self, percentiles=(50, 90, 99)):
+        """
+        :param percentiles: latency percentiles reported by `snapshot` (default: 50, 90 and 99)
+        """
+        self.percentiles = percentiles
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def _route(self, route):
+        metrics = self._routes.get(route)
+        if metrics is None:
+            metrics = self._routes.setdefault(route, RouteMetrics())
+        return metrics
+
+    def on_request(self, metrics):
+        with self._lock:
+            self._route(metrics.route).add(metrics)
+
+    def on_parse(self, route, seconds, size):
+        with self._lock:
+            self._route(route).parse_seconds += seconds
+
+    def snapshot(self):
+        """ Measures per route template
+
+        :return: dict of route template: dict with `requests`, `errors` (requests which raised an exception),
+            `attempts` (including retries and re-authentications), `statuses` (count per HTTP status of the last
+            attempt), `latency` (see Histogram.snapshot), `raw_bytes` (body before compression), `sent_bytes`,
+            `response_bytes` and the total time in seconds spent in each step: `serialize_seconds`,
+            `compress_seconds`, `network_seconds` and `parse_seconds`
+        """
+        with self._lock:
+            return {route: metrics.as_dict(self.percentiles) for route, metrics in self._routes.items()}
+
+    def reset(self):
+        """ Discards every measure """
+        with self._lock:
+            self._routes = {}
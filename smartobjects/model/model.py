@@ -19,4 +19,4 @@ class ModelService(object):
         >>>        print(obj.key)
         >>>        print(obj.description)
         """
-        return Model(self.api_manager.get('model/export').json())
\ No newline at end of file
+        return Model(self.api_manager.parse(self.api_manager.get('model/export')))
\ No newline at end of file
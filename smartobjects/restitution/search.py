@@ -22,8 +22,8 @@ class SearchService(object):
         >>> "Got {} results!".format(len(resultset))
         Got 42 results!
         """
-        r = self.api_manager.post('search/basic', query)
-        return ResultSet(r.json())
+        r = self.api_manager.post('search/basic', query, idempotent=True)
+        return ResultSet(self.api_manager.parse(r))
 
     def get_datasets(self):
         """ Retrieves the datasets available for the current namespace
@@ -38,7 +38,7 @@ class SearchService(object):
         temperature
         """
         r = self.api_manager.get('search/datasets')
-        return {dataset['key']: DataSet(dataset) for dataset in r.json()}
+        return {dataset['key']: DataSet(dataset) for dataset in self.api_manager.parse(r)}
 
     def validate_query(self, query):
         """ Validates the search query for easier development and reduced errors
@@ -50,6 +50,6 @@ class SearchService(object):
         >>> result.is_valid, result.validation_errors
         (False, ["a query must have a 'from' field"])
         """
-        r = self.api_manager.post('search/validateQuery', query)
-        return QueryValidationResult(r.json())
+        r = self.api_manager.post('search/validateQuery', query, idempotent=True)
+        return QueryValidationResult(self.api_manager.parse(r))
 
@@ -0,0 +1,206 @@
+import calendar
+import email.utils
+import random
+import threading
+import time
+
+import requests
+from requests.packages.urllib3.exceptions import NewConnectionError
+
+
+class RetryPolicy(object):
+    """ Configuration of the retries of transient failures (throttling, gateway errors, connection resets)
+
+    Example:
+    >>> policy = RetryPolicy(statuses={429: 8, 503: 5}, backoff_base=0.2)
+    >>> client = SmartObjectsClient(CLIENT_ID, CLIENT_SECRET, Environments.Production, retry_policy=policy)
+    """
+
+    DEFAULT_STATUSES = {429: 5, 502: 3, 503: 5, 504: 3}
+
+    # statuses guaranteeing the request was not processed: safe to retry even for non idempotent requests
+    NOT_PROCESSED_STATUSES = (429, 503)
+
+    IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE', 'HEAD', 'OPTIONS')
+
+    def __init__(self, statuses=None, connection_errors=3, backoff_base=0.5, backoff_max=30.0,
+                 respect_retry_after=True, max_retry_after=60.0, budget_ratio=0.2, budget_min_per_second=1.0):
+        """
+        :param statuses: dict of retried HTTP statuses with the maximum number of retries for each
+            (default: 429: 5, 502: 3, 503: 5, 504: 3)
+        :param connection_errors: maximum number of retries after a connection error or timeout (default: 3)
+        :param backoff_base: delay in seconds before the first retry, doubled at each attempt (default: 0.5)
+        :param backoff_max: maximum delay in seconds between two attempts (default: 30)
+        :param respect_retry_after: wait for the delay requested by the `Retry-After` header if any (default: True)
+        :param max_retry_after: give up when `Retry-After` requests a longer wait, in seconds (default: 60)
+        :param budget_ratio: retries allowed per request sent by the client, over time (default: 0.2)
+        :param budget_min_per_second: retries always allowed per second, regardless of the traffic (default: 1)
+        """
+        self.statuses = dict(self.DEFAULT_STATUSES if statuses is None else statuses)
+        self.connection_errors = connection_errors
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = max_retry_after
+        self.budget_ratio = budget_ratio
+        self.budget_min_per_second = budget_min_per_second
+
+        if backoff_base < 0 or backoff_max < 0:
+            raise ValueError("Backoff delays cannot be negative.")
+
+    def max_retries(self, method, idempotent, status=None, error=None):
+        """ Number of retries allowed for a failed attempt, 0 if it must not be retried
+
+        Non idempotent requests (POST) are only retried when the server did not process them: 429 and 503 statuses,
+        or a failure to connect (timeout or refused connection).
+        """
+        idempotent = method in self.IDEMPOTENT_METHODS if idempotent is None else idempotent
+
+        if error is not None:
+            if not idempotent and not self.not_connected(error):
+                return 0
+            return self.connection_errors
+
+        if not idempotent and status not in self.NOT_PROCESSED_STATUSES:
+            return 0
+        return self.statuses.get(status, 0)
+
+    @staticmethod
+    def not_connected(error):
+        """ :return: True if `error` is a failure to connect to the server: the request was not sent """
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+            return False
+        # refused connection: requests wraps the NewConnectionError of urllib3 in a MaxRetryError
+        reason = getattr(error.args[0], 'reason', error.args[0])
+        return isinstance(reason, NewConnectionError)
+
+    def backoff(self, attempt):
+        """ Exponential backoff with full jitter: a random delay between 0 and `backoff_base` * 2 ^ attempt """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def parse_retry_after(value):
+        """ Parses a `Retry-After` header (number of seconds or HTTP date)
+
+        :return: the delay in seconds or None if the header is invalid
+        """
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(parsed) - calendar.timegm(time.gmtime()))
+
+
+class RetryBudget(object):
+    """ Limits the retries to a fraction of the requests sent, so that retries cannot amplify an outage
+
+    Every request deposits `ratio` in the budget (up to the amount earned by the last 1000 requests), every retry
+    withdraws 1. A reserve of `min_per_second` retries per second (accumulated over 10 seconds) lets low traffic
+    clients retry as well.
+    """
+
+    WINDOW_REQUESTS = 1000
+    WINDOW_SECONDS = 10
+
+    def __init__(self, ratio, min_per_second):
+        self._ratio = ratio
+        self._min_per_second = min_per_second
+        self._reserve = max(min_per_second * self.WINDOW_SECONDS, 1.0)
+        self._cap = self._reserve + ratio * self.WINDOW_REQUESTS
+        self._balance = self._reserve
+        self._last_refill = time.time()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._balance = min(self._cap, self._balance + self._ratio)
+
+    def withdraw(self):
+        """ :return: True if the retry is allowed by the budget """
+        with self._lock:
+            self._refill()
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+    def _refill(self):
+        now = time.time()
+        if self._balance < self._reserve:
+            self._balance = min(self._reserve, self._balance + (now - self._last_refill) * self._min_per_second)
+        self._last_refill = now
+
+
+class Retrier(object):
+    """ Applies a RetryPolicy for one API manager and keeps its retry budget and counters """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self._budget = RetryBudget(policy.budget_ratio, policy.budget_min_per_second)
+        self._lock = threading.Lock()
+        self._retries = 0
+        self._give_ups = 0
+        self._budget_exhausted = 0
+
+    def on_request(self):
+        """ Must be called for every new request (not for the retries) """
+        self._budget.deposit()
+
+    def next_delay(self, method, attempt, idempotent=None, response=None, error=None):
+        """ Decides if a failed attempt should be retried
+
+        :param method: HTTP method of the request
+        :param attempt: number of retries already done for this request
+        :param idempotent: overrides the idempotency deduced from the method
+        :param response: the response received (if any)
+        :param error: the exception raised while sending the request (if any)
+        :return: the number of seconds to wait before retrying or None to stop here
+        """
+        status = response.status_code if response is not None else None
+        allowed = self.policy.max_retries(method, idempotent, status, error)
+        if not allowed:
+            return None
+
+        if attempt >= allowed:
+            self._count('_give_ups')
+            return None
+
+        delay = self.policy.backoff(attempt)
+        if response is not None and self.policy.respect_retry_after:
+            retry_after = self.policy.parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                if retry_after > self.policy.max_retry_after:
+                    self._count('_give_ups')
+                    return None
+                delay = retry_after
+
+        if not self._budget.withdraw():
+            self._count('_budget_exhausted')
+            self._count('_give_ups')
+            return None
+
+        self._count('_retries')
+        return delay
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        """ Retry counters
+
+        :return: dict with `retries`, `give_ups` and `budget_exhausted` (give ups caused by the retry budget)
+        """
+        return {
+            'retries': self._retries,
+            'give_ups': self._give_ups,
+            'budget_exhausted': self._budget_exhausted
+        }
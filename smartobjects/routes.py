@@ -0,0 +1,41 @@
+import re
+
+
+STATIC_ROUTES = frozenset([
+    'events', 'events/exists',
+    'objects', 'objects/exists',
+    'owners', 'owners/exists', 'owners/claim', 'owners/unclaim',
+    'search/basic', 'search/datasets', 'search/validateQuery',
+    'model/export'
+])
+
+ROUTE_TEMPLATES = [
+    (re.compile(r'^events/exists/.+$'), 'events/exists/{event_id}'),
+    (re.compile(r'^objects/exists/.+$'), 'objects/exists/{x_device_id}'),
+    (re.compile(r'^owners/exists/.+$'), 'owners/exists/{username}'),
+    (re.compile(r'^objects/.+/events$'), 'objects/{x_device_id}/events'),
+    (re.compile(r'^owners/.+/objects/.+/claim$'), 'owners/{username}/objects/{x_device_id}/claim'),
+    (re.compile(r'^owners/.+/objects/.+/unclaim$'), 'owners/{username}/objects/{x_device_id}/unclaim'),
+    (re.compile(r'^owners/.+/password$'), 'owners/{username}/password'),
+    (re.compile(r'^objects/.+$'), 'objects/{x_device_id}'),
+    (re.compile(r'^owners/.+$'), 'owners/{username}'),
+]
+
+
+def route_template(route):
+    """ Returns the template of a resource path, used to aggregate statistics per API route
+
+    The query string is ignored and identifiers are replaced by a placeholder:
+    >>> route_template('objects/vin1234/events?report_results=true')
+    'objects/{x_device_id}/events'
+    >>> route_template('owners/claim')
+    'owners/claim'
+    """
+    path = route.split('?', 1)[0]
+    if path in STATIC_ROUTES:
+        return path
+
+    for pattern, template in ROUTE_TEMPLATES:
+        if pattern.match(path):
+            return template
+    return path
@@ -16,17 +16,50 @@ class SmartObjectsClient(object):
     """ Initializes the smartobjects client which contains the API manager as well as the available resource services
     """
 
-    def __init__(self, client_id, client_secret, environment, compression_enabled=True):
+    def __init__(self, client_id, client_secret, environment, compression_enabled=True,
+                 pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True,
+                 background_token_refresh=True, token_refresh_margin=60, retry_policy=None, stream_chunk_size=None,
+                 codec=None, lazy=False, token_store=None, observers=None, event_dedup_index=None,
+                 object_existence_cache=None, owner_existence_cache=None):
         """ Initialization of the smartobjects client
 
         The client exposes the Events, Objects, Owners and Search services.
-        Initialization will fetch an API token with the id and secret provided.
+        Initialization will fetch an API token with the id and secret provided, unless `lazy` is True.
+
+        A client is thread-safe: a single instance should be shared by all the threads of a process, they will reuse
+        the same access token and the same pool of HTTP connections.
 
         :param client_id (string): client_id part of the OAuth 2.0 credentials (available in your dashboard)
         :param client_secret (string): client_secret part of the OAuth 2.0 credentials (available in your dashboard)
         :param environment: either Environments.Sandbox or Environments.Production
             (note: client_id and client_secret are unique per environment)
-        :param compression_enabled: gzip compress the request body (default: True)
+        :param compression_enabled: gzip compress the request body (default: True), or a CompressionPolicy to
+            choose the compression level and which bodies are compressed
+        :param pool_connections: number of per-host connection pools to cache (default: 10)
+        :param pool_maxsize: maximum number of connections kept open, should match the number of threads sharing
+            this client (default: 10)
+        :param pool_block: wait for a free connection when all `pool_maxsize` connections are in use (default: False)
+        :param keep_alive: reuse connections across requests (default: True)
+        :param background_token_refresh: renew the access token in the background before it expires (default: True)
+        :param token_refresh_margin: number of seconds before its expiration the access token is renewed (default: 60)
+        :param retry_policy: (optional) RetryPolicy applied to transient failures (429, 502, 503, 504, connection
+            errors), no retry by default
+        :param stream_chunk_size: (optional) stream compressed request bodies in chunks of about that many bytes
+            instead of building the whole body in memory
+        :param codec: (optional) name of the JSON library used to serialize requests and parse responses (`orjson`,
+            `ujson`, `simplejson` or `json`), the fastest one installed by default
+        :param lazy: do not contact the platform at initialization, the access token is fetched by the first request
+            or by an explicit call to `warmup()` (default: False)
+        :param token_store: (optional) TokenStore sharing the access token between the processes using the same
+            credentials, e.g. FileTokenStore() for prefork servers and worker pools
+        :param observers: (optional) list of RequestObserver notified of the latency, sizes and status of every
+            request, e.g. a MetricsRegistry
+        :param event_dedup_index: (optional) EventIdIndex of the event ids already delivered: the events sent again
+            (by an at-least-once upstream for instance) are dropped before being serialized,
+            e.g. LruEventIdIndex(100000)
+        :param object_existence_cache: (optional) ExistenceCache of the answers to the existence checks of objects,
+            e.g. ExistenceCache(positive_ttl=3600, negative_ttl=60)
+        :param owner_existence_cache: (optional) ExistenceCache of the answers to the existence checks of owners
 
         :note: Do not expose publicly code containing your client_id and client_secret
         .. seealso:: examples/simple_workflow.py
@@ -35,9 +68,49 @@ class SmartObjectsClient(object):
         if environment not in (Environments.Sandbox, Environments.Production):
             raise ValueError("Invalid 'environment' argument, must be one of: Environments.Sandbox, Environments.Production")
 
-        self._api_manager = APIManager(client_id, client_secret, environment, compression_enabled)
-        self.owners = OwnersService(self._api_manager)
-        self.events = EventsService(self._api_manager)
-        self.objects = ObjectsService(self._api_manager)
+        self._api_manager = APIManager(client_id, client_secret, environment, compression_enabled,
+                                       pool_connections, pool_maxsize, pool_block, keep_alive,
+                                       token_refresh_margin=token_refresh_margin,
+                                       background_token_refresh=background_token_refresh,
+                                       retry_policy=retry_policy, stream_chunk_size=stream_chunk_size,
+                                       codec=codec, lazy=lazy, token_store=token_store, observers=observers)
+        self.owners = OwnersService(self._api_manager, owner_existence_cache)
+        self.events = EventsService(self._api_manager, event_dedup_index)
+        self.objects = ObjectsService(self._api_manager, object_existence_cache)
         self.search = SearchService(self._api_manager)
         self.model = ModelService(self._api_manager)
+
+    def warmup(self):
+        """ Checks that the platform is reachable and fetches the access token
+
+        Only useful with a lazy client, to pay the connection and authentication round trips at a convenient time
+        instead of on the first request.
+        """
+        self._api_manager.warmup()
+
+    def token_stats(self):
+        """ Statistics about the access token refreshes
+
+        :return: dict with `refresh_count`, `shared_count`, `failure_count`, `last_latency` and `average_latency`
+            (in seconds)
+        """
+        return self._api_manager.token_manager.stats()
+
+    def retry_stats(self):
+        """ Retry counters
+
+        :return: dict with `retries`, `give_ups` and `budget_exhausted`, None if no retry policy is configured
+        """
+        return self._api_manager.retry_stats()
+
+    def compression_stats(self):
+        """ Compression statistics per route
+
+        :return: dict of route template: statistics, see CompressionPolicy.stats (empty if compression is disabled)
+        """
+        policy = self._api_manager.compression_policy
+        return policy.stats() if policy else {}
+
+    def close(self):
+        """ Stops the background token refresh and closes the HTTP connections """
+        self._api_manager.close()
@@ -0,0 +1,196 @@
+import atexit
+import datetime
+import random
+import threading
+import time
+import weakref
+
+
+_background_managers = weakref.WeakSet()
+
+
+@atexit.register
+def _stop_background_refresh():
+    # background timers must not fire while the interpreter tears down the modules they use
+    for manager in list(_background_managers):
+        manager.stop(wait=True)
+
+
+class TokenManager(object):
+    """ Keeps a valid access token for an API manager
+
+    Refreshes are single-flight: when several threads find the token expired (or rejected with a 401) at the same
+    time, only the first one requests a new token, the others wait for it and reuse the result.
+
+    With `background_refresh`, the token is renewed by a daemon timer `margin` seconds (plus a random jitter of up
+    to `jitter` seconds, so that several clients do not refresh at the exact same time) before it expires: requests
+    never pay the round trip to the authentication endpoint.
+
+    With a `store`, tokens are also shared between processes: a refresh first looks for a newer token saved by
+    another process, and only requests one when there is none.
+    """
+
+    def __init__(self, fetch, margin=60, jitter=30, background_refresh=True, store=None, store_key=None):
+        """
+        :param fetch: function requesting a new token, returns a dict with `access_token`, `expires_in`
+            (timedelta) and `requested_at` (datetime)
+        :param margin: number of seconds before the expiration at which the token is refreshed (default: 60)
+        :param jitter: maximum number of seconds randomly added to the margin (default: 30)
+        :param background_refresh: if True, refresh the token from a background timer instead of the thread
+            sending the request (default: True)
+        :param store: (optional) TokenStore shared with other processes
+        :param store_key: key of the token in the store, identifies the credentials and the environment
+        """
+        if margin < 0 or jitter < 0:
+            raise ValueError("Token refresh margin and jitter cannot be negative.")
+
+        self._fetch = fetch
+        self._margin = datetime.timedelta(seconds=margin)
+        self._jitter = jitter
+        self._background_refresh = background_refresh
+        self._store = store
+        self._store_key = store_key
+
+        self._lock = threading.Lock()
+        self._timer = None
+        self._stopped = False
+        self._token = None
+
+        self._refresh_count = 0
+        self._shared_count = 0
+        self._failure_count = 0
+        self._total_latency = 0.0
+        self._last_latency = None
+
+    @property
+    def token(self):
+        """the current token (can be None or expired)"""
+        return self._token
+
+    @token.setter
+    def token(self, value):
+        self._token = value
+
+    def is_valid(self, token=None, margin=None):
+        """ Validates if the token (the current one by default) is still valid
+
+        :param margin: the token is considered expired that many seconds before its actual expiration
+        :return: True if the token is still valid, False if it is expired
+        """
+        token = token if token is not None else self._token
+        if token is None:
+            return False
+        margin = self._margin if margin is None else datetime.timedelta(seconds=margin)
+        return (token['requested_at'] + token['expires_in'] - margin) > datetime.datetime.now()
+
+    def get_token(self):
+        """ Returns a valid token, requesting a new one if needed
+
+        Without background refresh, the token is renewed as soon as it enters the safety margin.
+        """
+        token = self._token
+        if not self.is_valid(token, 0 if self._background_refresh else None):
+            token = self.refresh(token)
+        return token
+
+    def invalidate(self, token):
+        """ Discards a token rejected by the API and returns a new one
+
+        Only the first caller invalidating a given token triggers a refresh.
+        """
+        return self.refresh(token)
+
+    def refresh(self, stale):
+        """ Requests a new token unless `stale` has already been replaced by another thread
+
+        :param stale: the token the caller considers invalid
+        :return: the new token
+        """
+        with self._lock:
+            if self._token is not stale:
+                return self._token
+
+            if self._store is None:
+                token = self._fetch_token()
+            else:
+                with self._store.lock(self._store_key):
+                    token = self._store.load(self._store_key)
+                    if self._is_newer(token, stale):
+                        self._shared_count += 1
+                    else:
+                        token = self._fetch_token()
+                        self._store.save(self._store_key, token)
+
+            self._token = token
+            self._schedule(token)
+            return token
+
+    def _is_newer(self, token, stale):
+        # a token saved by another process, which does not need to be refreshed yet
+        if token is None or (stale is not None and token['access_token'] == stale['access_token']):
+            return False
+        return self.is_valid(token)
+
+    def _fetch_token(self):
+        start = time.time()
+        try:
+            token = self._fetch()
+        except Exception:
+            self._failure_count += 1
+            raise
+        self._last_latency = time.time() - start
+        self._total_latency += self._last_latency
+        self._refresh_count += 1
+        return token
+
+    def _schedule(self, token):
+        if not self._background_refresh or self._stopped:
+            return
+
+        if self._timer:
+            self._timer.cancel()
+
+        # a token loaded from the store may have been requested a while ago
+        remaining = (token['requested_at'] + token['expires_in'] - datetime.datetime.now()).total_seconds()
+        delay = remaining - self._margin.total_seconds() - random.uniform(0, self._jitter)
+        self._start_timer(max(delay, remaining / 2.0, 0))
+
+    def _start_timer(self, delay):
+        _background_managers.add(self)
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        try:
+            self.refresh(self._token)
+        except Exception:
+            # the token will be refreshed by the next request if it expires before we can try again
+            if not self._stopped:
+                self._start_timer(min(30.0, max(1.0, self._margin.total_seconds() / 4.0)))
+
+    def stop(self, wait=False):
+        """ Cancels the background refresh
+
+        :param wait: if True, waits for the background timer to exit
+        """
+        self._stopped = True
+        timer = self._timer
+        if timer:
+            timer.cancel()
+            if wait and timer is not threading.current_thread():
+                timer.join()
+
+    def stats(self):
+        """ Statistics about the token refreshes
+
+        :return: dict with `refresh_count` (tokens requested), `shared_count` (tokens reused from the store),
+            `failure_count`, `last_latency` and `average_latency` (in seconds)
+        """
+        return {
+            'refresh_count': self._refresh_count,
+            'shared_count': self._shared_count,
+            'failure_count': self._failure_count,
+            'last_latency': self._last_latency,
+            'average_latency': self._total_latency / self._refresh_count if self._refresh_count else None
+        }
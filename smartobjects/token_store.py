@@ -0,0 +1,105 @@
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class TokenStore(object):
+    """ Shares access tokens between the processes using the same credentials
+
+    A token manager given a store looks for a valid token in the store before requesting a new one, and saves the
+    tokens it requests. The store lock is held during the whole refresh, so that a single process per store requests a
+    token at a time, the others reuse it.
+    """
+
+    def lock(self, key):
+        """ :return: a context manager holding an exclusive lock on `key`, across processes """
+        raise NotImplementedError()
+
+    def load(self, key):
+        """ :return: the token saved under `key` (dict with `access_token`, `expires_in` and `requested_at`), or None """
+        raise NotImplementedError()
+
+    def save(self, key, token):
+        """ Saves the token of `key`, replacing the previous one """
+        raise NotImplementedError()
+
+
+class FileTokenStore(TokenStore):
+    """ Stores the tokens in files protected by advisory locks (POSIX only)
+
+    Every process of a host using the same directory shares the tokens. By default, the files are kept in `/dev/shm`
+    when available (a shared memory file system on Linux, the token is never written to disk), otherwise in the
+    temporary directory. The files are only readable by their owner.
+
+    Example:
+    >>> store = FileTokenStore()
+    >>> client = SmartObjectsClient(CLIENT_ID, CLIENT_SECRET, Environments.Production, token_store=store)
+    """
+
+    def __init__(self, directory=None):
+        """
+        :param directory: (optional) directory where the tokens are stored, `/dev/shm` or the temporary directory
+            by default
+        """
+        if fcntl is None:
+            raise ValueError("FileTokenStore requires fcntl, which is not available on this platform.")
+
+        if directory is None:
+            directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        if not os.path.isdir(directory):
+            raise ValueError("Token store directory {} does not exist.".format(directory))
+        self.directory = directory
+
+    def _path(self, key):
+        # the key contains the client id, which is not exposed in the file names
+        return os.path.join(self.directory, 'smartobjects-token-{}'.format(hashlib.sha256(key).hexdigest()[:32]))
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        fd = os.open(self._path(key) + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # closing the file releases the lock
+            os.close(fd)
+
+    def load(self, key):
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+            return {
+                'access_token': data['access_token'],
+                'expires_in': datetime.timedelta(0, data['expires_in']),
+                'requested_at': datetime.datetime.fromtimestamp(data['requested_at'])
+            }
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            # missing or partially written by a process killed before the rename
+            return None
+
+    def save(self, key, token):
+        requested_at = token['requested_at']
+        data = json.dumps({
+            'access_token': token['access_token'],
+            'expires_in': token['expires_in'].total_seconds(),
+            'requested_at': time.mktime(requested_at.timetuple()) + requested_at.microsecond / 1e6
+        })
+
+        path = self._path(key)
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        # readers see either the previous token or the new one, never a partial file
+        os.rename(temporary, path)
@@ -0,0 +1,13 @@
+import threading
+
+
+class Deliveries(object):
+    """ Delivery callback recording the (event, result, error) it is called with, from any thread """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deliveries = []
+
+    def __call__(self, event, result, error):
+        with self.lock:
+            self.deliveries.append((event, result, error))
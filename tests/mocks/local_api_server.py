@@ -3,8 +3,11 @@ from six import iteritems, PY3
 
 import re
 import json
+import time
+import zlib
 
 from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
 import threading
 
 from .mock_mnubo_backend import MockMnuboBackend
@@ -19,10 +22,60 @@ class LocalApiRequestHandler(BaseHTTPRequestHandler):
                 return handler, matches.groups()
         raise ValueError
 
+    def _read_body(self):
+        if self.headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip().split(';')[0], 16)
+                if size == 0:
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            # trailers (if any) end with an empty line
+            while self.rfile.readline().strip():
+                pass
+            self.server.backend.chunked_requests += 1
+            return ''.join(chunks)
+
+        length = int(self.headers.get('content-length') or 0)
+        return self.rfile.read(length) if length else ""
+
+    def _transmit(self, size):
+        if not self.server.bandwidth:
+            return
+        # simulates an uplink of limited bandwidth shared by the concurrent requests: bodies are transmitted one
+        # after the other
+        with self.server.link_lock:
+            now = time.time()
+            self.server.link_busy_until = max(now, self.server.link_busy_until) + float(size) / self.server.bandwidth
+            delay = self.server.link_busy_until - now
+        time.sleep(delay)
+
     def _handle(self, method, path):
+        if self.server.latency:
+            # simulates the network round trip to the actual platform
+            time.sleep(self.server.latency)
+
         if path.startswith('/api/v3'):
             path = path[7:]
 
+            token = self.headers.get('Authorization', '')[len('Bearer '):]
+            if token in self.server.backend.revoked_tokens:
+                self._read_body()
+                self.send_error(401)
+                return
+
+            if self.server.backend.transient_failures:
+                self._read_body()
+                status, headers = self.server.backend.transient_failures.pop(0)
+                if status:
+                    self.send_response(status)
+                    for header, value in headers.items():
+                        self.send_header(header, value)
+                    self.end_headers()
+                self.close_connection = 1
+                return
+
         try:
             handler, matches = self._get_route(method, path)
         # no route defined
@@ -35,10 +88,12 @@ class LocalApiRequestHandler(BaseHTTPRequestHandler):
         if method == 'GET':
             code, resp_content = handler(self.server.backend, matches)
         else:
-            length = int(self.headers['content-length'])
-            body = self.rfile.read(length) if length else "{}"
+            body = self._read_body() or "{}"
+            self._transmit(len(body))
 
             if not compress:
+                if self.headers.get('content-encoding') == 'gzip':
+                    body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
                 body = json.loads(body)
 
             code, resp_content = handler(self.server.backend, body, matches)
@@ -72,13 +127,31 @@ class LocalApiRequestHandler(BaseHTTPRequestHandler):
         self._handle('DELETE', self.path)
 
     def do_HEAD(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
         self.send_response(200)
+        self.end_headers()
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
 
 
 class LocalApiServer(object):
-    def __init__(self):
-        self.server = HTTPServer(("localhost", 0), LocalApiRequestHandler)
+    def __init__(self, threaded=False, latency=0, bandwidth=None):
+        """ Local HTTP server backed by a MockMnuboBackend
+
+        :param threaded: if True, each request is handled in its own thread (required to observe concurrency)
+        :param latency: number of seconds every request is delayed to simulate the network round trip
+        :param bandwidth: (optional) bytes per second of the simulated uplink, shared by the concurrent requests
+        """
+        server_class = ThreadedHTTPServer if threaded else HTTPServer
+        self.server = server_class(("localhost", 0), LocalApiRequestHandler)
         self.server.backend = MockMnuboBackend()
+        self.server.latency = latency
+        self.server.bandwidth = bandwidth
+        self.server.link_lock = threading.Lock()
+        self.server.link_busy_until = 0.0
 
         self.thread = threading.Thread(target=self.server.serve_forever)
         self.thread.daemon = True
@@ -10,12 +10,30 @@ from .routes import route
 
 class MockMnuboBackend(object):
     def __init__(self):
+        # benchmarks sending millions of events turn this off to keep the memory flat
+        self.keep_events = True
         self.clear()
 
     def clear(self):
         self.events = {}
         self.owners = {}
         self.objects = {}
+        self.token_requests = 0
+        self.revoked_tokens = set()
+        # (status, headers) returned instead of processing the next API requests, status 0 drops the connection
+        self.transient_failures = []
+        self.chunked_requests = 0
+        # number of events of each batch received, in the order of reception
+        self.event_batches = []
+        # (device id, number of events) of each batch received on the route of an object
+        self.device_event_batches = []
+        # number of ids of each request to an `exists` route
+        self.exists_batches = []
+        # number of objects (owners) of each batch received by PUT objects (owners)
+        self.object_batches = []
+        self.owner_batches = []
+        # number of claims (unclaims) of each batch received by POST owners/claim (owners/unclaim)
+        self.claim_batches = []
 
     def _gzip_encode(self, data):
         out = StringIO.StringIO()
@@ -26,8 +44,9 @@ class MockMnuboBackend(object):
 
     @route('POST', '^/oauth/.*')
     def auth(self, body, params):
+        self.token_requests += 1
         return 200, {
-            "access_token": "<TOKEN>",
+            "access_token": "<TOKEN-{}>".format(self.token_requests),
             "token_type": "Bearer",
             "expires_in": 3600,
             "scope": "ALL",
@@ -51,11 +70,16 @@ class MockMnuboBackend(object):
         if must_exists and device_id not in self.objects:
             return {"result": "error", "id": str(id), "message": "Object '{}' not found".format(device_id)}
 
-        self.events[id] = event
+        if self.keep_events:
+            self.events[id] = event
         return {"result": "success", "id": str(id), "objectExists": device_id in self.objects}
 
     @route('POST', r'^/events(?:\?([a-z=_]+)?)?(?:&([a-z=_]+)?)?$')
     def post_events(self, body, params):
+        if len(body) > 1000:
+            return 400, "Batch size exceeds the limit of 1000 events"
+        self.event_batches.append(len(body))
+
         must_exists, report_result = False, False
         for p in params:
             if p and p.startswith('must_exist'):
@@ -76,6 +100,11 @@ class MockMnuboBackend(object):
 
     @route('POST', '^/objects/(.+)/events(?:\?([a-z=_]+)?)?$')
     def post_events_on_object(self, body, params):
+        if len(body) > 1000:
+            return 400, "Batch size exceeds the limit of 1000 events"
+        self.event_batches.append(len(body))
+        self.device_event_batches.append((params[0], len(body)))
+
         [event.update({'x_object': {'x_device_id': params[0]}}) for event in body]
         result = [self._process_event(event, True) for event in body]
         failed = filter(lambda r: r['result'] != "success", result)
@@ -88,6 +117,7 @@ class MockMnuboBackend(object):
 
     @route('POST', '^/events/exists$')
     def post_events_exist(self, body, _):
+        self.exists_batches.append(len(body))
         return 200, [{id: uuid.UUID(id) in self.events} for id in body]
 
     # objects
@@ -122,6 +152,7 @@ class MockMnuboBackend(object):
 
     @route('PUT', '^/objects$')
     def put_batch_objects(self, body, _):
+        self.object_batches.append(len(body))
         result = [self._process_object(obj, True) for obj in body]
         failed = filter(lambda r: r['result'] != "success", result)
         return 207 if failed else 200, result
@@ -151,6 +182,7 @@ class MockMnuboBackend(object):
 
     @route('POST', '^/objects/exists$')
     def post_objects_exists(self, body, _):
+        self.exists_batches.append(len(body))
         return 200, [{dev_id: dev_id in self.objects} for dev_id in body]
 
     # owners
@@ -184,6 +216,7 @@ class MockMnuboBackend(object):
 
     @route('PUT', '^/owners$')
     def put_owners(self, body, _):
+        self.owner_batches.append(len(body))
         result = [self._process_owner(owner, True) for owner in body]
         failed = filter(lambda r: 'result' in r and r['result'] == "error", result)
         return 207 if failed else 200, result
@@ -239,6 +272,7 @@ class MockMnuboBackend(object):
 
     @route('POST', '^/owners/claim$')
     def post_owners_batch_claim(self, body, _):
+        self.claim_batches.append(len(body))
         results = []
         for claim in body:
             username, device_id = claim['username'], claim['x_device_id']
@@ -257,6 +291,7 @@ class MockMnuboBackend(object):
 
     @route('POST', '^/owners/unclaim$')
     def post_owners_batch_unclaim(self, body, _):
+        self.claim_batches.append(len(body))
         results = []
         for unclaim in body:
             username, device_id = unclaim['username'], unclaim['x_device_id']
@@ -296,6 +331,7 @@ class MockMnuboBackend(object):
 
     @route('POST', '^/owners/exists/?$')
     def post_owners_exist(self, body, _):
+        self.exists_batches.append(len(body))
         return 200, [{username: username in self.owners} for username in body]
 
     # search
@@ -1,6 +1,11 @@
 import unittest
 from requests import Response
 import datetime
+import threading
+import time
+import json
+import zlib
+import uuid
 
 from smartobjects import APIManager
 from tests.mocks.local_api_server import LocalApiServer
@@ -191,3 +196,134 @@ class TestsApiManager(unittest.TestCase):
 
         # content already decompressed by python-requests
         self.assertEquals(content, r.json())
+
+    def test_pool_parameters(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, pool_connections=2, pool_maxsize=32, pool_block=True)
+        adapter = api._APIManager__session.get_adapter(self.server.path)
+
+        self.assertEquals(adapter._pool_connections, 2)
+        self.assertEquals(adapter._pool_maxsize, 32)
+        self.assertEquals(adapter._pool_block, True)
+
+    def test_pool_invalid_size(self):
+        with self.assertRaises(ValueError) as ctx:
+            APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, pool_maxsize=0)
+        self.assertEquals(ctx.exception.message, "pool_connections and pool_maxsize must be greater than 0.")
+
+    def test_keep_alive_disabled(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, keep_alive=False)
+        r = api.get("api_manager")
+        self.assertEquals(r.request.headers['Connection'], 'close')
+
+
+    def test_streaming_post(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, True, stream_chunk_size=64)
+        content = [{"some_property": "value {}".format(i), "some_boolean": True} for i in range(100)]
+
+        r = api.post("compression_enabled", content)
+
+        self.assertEquals(r.request.headers['Content-Encoding'], 'gzip')
+        self.assertEquals(r.request.headers['Transfer-Encoding'], 'chunked')
+        self.assertEquals(self.server.server.backend.chunked_requests, 1)
+        self.assertEquals(content, r.json())
+
+    def test_streaming_put(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, True, stream_chunk_size=64)
+        content = [{"some_property": "some_value", "some_boolean": True}]
+
+        r = api.put("compression_enabled", content)
+
+        self.assertEquals(self.server.server.backend.chunked_requests, 1)
+        self.assertEquals(content, r.json())
+
+    def test_streaming_resent_on_401(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, True, stream_chunk_size=64)
+        self.server.server.backend.revoked_tokens.add(api.access_token['access_token'])
+
+        r = api.post("compression_enabled", [{"value": 1}])
+        self.assertEquals([{"value": 1}], r.json())
+
+    def test_gzip_stream_chunks(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, True, stream_chunk_size=1024)
+        body = [{"index": i, "payload": str(uuid.uuid4())} for i in range(5000)]
+
+        chunks = list(api._gzip_stream(body))
+
+        # the body is about 300KB compressed but zlib emits at most a few tens of KB at once
+        self.assertGreater(len(chunks), 5)
+        self.assertTrue(all(len(c) < 64 * 1024 for c in chunks))
+        self.assertEquals(json.loads(zlib.decompress(''.join(chunks), 16 + zlib.MAX_WBITS)), body)
+
+    def test_stream_chunk_size_invalid(self):
+        with self.assertRaises(ValueError) as ctx:
+            APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, stream_chunk_size=0)
+        self.assertEquals(ctx.exception.message, "stream_chunk_size must be greater than 0.")
+
+    def test_lazy_no_request_at_init(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", "http://non-reachable.example.com", lazy=True)
+        self.assertIsNone(api.access_token)
+        self.assertEquals(self.server.server.backend.token_requests, 0)
+
+    def test_lazy_token_fetched_on_first_request(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, lazy=True)
+        self.assertEquals(self.server.server.backend.token_requests, 0)
+
+        api.get("api_manager")
+        api.get("api_manager")
+        self.assertEquals(self.server.server.backend.token_requests, 1)
+        self.assertTrue(api.is_access_token_valid())
+
+    def test_lazy_warmup(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, lazy=True)
+
+        api.warmup()
+        self.assertTrue(api.is_access_token_valid())
+        self.assertEquals(self.server.server.backend.token_requests, 1)
+
+    def test_lazy_warmup_host_non_reachable(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", "http://non-reachable.example.com", lazy=True)
+        with self.assertRaises(ValueError) as ctx:
+            api.warmup()
+        self.assertEquals(ctx.exception.message, "Host at {} is not reachable".format("http://non-reachable.example.com"))
+
+class TestsApiManagerSharedAcrossThreads(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer(threaded=True, latency=0.05)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def _run(self, api, threads, requests_per_thread):
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(requests_per_thread):
+                    api.get("api_manager")
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.time()
+        [w.start() for w in workers]
+        [w.join() for w in workers]
+        self.assertEquals(errors, [])
+        return time.time() - start
+
+    def test_single_token_for_all_threads(self):
+        self.server.server.backend.clear()
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, pool_maxsize=8)
+        self._run(api, 8, 3)
+        self.assertEquals(self.server.server.backend.token_requests, 1)
+
+    def test_throughput_scales_with_threads(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, pool_maxsize=8)
+
+        single = self._run(api, 1, 8)
+        shared = self._run(api, 8, 1)
+
+        # same number of requests, but 8 threads should overlap their network round trips
+        self.assertLess(shared * 3, single)
@@ -0,0 +1,127 @@
+import unittest
+import time
+import uuid
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from smartobjects import AsyncSmartObjectsClient, Environments
+from smartobjects.api_manager import APIManager
+from smartobjects.async_client import AsyncService
+from smartobjects.ingestion import EventResult, Result
+from smartobjects.ingestion.events import EventsService
+from smartobjects.ingestion.objects import ObjectsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestAsyncService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer(threaded=True)
+        cls.server.start()
+
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False)
+        cls.executor = ThreadPoolExecutor(max_workers=4)
+        cls.events = AsyncService(EventsService(cls.api), cls.executor)
+        cls.objects = AsyncService(ObjectsService(cls.api), cls.executor)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+
+    def test_returns_future(self):
+        future = self.events.send([{'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_open'}])
+        self.assertTrue(isinstance(future, Future))
+
+        results = future.result()
+        self.assertTrue(isinstance(results[0], EventResult))
+        self.assertEquals(results[0].result, "success")
+        self.assertIn(results[0].id, self.server.server.backend.events)
+
+    def test_many_in_flight(self):
+        futures = [
+            self.events.send([{'x_object': {'x_device_id': 'device_{}'.format(i)}, 'x_event_type': 'door_open'}])
+            for i in range(20)
+        ]
+        results = [r for future in futures for r in future.result()]
+
+        self.assertEquals(len(results), 20)
+        self.assertTrue(all(r.result == "success" for r in results))
+        self.assertEquals(len(self.server.server.backend.events), 20)
+
+    def test_shared_result_classes(self):
+        results = self.objects.create_update([{"x_device_id": "vin1234", "x_object_type": "car"}]).result()
+        self.assertTrue(isinstance(results[0], Result))
+        self.assertEquals(results[0].id, "vin1234")
+
+    def test_validation_error_in_future(self):
+        future = self.events.send([])
+        with self.assertRaises(ValueError) as ctx:
+            future.result()
+        self.assertEquals(ctx.exception.message, "Event list cannot be null or empty.")
+
+    def test_exists_via_future(self):
+        event_id = uuid.uuid4()
+        self.events.send([{'event_id': event_id, 'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_open'}]).result()
+        self.assertEquals(self.events.event_exists(event_id).result(), True)
+
+    def test_private_and_attributes_not_wrapped(self):
+        self.assertIs(self.events.api_manager, self.api)
+        self.assertFalse(isinstance(self.events._validate_event_list, Future))
+
+
+class TestAsyncServiceConcurrency(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer(threaded=True, latency=0.1)
+        cls.server.start()
+
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_requests_overlap(self):
+        executor = ThreadPoolExecutor(max_workers=8)
+        events = AsyncService(EventsService(self.api), executor)
+
+        start = time.time()
+        futures = [events.send([{'x_object': {'x_device_id': 'dev'}, 'x_event_type': 'open'}]) for _ in range(8)]
+        [future.result() for future in futures]
+        elapsed = time.time() - start
+        executor.shutdown()
+
+        # 8 sequential requests would take at least 0.8s
+        self.assertLess(elapsed, 0.5)
+
+
+class TestAsyncSmartObjectsClient(unittest.TestCase):
+    def test_invalid_environment(self):
+        with self.assertRaises(ValueError) as ctx:
+            AsyncSmartObjectsClient("CLIENT_ID", "CLIENT_SECRET", "http://localhost")
+        self.assertEquals(ctx.exception.message, "Invalid 'environment' argument, must be one of: Environments.Sandbox, Environments.Production")
+
+    def test_options(self):
+        client = AsyncSmartObjectsClient("CLIENT_ID", "CLIENT_SECRET", Environments.Sandbox, lazy=True,
+                                         pool_connections=2, background_token_refresh=False, token_refresh_margin=120)
+        token_manager = client._api_manager.token_manager
+        self.assertEquals((token_manager._background_refresh, token_manager._margin.total_seconds()), (False, 120))
+        client.close()
+
+    def test_close_without_waiting(self):
+        client = AsyncSmartObjectsClient("CLIENT_ID", "CLIENT_SECRET", Environments.Sandbox, lazy=True)
+        pending = client._executor.submit(time.sleep, 0.2)
+        client.close(wait=False)
+        self.assertFalse(pending.done())
+
+        # the API manager is closed once the pending requests are completed
+        pending.result()
+        deadline = time.time() + 2
+        while not client._api_manager.token_manager._stopped and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(client._api_manager.token_manager._stopped)
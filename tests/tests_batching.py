@@ -0,0 +1,89 @@
+import unittest
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from smartobjects.batching import chunked, dispatch
+
+
+class TestChunked(unittest.TestCase):
+    def test_by_count(self):
+        self.assertEquals(list(chunked(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEquals(list(chunked(range(6), 3)), [[0, 1, 2], [3, 4, 5]])
+        self.assertEquals(list(chunked([], 3)), [])
+
+    def test_by_bytes(self):
+        # each element is 8 bytes once separated, the brackets take 2 more bytes
+        chunks = list(chunked(['abcdef'] * 5, 100, max_bytes=18, size_of=len))
+        self.assertEquals([len(c) for c in chunks], [2, 2, 1])
+
+    def test_large_element_alone(self):
+        chunks = list(chunked(['a', 'b' * 50, 'c'], 100, max_bytes=10, size_of=len))
+        self.assertEquals(chunks, [['a'], ['b' * 50], ['c']])
+
+    def test_lazy(self):
+        def items():
+            for i in range(10):
+                yield i
+            raise AssertionError("should not be consumed")
+
+        self.assertEquals(next(chunked(items(), 5)), [0, 1, 2, 3, 4])
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError) as ctx:
+            list(chunked(range(3), 0))
+        self.assertEquals(ctx.exception.message, "max_batch_size must be greater than 0.")
+
+
+class TestDispatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ThreadPoolExecutor(max_workers=8)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def test_results_in_order(self):
+        def slow_first(chunk):
+            # the first chunks complete last
+            time.sleep(0.05 / (chunk[0] + 1))
+            return chunk[0]
+
+        results = list(dispatch(self.executor, slow_first, [[i] for i in range(10)], 4))
+        self.assertEquals(results, range(10))
+
+    def test_bounded_concurrency(self):
+        lock = threading.Lock()
+        state = {'running': 0, 'max': 0}
+
+        def call(chunk):
+            with lock:
+                state['running'] += 1
+                state['max'] = max(state['max'], state['running'])
+            time.sleep(0.01)
+            with lock:
+                state['running'] -= 1
+
+        list(dispatch(self.executor, call, [[i] for i in range(20)], 3))
+        self.assertEquals(state['max'], 3)
+
+    def test_error_stops_dispatch(self):
+        sent = []
+
+        def call(chunk):
+            sent.append(chunk[0])
+            if chunk[0] == 2:
+                raise ValueError("rejected")
+            return chunk[0]
+
+        with self.assertRaises(ValueError):
+            list(dispatch(self.executor, call, [[i] for i in range(100)], 2))
+        self.assertLess(len(sent), 10)
+
+    def test_sequential(self):
+        calls = []
+        results = list(dispatch(None, lambda chunk: calls.append(threading.current_thread()) or chunk, [[1], [2]], 1))
+        self.assertEquals(results, [[1], [2]])
+        self.assertTrue(all(thread is threading.current_thread() for thread in calls))
@@ -0,0 +1,160 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.bulk import CsvReader, NdjsonReader, format_progress, ingest_file, open_reader
+from smartobjects.ingestion.events import EventsService
+from smartobjects.model.model import ModelService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestBulkReaders(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_ndjson(self):
+        path = self.write('events.ndjson',
+                          '{"x_object": {"x_device_id": "door"}, "x_event_type": "open"}\n'
+                          '\n'
+                          '{"x_object": {"x_device_id": "window"}, "x_event_type": "close", "temp": 1.5}')
+
+        with NdjsonReader(path) as reader:
+            events = list(reader)
+            self.assertEquals(reader.position, reader.size)
+
+        self.assertEquals(events, [
+            {'x_object': {'x_device_id': 'door'}, 'x_event_type': 'open'},
+            {'x_object': {'x_device_id': 'window'}, 'x_event_type': 'close', 'temp': 1.5}
+        ])
+
+    def test_ndjson_invalid_line(self):
+        path = self.write('events.ndjson', '{"x_event_type": "open"}\n{"x_event_type": \n')
+
+        with NdjsonReader(path) as reader:
+            with self.assertRaises(ValueError) as ctx:
+                list(reader)
+        self.assertTrue(ctx.exception.message.startswith("Invalid JSON at line 2 of {}".format(path)))
+
+    def test_empty_files(self):
+        with NdjsonReader(self.write('events.ndjson', '')) as reader:
+            self.assertEquals(list(reader), [])
+            self.assertEquals(reader.position, 0)
+        with CsvReader(self.write('events.csv', '')) as reader:
+            self.assertEquals(list(reader), [])
+
+    def test_csv_without_model(self):
+        path = self.write('events.csv', 'x_device_id,x_event_type,ts_number_attribute\r\n'
+                                        'door,open,12.5\r\n'
+                                        'window,close,\r\n')
+
+        with CsvReader(path) as reader:
+            self.assertEquals(list(reader), [
+                {'x_object': {'x_device_id': 'door'}, 'x_event_type': 'open', 'ts_number_attribute': '12.5'},
+                {'x_object': {'x_device_id': 'window'}, 'x_event_type': 'close'}
+            ])
+
+    def test_csv_with_model(self):
+        server = LocalApiServer()
+        server.start()
+        try:
+            model = ModelService(APIManager("CLIENT_ID", "CLIENT_SECRET", server.path, False)).export()
+        finally:
+            server.stop()
+
+        path = self.write('events.csv', 'x_object.x_device_id;event_id;ts_number_attribute;ts_text_attribute\n'
+                                        'door;3f1c3c42-4b8d-4bd1-92b4-7e4b7a2b4f11;12.5;"a;b"\n')
+        with CsvReader(path, model, delimiter=';') as reader:
+            self.assertEquals(list(reader), [{
+                'x_object': {'x_device_id': 'door'},
+                'event_id': '3f1c3c42-4b8d-4bd1-92b4-7e4b7a2b4f11',
+                'ts_number_attribute': 12.5,
+                'ts_text_attribute': 'a;b'
+            }])
+
+        path = self.write('invalid.csv', 'x_device_id,ts_number_attribute\ndoor,high\n')
+        with CsvReader(path, model) as reader:
+            with self.assertRaises(ValueError) as ctx:
+                list(reader)
+        self.assertEquals(ctx.exception.message,
+                          "Invalid value 'high' for ts_number_attribute at line 2 of {}".format(path))
+
+        path = self.write('unknown.csv', 'x_device_id,unknown\ndoor,1\n')
+        with CsvReader(path, model) as reader:
+            with self.assertRaises(ValueError) as ctx:
+                list(reader)
+        self.assertEquals(ctx.exception.message, "Column 'unknown' of {} is not a timeseries of the model".format(path))
+
+    def test_open_reader(self):
+        ndjson = self.write('events.jsonl', '')
+        csv = self.write('events.csv', '')
+        dump = self.write('events.dump', '')
+
+        self.assertTrue(isinstance(open_reader(ndjson), NdjsonReader))
+        self.assertTrue(isinstance(open_reader(csv), CsvReader))
+        self.assertTrue(isinstance(open_reader(dump, 'csv'), CsvReader))
+        with self.assertRaises(ValueError) as ctx:
+            open_reader(dump)
+        self.assertEquals(ctx.exception.message, "Unknown file format, must be one of: ndjson, csv")
+
+
+class TestIngestFile(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer()
+        cls.server.start()
+
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False)
+        cls.events = EventsService(cls.api)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.close()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_ingest_file(self):
+        path = os.path.join(self.directory, 'events.ndjson')
+        with open(path, 'wb') as f:
+            for i in range(2500):
+                event = {'x_object': {'x_device_id': 'device_{}'.format(i)}, 'x_event_type': 'bulk'}
+                if i in (10, 1500):
+                    # in two different batches: the second one is rejected by the platform
+                    event['event_id'] = '3f1c3c42-4b8d-4bd1-92b4-7e4b7a2b4f11'
+                f.write(json.dumps(event) + '\n')
+
+        reports, failures = [], []
+        progress = ingest_file(self.events, path, max_batch_size=1000, max_concurrency=2,
+                               on_progress=reports.append, progress_interval=0, on_failure=failures.append)
+
+        self.assertEquals(self.server.server.backend.event_batches, [1000, 1000, 500])
+        self.assertEquals(len(self.server.server.backend.events), 2499)
+        self.assertEquals(progress['events'], 2500)
+        self.assertEquals(progress['succeeded'], 2499)
+        self.assertEquals(progress['failed'], 1)
+        self.assertEquals(progress['bytes_read'], os.path.getsize(path))
+        self.assertEquals(progress['bytes_total'], os.path.getsize(path))
+        self.assertEquals(len(failures), 1)
+        self.assertEquals(failures[0].message, "Event ID '3f1c3c42-4b8d-4bd1-92b4-7e4b7a2b4f11' already exists")
+
+        self.assertEquals([report['events'] for report in reports], [1000, 2000, 2500])
+        self.assertEquals(reports[-1], progress)
+        self.assertIn("100.0%", format_progress(progress))
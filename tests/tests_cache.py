@@ -0,0 +1,132 @@
+import unittest
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.cache import ExistenceCache
+from smartobjects.ingestion.objects import ObjectsService
+from smartobjects.ingestion.owners import OwnersService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestExistenceCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ExistenceCache(max_size=3, positive_ttl=60, negative_ttl=10, clock=self.clock)
+
+    def test_ttls(self):
+        self.cache.put('present', True)
+        self.cache.put('absent', False)
+        self.assertEquals(self.cache.get('present'), True)
+        self.assertEquals(self.cache.get('absent'), False)
+
+        self.clock.now += 30
+        self.assertEquals(self.cache.get('present'), True)
+        self.assertIsNone(self.cache.get('absent'))
+
+        self.clock.now += 30
+        self.assertIsNone(self.cache.get('present'))
+        self.assertEquals(len(self.cache), 0)
+
+        stats = self.cache.stats()
+        self.assertEquals((stats['hits'], stats['misses'], stats['expirations']), (3, 2, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 0.6)
+
+    def test_lru_bound(self):
+        for identifier in ('a', 'b', 'c'):
+            self.cache.put(identifier, True)
+        self.cache.get('a')
+        self.cache.put('d', False)
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEquals([self.cache.get(identifier) for identifier in ('a', 'c', 'd')], [True, True, False])
+        self.assertEquals(self.cache.stats()['evictions'], 1)
+
+    def test_invalidate(self):
+        self.cache.put('a', True)
+        self.cache.put('b', False)
+        self.cache.invalidate('a')
+        self.cache.invalidate_many(['b', 'unknown'])
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEquals(self.cache.stats()['invalidations'], 2)
+
+    def test_no_negative_caching(self):
+        cache = ExistenceCache(negative_ttl=0)
+        cache.put('absent', False)
+        self.assertIsNone(cache.get('absent'))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError) as ctx:
+            ExistenceCache(max_size=0)
+        self.assertEquals(ctx.exception.message, "max_size must be greater than 0.")
+
+        with self.assertRaises(ValueError) as ctx:
+            ExistenceCache(positive_ttl=-1)
+        self.assertEquals(ctx.exception.message, "TTLs cannot be negative.")
+
+
+class TestServicesExistenceCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer()
+        cls.server.start()
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.close()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+        self.cache = ExistenceCache()
+        self.objects = ObjectsService(self.api, existence_cache=self.cache)
+        self.owners = OwnersService(self.api, existence_cache=ExistenceCache())
+
+    def test_object_exists_cached(self):
+        self.assertEquals(self.objects.object_exists('device'), False)
+
+        # created by another client: the negative entry is still valid
+        self.server.server.backend.objects['device'] = {'x_device_id': 'device'}
+        self.assertEquals(self.objects.object_exists('device'), False)
+
+        # deleted then created by this client: invalidated
+        self.objects.delete('device')
+        self.assertEquals(self.objects.object_exists('device'), False)
+        self.objects.create({'x_device_id': 'device', 'x_object_type': 'sensor'})
+        self.assertEquals(self.objects.object_exists('device'), True)
+
+        self.objects.create_update([{'x_device_id': 'other', 'x_object_type': 'sensor'}])
+        self.assertEquals(self.cache.get('device'), True)
+        self.assertIsNone(self.cache.get('other'))
+
+        stats = self.cache.stats()
+        self.assertEquals((stats['hits'], stats['invalidations']), (2, 2))
+
+    def test_objects_exist_only_misses(self):
+        self.server.server.backend.objects['a'] = {'x_device_id': 'a'}
+        self.assertEquals(self.objects.objects_exist(['a', 'b']), {'a': True, 'b': False})
+
+        resp = list(self.objects.iter_objects_exist(['c', 'a', 'b', 'd'], max_batch_size=1))
+        self.assertEquals(resp, [('c', False), ('a', True), ('b', False), ('d', False)])
+        # 2 ids, then the 2 misses
+        self.assertEquals(sorted(self.server.server.backend.exists_batches), [1, 1, 2])
+        self.assertEquals(self.objects.missing_objects(['a', 'b', 'c', 'd']), set(['b', 'c', 'd']))
+        self.assertEquals(sorted(self.server.server.backend.exists_batches), [1, 1, 2])
+
+    def test_owner_exists_cached(self):
+        self.assertEquals(self.owners.owners_exist(['owner']), {'owner': False})
+        self.assertEquals(self.owners.owner_exists('owner'), False)
+        self.owners.create({'username': 'owner'})
+        self.assertEquals(self.owners.owner_exists('owner'), True)
+        self.owners.delete('owner')
+        self.assertEquals(self.owners.owner_exists('owner'), False)
@@ -0,0 +1,98 @@
+import unittest
+import datetime
+import decimal
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.codec import JsonCodec, available_codecs, get_codec
+from smartobjects.ingestion.events import EventsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestCodecs(unittest.TestCase):
+    def test_standard_library_always_available(self):
+        self.assertIn('json', available_codecs())
+        self.assertEquals(available_codecs()[-1], 'json')
+        self.assertEquals(get_codec('json').name, 'json')
+
+    def test_default_is_fastest(self):
+        fastest = [name for name in available_codecs() if get_codec(name).native_types][0]
+        self.assertEquals(get_codec().name, fastest)
+
+    def test_roundtrip(self):
+        for name in available_codecs():
+            codec = get_codec(name)
+            obj = {"text": u"caf\xe9", "number": 3.141592653589793, "list": [1, None, True], "nested": {"a/b": "c"}}
+            self.assertEquals(codec.loads(codec.dumps(obj)), obj, name)
+
+    def test_native_types(self):
+        event_id = uuid.uuid4()
+        timestamp = datetime.datetime(2017, 4, 24, 16, 13, 11, 123000)
+
+        for name in available_codecs():
+            codec = get_codec(name)
+            decoded = codec.loads(codec.dumps({"event_id": event_id, "x_timestamp": timestamp, "day": timestamp.date()}))
+            self.assertEquals(decoded["event_id"], str(event_id), name)
+            self.assertTrue(decoded["x_timestamp"].startswith("2017-04-24T16:13:11.123"), name)
+            self.assertEquals(decoded["day"], "2017-04-24", name)
+
+    def test_other_types(self):
+        for name in available_codecs():
+            codec = get_codec(name)
+            decoded = codec.loads(codec.dumps({"price": decimal.Decimal("21.5"), "time": datetime.time(16, 13, 11)}))
+            self.assertEquals(decoded["price"], 21.5, name)
+            self.assertEquals(decoded["time"], "16:13:11", name)
+
+    def test_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            get_codec('json').dumps({"value": object()})
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError) as ctx:
+            get_codec('yaml')
+        self.assertEquals(ctx.exception.message, "Unknown JSON codec 'yaml'")
+
+    def test_unavailable_codec(self):
+        if 'orjson' in available_codecs():
+            self.skipTest("orjson is installed")
+        with self.assertRaises(ValueError) as ctx:
+            get_codec('orjson')
+        self.assertEquals(ctx.exception.message, "JSON codec 'orjson' is not available, install the 'orjson' package.")
+
+
+class TestApiManagerCodec(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+
+    def test_codec_by_name_or_instance(self):
+        self.assertEquals(APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, codec='json').codec.name, 'json')
+
+        codec = JsonCodec()
+        self.assertIs(APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, codec=codec).codec, codec)
+
+    def test_send_events_with_each_codec(self):
+        for name in available_codecs():
+            for compression in (False, True):
+                api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, compression, codec=name)
+                event_id = uuid.uuid4()
+
+                results = EventsService(api).send([{
+                    'event_id': event_id,
+                    'x_object': {'x_device_id': 'kitchen_door'},
+                    'x_event_type': 'door_open',
+                    'x_timestamp': datetime.datetime(2017, 4, 24, 16, 13, 11)
+                }])
+
+                self.assertEquals(results[0].id, event_id)
+                self.assertEquals(results[0].result, "success")
+                self.assertEquals(self.server.server.backend.events[event_id]['x_timestamp'], '2017-04-24T16:13:11')
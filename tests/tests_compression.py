@@ -0,0 +1,131 @@
+import unittest
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.compression import CompressionPolicy
+from smartobjects.routes import route_template
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestRouteTemplate(unittest.TestCase):
+    def test_static_routes(self):
+        for route in ('events', 'objects', 'owners', 'owners/claim', 'objects/exists', 'search/basic', 'model/export'):
+            self.assertEquals(route_template(route), route)
+
+    def test_query_string_ignored(self):
+        self.assertEquals(route_template('events?must_exist=true&report_results=true'), 'events')
+
+    def test_identifiers_replaced(self):
+        self.assertEquals(route_template('objects/vin1234/events?report_results=true'), 'objects/{x_device_id}/events')
+        self.assertEquals(route_template('objects/vin1234'), 'objects/{x_device_id}')
+        self.assertEquals(route_template('objects/exists/vin1234'), 'objects/exists/{x_device_id}')
+        self.assertEquals(route_template('owners/exists/foo@bar.com'), 'owners/exists/{username}')
+        self.assertEquals(route_template('events/exists/{}'.format(uuid.uuid4())), 'events/exists/{event_id}')
+        self.assertEquals(route_template('owners/foo@bar.com'), 'owners/{username}')
+        self.assertEquals(route_template('owners/foo@bar.com/password'), 'owners/{username}/password')
+        self.assertEquals(route_template('owners/foo@bar.com/objects/vin1234/claim'), 'owners/{username}/objects/{x_device_id}/claim')
+        self.assertEquals(route_template('owners/foo@bar.com/objects/vin1234/unclaim'), 'owners/{username}/objects/{x_device_id}/unclaim')
+
+
+class TestCompressionPolicy(unittest.TestCase):
+    def test_min_size(self):
+        policy = CompressionPolicy(min_size=100)
+        self.assertFalse(policy.should_compress('events', 99))
+        self.assertTrue(policy.should_compress('events', 100))
+        self.assertTrue(policy.should_compress('events'))
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError) as ctx:
+            CompressionPolicy(level=10)
+        self.assertEquals(ctx.exception.message, "Compression level must be between 1 and 9.")
+
+    def test_stats(self):
+        policy = CompressionPolicy(min_size=0)
+        policy.should_compress('events', 1000)
+        policy.record('events', 1000, 100, 0.001)
+
+        stats = policy.stats()['events']
+        self.assertEquals(stats['requests'], 1)
+        self.assertEquals(stats['compressed'], 1)
+        self.assertEquals(stats['raw_bytes'], 1000)
+        self.assertEquals(stats['compressed_bytes'], 100)
+        self.assertAlmostEqual(stats['ratio'], 0.1)
+        self.assertTrue(stats['enabled'])
+
+    def test_adaptive_disables_poor_ratio(self):
+        policy = CompressionPolicy(min_size=0, adaptive=True, warmup=3, probe_interval=5)
+        for _ in range(3):
+            self.assertTrue(policy.should_compress('objects/exists', 2000))
+            policy.record('objects/exists', 2000, 1950, 0.00001)
+
+        self.assertFalse(policy.stats()['objects/exists']['enabled'])
+        decisions = [policy.should_compress('objects/exists', 2000) for _ in range(10)]
+        # only the probes are compressed
+        self.assertEquals(decisions.count(True), 2)
+
+    def test_adaptive_disables_expensive_compression(self):
+        # 50% saved on a 1000 bytes/s link saves 0.5ms per byte, but compression costs 1ms per byte
+        policy = CompressionPolicy(min_size=0, adaptive=True, warmup=1, bandwidth=1000)
+        policy.record('events', 1000, 500, 1.0)
+        self.assertFalse(policy.stats()['events']['enabled'])
+
+        # the moving average of the CPU cost goes back under the time saved
+        for _ in range(10):
+            policy.record('events', 1000, 500, 0.1)
+        self.assertTrue(policy.stats()['events']['enabled'])
+
+    def test_not_adaptive_keeps_compressing(self):
+        policy = CompressionPolicy(min_size=0, warmup=1)
+        policy.record('events', 1000, 1000, 1.0)
+        self.assertTrue(policy.should_compress('events', 1000))
+
+
+class TestApiManagerCompressionPolicy(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+
+    def test_small_body_not_compressed(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, CompressionPolicy(min_size=1024))
+
+        r = api.post("api_manager", {"data": "value"})
+
+        self.assertNotIn('Content-Encoding', r.request.headers)
+        self.assertEquals(api.compression_policy.stats()['api_manager']['compressed'], 0)
+
+    def test_large_body_compressed(self):
+        policy = CompressionPolicy(min_size=1024, level=1)
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, policy)
+        events = [{'x_object': {'x_device_id': 'device_{}'.format(i)}, 'x_event_type': 'compressed'} for i in range(100)]
+
+        r = api.post("events?report_results=true", events)
+
+        self.assertEquals(r.request.headers['Content-Encoding'], 'gzip')
+        self.assertEquals(len(self.server.server.backend.events), 100)
+
+        stats = policy.stats()['events']
+        self.assertEquals(stats['compressed'], 1)
+        self.assertLess(stats['compressed_bytes'], stats['raw_bytes'])
+
+    def test_compression_enabled_flag(self):
+        self.assertIsNone(APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False).compression_policy)
+        self.assertEquals(APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, True).compression_policy.min_size, 0)
+
+    def test_streamed_body_stats(self):
+        policy = CompressionPolicy()
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, policy, stream_chunk_size=1024)
+
+        api.post("compression_enabled", [{"value": i} for i in range(100)])
+
+        stats = policy.stats()['compression_enabled']
+        self.assertEquals(stats['compressed'], 1)
+        self.assertGreater(stats['raw_bytes'], stats['compressed_bytes'])
@@ -0,0 +1,129 @@
+import unittest
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.dedup import LruEventIdIndex, BloomEventIdIndex
+from smartobjects.ingestion.events import EventsService
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestLruEventIdIndex(unittest.TestCase):
+    def test_lookup_and_eviction(self):
+        index = LruEventIdIndex(3)
+        ids = [uuid.uuid4() for _ in range(4)]
+        index.add_many(ids[:3])
+
+        # a UUID and its string are the same id
+        self.assertIn(str(ids[0]), index)
+        index.add(ids[3])
+        # ids[1] was the least recently used
+        self.assertNotIn(ids[1], index)
+        self.assertIn(ids[0], index)
+        self.assertEquals(len(index), 3)
+
+        stats = index.stats()
+        self.assertEquals(stats['ids'], 3)
+        self.assertEquals(stats['lookups'], 3)
+        self.assertEquals(stats['hits'], 2)
+        self.assertAlmostEqual(stats['hit_rate'], 2.0 / 3)
+        self.assertGreater(stats['memory_bytes'], 0)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError) as ctx:
+            LruEventIdIndex(0)
+        self.assertEquals(ctx.exception.message, "capacity must be greater than 0.")
+
+
+class TestBloomEventIdIndex(unittest.TestCase):
+    def test_no_false_negative(self):
+        index = BloomEventIdIndex(10000, initial_capacity=100)
+        ids = [str(uuid.uuid4()) for _ in range(5000)]
+        index.add_many(ids)
+
+        self.assertTrue(all(event_id in index for event_id in ids))
+        self.assertEquals(len(index), 5000)
+        # the filters grew with the ids
+        self.assertEquals([bloom.capacity for bloom in index._filters], [100, 200, 400, 800, 1600, 3200])
+
+    def test_false_positive_rate(self):
+        index = BloomEventIdIndex(20000, error_rate=0.01)
+        index.add_many(str(uuid.uuid4()) for _ in range(20000))
+
+        # every filter is full: the rate is close to the bound, with some margin for the sampling noise
+        false_positives = sum(1 for _ in range(20000) if uuid.uuid4() in index)
+        self.assertLess(false_positives / 20000.0, 0.0125)
+        # about 1.44 * log2(1 / 0.01) bits per id, a little more for the tighter filters
+        self.assertLess(index.stats()['memory_bytes'], 20000 * 2)
+
+    def test_bounded(self):
+        index = BloomEventIdIndex(1000, initial_capacity=100)
+        ids = [str(uuid.uuid4()) for _ in range(3000)]
+        index.add_many(ids)
+        memory = index.memory_bytes()
+
+        self.assertEquals(sum(bloom.capacity for bloom in index._filters), 1000)
+        self.assertLessEqual(len(index), 1000)
+        self.assertTrue(all(event_id in index for event_id in ids[-100:]))
+
+        index.add_many(str(uuid.uuid4()) for _ in range(3000))
+        self.assertEquals(index.memory_bytes(), memory)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError) as ctx:
+            BloomEventIdIndex(1000, error_rate=1)
+        self.assertEquals(ctx.exception.message, "error_rate must be between 0 and 1.")
+
+
+class TestEventsServiceDedup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer()
+        cls.server.start()
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.close()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+        self.index = LruEventIdIndex(1000)
+        self.events = EventsService(self.api, dedup_index=self.index)
+
+    def make_event(self, event_id=None):
+        event = {'x_object': {'x_device_id': 'device'}, 'x_event_type': 'dedup'}
+        if event_id:
+            event['event_id'] = event_id
+        return event
+
+    def test_duplicates_across_calls_not_sent(self):
+        first, second = uuid.uuid4(), uuid.uuid4()
+        self.events.send([self.make_event(first), self.make_event()])
+
+        results = self.events.send([self.make_event(), self.make_event(str(first)), self.make_event(second)],
+                                   max_batch_size=2)
+
+        self.assertEquals([result.result for result in results], ['success', 'conflict', 'success'])
+        self.assertEquals(results[1].id, first)
+        self.assertEquals(results[1].message, "Already sent, dropped by the dedup index")
+        self.assertEquals(self.server.server.backend.event_batches, [2, 1, 1])
+        self.assertEquals(len(self.index), 2)
+
+        # nothing left to send: no request
+        self.assertIsNone(self.events.send([self.make_event(first), self.make_event(second)], report_results=False))
+        self.assertEquals(self.server.server.backend.event_batches, [2, 1, 1])
+        self.assertEquals(self.index.stats()['hits'], 3)
+
+    def test_failed_events_not_indexed(self):
+        event_id = uuid.uuid4()
+        self.server.server.backend.transient_failures = [(500, {})]
+        with self.assertRaises(Exception):
+            self.events.send([self.make_event(event_id)])
+
+        results = self.events.send([self.make_event(event_id)])
+        self.assertEquals(results[0].result, 'success')
+
+        results = list(self.events.send_stream(iter([self.make_event(event_id), self.make_event(uuid.uuid4())])))
+        self.assertEquals([result.result for result in results], ['conflict', 'success'])
@@ -1,7 +1,12 @@
 import unittest
+import copy
+import datetime
+import itertools
+import types
 import uuid
 
 from smartobjects.api_manager import APIManager
+from smartobjects.ingestion import EventResult
 from smartobjects.ingestion.events import EventsService
 
 from tests.mocks.local_api_server import LocalApiServer
@@ -23,6 +28,39 @@ class TestEventsService(unittest.TestCase):
     def setUp(self):
         self.server.server.backend.clear()
 
+    def test_send_summary(self):
+        self.server.server.backend.objects['kitchen_door'] = {'x_device_id': 'kitchen_door'}
+        event_id = uuid.uuid4()
+        self.events.send([{'event_id': event_id, 'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'open'}])
+
+        events = [
+            {'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_open'},
+            {'event_id': event_id, 'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_open'},
+            {'x_object': {'x_device_id': 'cat_detector'}, 'x_event_type': 'cat_disappeared'},
+            {'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_close'},
+        ]
+        summary = self.events.send(events, must_exist=True, max_batch_size=2, summary=True)
+
+        self.assertEquals(summary.succeeded, 2)
+        self.assertFalse(summary.all_succeeded)
+        self.assertEquals([index for index, _ in summary.failed], [1, 2])
+        self.assertEquals(summary.failed[0][1].id, event_id)
+        self.assertEquals(summary.failed[0][1].message, "Event ID '{}' already exists".format(event_id))
+
+        summary = self.events.send_from_device('kitchen_door', [{'x_event_type': 'door_open'}], summary=True)
+        self.assertEquals((summary.succeeded, summary.failed), (1, []))
+
+    def test_event_result(self):
+        event_id = uuid.uuid4()
+        result = EventResult({'id': str(event_id), 'result': 'success', 'objectExists': False})
+        self.assertEquals(result.id, event_id)
+        self.assertEquals(result.object_exists, False)
+        self.assertIsNone(EventResult(result='error').id)
+
+        # no instance dict: results are built for every event
+        with self.assertRaises(AttributeError):
+            result.extra = True
+
     def test_send_ok(self):
         self.server.server.backend.objects['kitchen_door'] = {'x_device_id': 'kitchen_door'}
 
@@ -110,6 +148,50 @@ class TestEventsService(unittest.TestCase):
             ])
         self.assertEquals(ctx.exception.message, "The event_id [{}] is duplicated in the list".format(event_id))
 
+    def test_send_duplicate_uuid_and_string(self):
+        event_id = uuid.uuid4()
+
+        with self.assertRaises(ValueError) as ctx:
+            self.events.send([
+                {'event_id': event_id, 'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_open'},
+                {'event_id': str(event_id), 'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_closed'},
+            ])
+        self.assertEquals(ctx.exception.message, "The event_id [{}] is duplicated in the list".format(event_id))
+
+    def test_validation_single_pass(self):
+        class CountingList(list):
+            iterations = 0
+
+            def __iter__(self):
+                CountingList.iterations += 1
+                return super(CountingList, self).__iter__()
+
+        events = CountingList({'event_id': uuid.uuid4(), 'x_object': {'x_device_id': 'device'}, 'x_event_type': 'e'}
+                              for _ in range(10))
+        self.events._validate_event_list(events)
+
+        self.assertEquals(CountingList.iterations, 1)
+
+    def test_send_does_not_modify_events(self):
+        self.server.server.backend.objects['kitchen_door'] = {'x_device_id': 'kitchen_door'}
+        timestamp = datetime.datetime(2017, 4, 24, 16, 13, 11)
+
+        def make_events():
+            return [{'event_id': uuid.uuid4(), 'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_open',
+                     'x_timestamp': timestamp} for _ in range(3)]
+
+        for send in (self.events.send, lambda e: list(self.events.send_stream(iter(e))),
+                     lambda e: self.events.send_by_device(e, min_group_size=2)):
+            events = make_events()
+            snapshot = copy.deepcopy(events)
+
+            resp = send(events)
+
+            self.assertEquals(events, snapshot)
+            self.assertTrue(all(isinstance(event['event_id'], uuid.UUID) for event in events))
+            self.assertEquals([r.id for r in resp], [event['event_id'] for event in events])
+            self.assertEquals(self.server.server.backend.events[resp[0].id]['x_timestamp'], '2017-04-24T16:13:11')
+
     def test_send_already_exist(self):
         event_id = uuid.uuid4()
         self.events.send([{'event_id': event_id, 'x_object': {'x_device_id': 'kitchen_door'}, 'x_event_type': 'door_open'}])
@@ -201,3 +283,171 @@ class TestEventsService(unittest.TestCase):
 
 
 
+
+
+class TestEventsServiceChunking(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer(threaded=True)
+        cls.server.start()
+
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False)
+        cls.events = EventsService(cls.api)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.close()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+
+    def make_events(self, count):
+        return [{'event_id': uuid.uuid4(), 'x_object': {'x_device_id': 'device_{}'.format(i)}, 'x_event_type': 'chunk'}
+                for i in range(count)]
+
+    def test_send_chunked_by_count(self):
+        events = self.make_events(2500)
+        ids = [e['event_id'] for e in events]
+
+        resp = self.events.send(events)
+
+        self.assertEquals(sorted(self.server.server.backend.event_batches), [500, 1000, 1000])
+        self.assertTrue([r.id for r in resp] == ids)
+        self.assertTrue(all(r.result == "success" for r in resp))
+        self.assertEquals(len(self.server.server.backend.events), 2500)
+
+    def test_send_chunked_by_bytes(self):
+        events = self.make_events(100)
+        ids = [e['event_id'] for e in events]
+
+        resp = self.events.send(events, max_batch_bytes=2000)
+
+        batches = self.server.server.backend.event_batches
+        self.assertGreater(len(batches), 5)
+        self.assertEquals(sum(batches), 100)
+        self.assertTrue([r.id for r in resp] == ids)
+
+    def test_send_chunked_sequential(self):
+        events = self.make_events(10)
+        ids = [e['event_id'] for e in events]
+
+        resp = self.events.send(events, max_batch_size=3, max_concurrency=1)
+
+        self.assertEquals(self.server.server.backend.event_batches, [3, 3, 3, 1])
+        self.assertTrue([r.id for r in resp] == ids)
+
+    def test_send_chunked_no_report(self):
+        self.assertIsNone(self.events.send(self.make_events(25), max_batch_size=10, report_results=False))
+        self.assertEquals(len(self.server.server.backend.events), 25)
+
+    def test_send_from_device_chunked(self):
+        self.server.server.backend.objects['device_1'] = {'x_device_id': 'device_1'}
+        events = [{'event_id': uuid.uuid4(), 'x_event_type': 'chunk'} for _ in range(1500)]
+        ids = [e['event_id'] for e in events]
+
+        resp = self.events.send_from_device('device_1', events)
+
+        self.assertEquals(sorted(self.server.server.backend.event_batches), [500, 1000])
+        self.assertTrue([r.id for r in resp] == ids)
+
+    def test_send_invalid_concurrency(self):
+        with self.assertRaises(ValueError) as ctx:
+            self.events.send(self.make_events(1), max_concurrency=0)
+        self.assertEquals(ctx.exception.message, "max_concurrency must be greater than 0.")
+
+    def test_send_stream(self):
+        ids = [uuid.uuid4() for _ in range(2500)]
+        events = ({'event_id': i, 'x_object': {'x_device_id': 'device'}, 'x_event_type': 'stream'} for i in ids)
+
+        results = self.events.send_stream(events)
+
+        self.assertTrue(isinstance(results, types.GeneratorType))
+        self.assertTrue([r.id for r in results] == ids)
+        self.assertEquals(sorted(self.server.server.backend.event_batches), [500, 1000, 1000])
+
+    def test_send_stream_bounded_memory(self):
+        pulled = [0]
+
+        def infinite_events():
+            while True:
+                pulled[0] += 1
+                yield {'x_object': {'x_device_id': 'device'}, 'x_event_type': 'stream'}
+
+        results = list(itertools.islice(self.events.send_stream(infinite_events(), max_batch_size=100,
+                                                                max_concurrency=2), 1000))
+
+        self.assertEquals(len(results), 1000)
+        # the events read ahead are limited to the batches in flight
+        self.assertLessEqual(pulled[0], 1000 + 3 * 100)
+
+    def test_send_stream_invalid_event(self):
+        events = [{'x_object': {'x_device_id': 'device'}, 'x_event_type': 'stream'}] * 10 + [{'x_event_type': 'invalid'}]
+
+        results = self.events.send_stream(iter(events), max_batch_size=5, max_concurrency=1)
+
+        self.assertEquals(len(list(itertools.islice(results, 10))), 10)
+        with self.assertRaises(ValueError) as ctx:
+            next(results)
+        self.assertEquals(ctx.exception.message, "x_object.x_device_id cannot be null or empty.")
+
+    def test_send_stream_duplicate(self):
+        event_id = uuid.uuid4()
+        events = [{'event_id': event_id, 'x_object': {'x_device_id': 'device'}, 'x_event_type': 'stream'}] * 2
+
+        with self.assertRaises(ValueError) as ctx:
+            list(self.events.send_stream(iter(events)))
+        self.assertEquals(ctx.exception.message, "The event_id [{}] is duplicated in the list".format(event_id))
+
+    def test_send_by_device(self):
+        for device_id in ('door', 'window', 'sensor'):
+            self.server.server.backend.objects[device_id] = {'x_device_id': device_id}
+        events = []
+        for i in range(60):
+            events.append({'event_id': uuid.uuid4(), 'x_object': {'x_device_id': 'door' if i % 2 else 'window'},
+                           'x_event_type': 'grouped', 'index': i})
+            if i % 20 == 0:
+                events.append({'event_id': uuid.uuid4(), 'x_object': {'x_device_id': 'sensor'},
+                               'x_event_type': 'ungrouped', 'index': i})
+        events.append({'event_id': uuid.uuid4(), 'x_object': {'x_device_id': 'unknown'}, 'x_event_type': 'ungrouped'})
+        ids = [e['event_id'] for e in events]
+
+        resp = self.events.send_by_device(events, min_group_size=20, max_batch_size=25)
+
+        self.assertEquals(sorted(self.server.server.backend.device_event_batches),
+                          [('door', 5), ('door', 25), ('window', 5), ('window', 25)])
+        self.assertEquals(sorted(self.server.server.backend.event_batches), [4, 5, 5, 25, 25])
+        self.assertTrue([r.id for r in resp] == ids)
+        self.assertTrue(all(r.result == "success" for r in resp[:-1]))
+        self.assertEquals(resp[-1].result, "error")
+        self.assertEquals(resp[-1].message, "Object 'unknown' not found")
+
+        stored = self.server.server.backend.events[resp[2].id]
+        self.assertEquals(stored['x_object'], {'x_device_id': 'door'})
+        self.assertEquals(stored['index'], 1)
+        self.assertTrue(all('x_object' in e for e in events))
+
+    def test_send_by_device_invalid(self):
+        with self.assertRaises(ValueError) as ctx:
+            self.events.send_by_device([{'x_event_type': 'invalid'}])
+        self.assertEquals(ctx.exception.message, "x_object.x_device_id cannot be null or empty.")
+
+        with self.assertRaises(ValueError) as ctx:
+            self.events.send_by_device([{'x_object': {'x_device_id': 'door'}, 'x_event_type': 'e'}], min_group_size=0)
+        self.assertEquals(ctx.exception.message, "min_group_size must be greater than 0.")
+
+    def test_iter_events_exist(self):
+        events = self.make_events(50)
+        self.events.send(events[::2])
+        event_ids = [event['event_id'] for event in events]
+
+        resp = list(self.events.iter_events_exist(iter(event_ids), max_batch_size=7, max_concurrency=3))
+        self.assertEquals(resp, [(event_id, i % 2 == 0) for i, event_id in enumerate(event_ids)])
+        self.assertEquals(sorted(self.server.server.backend.exists_batches), [1] + [7] * 7)
+
+        # the ids are returned as given
+        self.assertEquals(self.events.missing_events([str(event_id) for event_id in event_ids[:4]]),
+                          set([str(event_ids[1]), str(event_ids[3])]))
+        bitmap = self.events.events_exist_bitmap(event_ids, max_batch_size=7)
+        self.assertEquals((len(bitmap), bitmap.count()), (50, 25))
+        self.assertEquals(list(bitmap.missing_indices()), range(1, 50, 2))
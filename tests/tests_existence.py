@@ -0,0 +1,52 @@
+import unittest
+
+from smartobjects.ingestion.existence import ExistenceBitmap, iter_exist
+
+
+class TestExistenceBitmap(unittest.TestCase):
+    def test_bitmap(self):
+        values = [i % 3 == 0 for i in range(20)]
+        bitmap = ExistenceBitmap()
+        for value in values:
+            bitmap.append(value)
+
+        self.assertEquals(len(bitmap), 20)
+        self.assertEquals(list(bitmap), values)
+        self.assertEquals(bitmap[3], True)
+        self.assertEquals(bitmap[-1], False)
+        self.assertEquals(bitmap.count(), 7)
+        self.assertEquals(list(bitmap.missing_indices()), [i for i in range(20) if i % 3])
+        # one bit per value
+        self.assertEquals(len(bitmap.to_bytes()), 3)
+        self.assertEquals(bitmap.to_bytes()[0], chr(0b01001001))
+
+        with self.assertRaises(IndexError):
+            bitmap[20]
+
+
+class FakeApiManager(object):
+    """ Answers the `exists` requests with the given entries """
+
+    executor = None
+    pool_maxsize = 1
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def post(self, route, body, idempotent=False):
+        return self.entries
+
+    def parse(self, response):
+        return response
+
+
+class TestIterExist(unittest.TestCase):
+    def test_out_of_order(self):
+        api = FakeApiManager([{'b': False}, {'a': True}])
+        self.assertEquals(list(iter_exist(api, 'objects/exists', ['a', 'b'])), [('a', True), ('b', False)])
+
+    def test_incomplete_response(self):
+        api = FakeApiManager([{'b': False}])
+        with self.assertRaises(ValueError) as ctx:
+            list(iter_exist(api, 'objects/exists', ['a', 'b']))
+        self.assertEquals(ctx.exception.message, "The platform did not report the existence of 1 ids: a")
@@ -0,0 +1,133 @@
+import unittest
+
+from smartobjects.api_manager import APIManager
+from smartobjects.compression import CompressionPolicy
+from smartobjects.ingestion.events import EventsService
+from smartobjects.ingestion.objects import ObjectsService
+from smartobjects.metrics import Histogram, MetricsRegistry, RequestObserver
+from smartobjects.retry import RetryPolicy
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        snapshot = Histogram().snapshot()
+        self.assertEquals(snapshot['count'], 0)
+        self.assertIsNone(snapshot['mean'])
+        self.assertIsNone(snapshot['p50'])
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for i in range(1, 1001):
+            histogram.add(i / 1000.0)
+
+        self.assertEquals(histogram.count, 1000)
+        self.assertEquals(histogram.max, 1.0)
+        self.assertAlmostEqual(histogram.percentile(50), 0.5, delta=0.5 * 0.05)
+        self.assertAlmostEqual(histogram.percentile(99), 0.99, delta=0.99 * 0.05)
+        self.assertEquals(histogram.percentile(100), 1.0)
+
+    def test_tiny_values(self):
+        histogram = Histogram()
+        histogram.add(0.0)
+        self.assertLessEqual(histogram.percentile(50), histogram.minimum * histogram.growth)
+
+
+class FailingObserver(RequestObserver):
+    def on_request(self, metrics):
+        raise RuntimeError("observer bug")
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+        self.registry = MetricsRegistry()
+
+    def test_request_metrics(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, True, observers=[self.registry])
+        events = [{'x_object': {'x_device_id': 'device_{}'.format(i)}, 'x_event_type': 'metrics'} for i in range(100)]
+
+        EventsService(api).send(events)
+        EventsService(api).send(events)
+
+        snapshot = self.registry.snapshot()['events']
+        self.assertEquals(snapshot['requests'], 2)
+        self.assertEquals(snapshot['attempts'], 2)
+        self.assertEquals(snapshot['statuses'], {200: 2})
+        self.assertEquals(snapshot['latency']['count'], 2)
+        self.assertGreater(snapshot['raw_bytes'], snapshot['sent_bytes'])
+        self.assertGreater(snapshot['response_bytes'], 0)
+        self.assertGreater(snapshot['network_seconds'], 0)
+        self.assertGreater(snapshot['parse_seconds'], 0)
+        self.assertGreaterEqual(snapshot['latency']['max'], snapshot['latency']['p50'])
+
+    def test_route_templates(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, observers=[self.registry])
+        objects = ObjectsService(api)
+
+        objects.create({"x_device_id": "vin1234", "x_object_type": "car"})
+        objects.create({"x_device_id": "vin5678", "x_object_type": "car"})
+        objects.update("vin1234", {"x_object_type": "truck"})
+        objects.update("vin5678", {"x_object_type": "truck"})
+
+        snapshot = self.registry.snapshot()
+        self.assertEquals(snapshot['objects']['requests'], 2)
+        self.assertEquals(snapshot['objects/{x_device_id}']['requests'], 2)
+        self.assertEquals(snapshot['objects']['raw_bytes'], snapshot['objects']['sent_bytes'])
+
+    def test_error_recorded(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, observers=[self.registry])
+
+        with self.assertRaises(ValueError):
+            ObjectsService(api).update("unknown", {"x_object_type": "car"})
+
+        snapshot = self.registry.snapshot()['objects/{x_device_id}']
+        self.assertEquals(snapshot['errors'], 1)
+        self.assertEquals(snapshot['statuses'], {400: 1})
+
+    def test_retries_counted(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, observers=[self.registry],
+                         retry_policy=RetryPolicy(backoff_base=0.01))
+        self.server.server.backend.transient_failures = [(503, {})]
+
+        api.get("api_manager")
+
+        snapshot = self.registry.snapshot()['api_manager']
+        self.assertEquals(snapshot['attempts'], 2)
+        self.assertEquals(snapshot['statuses'], {200: 1})
+
+    def test_streamed_body(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, CompressionPolicy(), stream_chunk_size=1024,
+                         observers=[self.registry])
+
+        api.post("compression_enabled", [{"value": i} for i in range(100)])
+
+        snapshot = self.registry.snapshot()['compression_enabled']
+        self.assertGreater(snapshot['raw_bytes'], snapshot['sent_bytes'])
+        self.assertGreater(snapshot['sent_bytes'], 0)
+
+    def test_failing_observer(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, observers=[FailingObserver()])
+        api.add_observer(self.registry)
+
+        r = api.get("api_manager")
+
+        self.assertEquals(r.status_code, 200)
+        self.assertEquals(self.registry.snapshot()['api_manager']['requests'], 1)
+
+    def test_reset(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, observers=[self.registry])
+        api.get("api_manager")
+
+        self.registry.reset()
+        self.assertEquals(self.registry.snapshot(), {})
@@ -182,6 +182,58 @@ class TestObjectsService(unittest.TestCase):
             self.assertEquals(created.result, 'success')
             self.assertEquals(created.id, asked['x_device_id'])
 
+    def test_create_update_summary(self):
+        objects = [
+            {"x_device_id": "device_1", "x_object_type": "printer"},
+            {"x_device_id": "device_2"},
+            {"x_device_id": "device_3", "x_object_type": "printer"},
+        ]
+        summary = self.objects.create_update(objects, summary=True)
+
+        self.assertEquals(summary.succeeded, 2)
+        self.assertEquals(summary.total, 3)
+        self.assertEquals([(index, result.id, result.message) for index, result in summary.failed],
+                          [(1, "device_2", "x_object_type cannot be null or empty.")])
+
+    def test_create_update_chunked(self):
+        objects = [{"x_device_id": "device_{}".format(i), "x_object_type": "printer"} for i in range(25)]
+        resp = self.objects.create_update(objects, max_batch_size=10, max_concurrency=3)
+
+        self.assertEquals([result.id for result in resp], [obj["x_device_id"] for obj in objects])
+        self.assertTrue(all(result.result == 'success' for result in resp))
+        self.assertEquals(sorted(self.server.server.backend.object_batches), [5, 10, 10])
+
+        self.server.server.backend.object_batches = []
+        self.objects.create_update(objects, max_batch_bytes=500)
+        self.assertGreater(len(self.server.server.backend.object_batches), 3)
+        self.assertEquals(sum(self.server.server.backend.object_batches), 25)
+
+    def test_create_update_single_chunk_without_pool(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False)
+        resp = ObjectsService(api).create_update([{"x_device_id": "device_1", "x_object_type": "printer"}])
+
+        self.assertEquals(resp[0].result, 'success')
+        # sent from the calling thread: the thread pool was not even started
+        self.assertIsNone(api._executor)
+        api.close()
+
+    def test_create_update_chunk_failure(self):
+        objects = [{"x_device_id": "device_{}".format(i), "x_object_type": "printer"} for i in range(6)]
+        self.server.server.backend.transient_failures = [(503, {})]
+        summary = self.objects.create_update(objects, summary=True, max_batch_size=2, max_concurrency=1)
+
+        # the first chunk failed, the other ones were still sent
+        self.assertEquals(summary.succeeded, 4)
+        self.assertEquals([(index, result.id, result.result) for index, result in summary.failed],
+                          [(0, "device_0", "failure"), (1, "device_1", "failure")])
+        self.assertIn("503", summary.failed[0][1].message)
+        self.assertEquals(sorted(self.server.server.backend.objects), ["device_{}".format(i) for i in range(2, 6)])
+
+    def test_create_update_programming_error(self):
+        objects = [{"x_device_id": "device_1", "x_object_type": "printer", "not_serializable": object()}]
+        with self.assertRaises(TypeError):
+            self.objects.create_update(objects)
+
     def test_create_update_no_id(self):
         """x_device_id is required whether we're performing a creation or an updated, therefore it can be validated
         a priori and raises a ValueError
@@ -239,6 +291,24 @@ class TestObjectsService(unittest.TestCase):
             "non_existing": False
         })
 
+    def test_exist_chunked(self):
+        self.objects.create_update([{"x_device_id": "existing_{}".format(i), "x_object_type": "printer"}
+                                    for i in range(0, 10, 2)])
+        device_ids = ["existing_{}".format(i) for i in range(10)]
+
+        resp = self.objects.iter_objects_exist(iter(device_ids), max_batch_size=3)
+        self.assertEquals(list(resp), [(device_id, i % 2 == 0) for i, device_id in enumerate(device_ids)])
+        self.assertEquals(sorted(self.server.server.backend.exists_batches), [1, 3, 3, 3])
+
+        self.assertEquals(self.objects.missing_objects(device_ids, max_batch_size=3),
+                          set(["existing_1", "existing_3", "existing_5", "existing_7", "existing_9"]))
+        bitmap = self.objects.objects_exist_bitmap(device_ids, max_batch_size=3)
+        self.assertEquals(list(bitmap), [i % 2 == 0 for i in range(10)])
+
+        with self.assertRaises(ValueError) as ctx:
+            list(self.objects.iter_objects_exist(["existing_1", ""]))
+        self.assertEquals(ctx.exception.message, "deviceId cannot be null or empty.")
+
     def test_exist_batch_device_id_null(self):
         with self.assertRaises(ValueError) as ctx:
             self.objects.objects_exist(None)
@@ -2,6 +2,7 @@ import unittest
 
 from smartobjects.api_manager import APIManager
 from smartobjects.ingestion.owners import OwnersService
+from smartobjects.ingestion.resend import Resender, ResendPolicy
 
 from tests.mocks.local_api_server import LocalApiServer
 
@@ -231,6 +232,64 @@ class TestOwnersService(unittest.TestCase):
         self.assertEquals(resp[0].id, 'my_device')
         self.assertEquals(resp[0].message, "Object with x_device_id 'my_device' is not claimed by 'owner_1'.")
 
+    def test_batch_claim_chunked(self):
+        self.owners.create({'username': 'owner_1'})
+        for i in range(25):
+            self.server.server.backend.objects['device_{}'.format(i)] = {'x_device_id': 'device_{}'.format(i)}
+
+        claims = (('owner_1', 'device_{}'.format(i)) for i in range(25))
+        resp = self.owners.batch_claim(claims, max_batch_size=10, max_concurrency=3)
+
+        self.assertEquals([result.id for result in resp], ['device_{}'.format(i) for i in range(25)])
+        self.assertTrue(all(result.result == 'success' for result in resp))
+        self.assertEquals(sorted(self.server.server.backend.claim_batches), [5, 10, 10])
+
+        unclaims = [('owner_1', 'device_{}'.format(i)) for i in range(25)] + [('owner_1', 'unknown')]
+        summary = self.owners.batch_unclaim(unclaims, summary=True, max_batch_size=10)
+        self.assertEquals(summary.succeeded, 25)
+        self.assertEquals([(index, result.id) for index, result in summary.failed], [(25, 'unknown')])
+
+    def test_batch_claim_invalid(self):
+        self.owners.create({'username': 'owner_1'})
+        for i in range(15):
+            self.server.server.backend.objects['device_{}'.format(i)] = {'x_device_id': 'device_{}'.format(i)}
+        claims = [('owner_1', 'device_{}'.format(i)) for i in range(15)] + [{'username': 'owner_1'}]
+
+        # a list is validated before anything is sent
+        with self.assertRaises(ValueError) as ctx:
+            self.owners.batch_claim(claims, max_batch_size=5)
+        self.assertEquals(ctx.exception.message, "x_device_id cannot be null or empty.")
+        self.assertEquals(self.server.server.backend.claim_batches, [])
+
+        # an invalid claim of an iterator is not sent, the others are
+        resp = self.owners.batch_claim(iter(claims[:2] + claims[-1:] + claims[2:15]), max_batch_size=5)
+        self.assertEquals([result.result for result in resp], ['success'] * 2 + ['error'] + ['success'] * 13)
+        self.assertEquals((resp[2].id, resp[2].message), (None, "x_device_id cannot be null or empty."))
+        self.assertEquals(sorted(self.server.server.backend.claim_batches), [1, 4, 5, 5])
+
+    def test_batch_claim_chunk_failure_resent(self):
+        self.owners.create({'username': 'owner_1'})
+        for i in range(4):
+            self.server.server.backend.objects['device_{}'.format(i)] = {'x_device_id': 'device_{}'.format(i)}
+        self.server.server.backend.transient_failures = [(503, {})]
+
+        claims = [('owner_1', 'device_{}'.format(i)) for i in range(4)]
+        resp = self.owners.batch_claim(claims, max_batch_size=2, max_concurrency=1)
+        self.assertEquals([result.result for result in resp], ['failure', 'failure', 'success', 'success'])
+
+        # only the claims of the failed chunk are sent again
+        self.server.server.backend.claim_batches = []
+        self.server.server.backend.transient_failures = [(503, {})]
+        resender = Resender(lambda items: self.owners.batch_claim(items, max_batch_size=2),
+                            ResendPolicy(backoff_base=0))
+        report = resender.send(claims[:2])
+
+        self.assertTrue(report.all_delivered)
+        self.assertEquals(report.attempts, 2)
+        self.assertEquals(self.server.server.backend.claim_batches, [2])
+        self.assertEquals([self.server.server.backend.objects['device_{}'.format(i)]['x_owner'] for i in range(4)],
+                          ['owner_1'] * 4)
+
     def test_delete_ok(self):
         self.owners.create({'username': 'owner_1'})
         self.owners.delete('owner_1')
@@ -339,6 +398,23 @@ class TestOwnersService(unittest.TestCase):
             "non_existing": False
         })
 
+    def test_create_update_chunked(self):
+        owners = [{'username': 'owner_{}'.format(i)} for i in range(7)]
+        owners[4]['invalid_property'] = 1
+        resp = self.owners.create_update(owners, max_batch_size=3)
+
+        self.assertEquals([result.id for result in resp], [owner['username'] for owner in owners])
+        self.assertEquals([result.result for result in resp], ['success'] * 4 + ['error'] + ['success'] * 2)
+        self.assertEquals(sorted(self.server.server.backend.owner_batches), [1, 3, 3])
+
+    def test_missing_owners(self):
+        self.owners.create({'username': 'owner_1'})
+        usernames = ['owner_1', 'owner_2', 'owner_3']
+
+        self.assertEquals(self.owners.missing_owners(iter(usernames), max_batch_size=2), set(['owner_2', 'owner_3']))
+        self.assertEquals(list(self.owners.owners_exist_bitmap(usernames, max_batch_size=2)), [True, False, False])
+        self.assertEquals(sorted(self.server.server.backend.exists_batches), [1, 1, 2, 2])
+
     def test_owners_exist_list_null(self):
         with self.assertRaises(ValueError) as ctx:
             self.owners.owners_exist(None)
@@ -0,0 +1,212 @@
+import unittest
+import Queue
+import threading
+import time
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.events import EventsService
+from smartobjects.ingestion.producer import BatchingEventSender, _close_open_senders
+
+from tests.mocks.deliveries import Deliveries
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestBatchingEventSender(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer(threaded=True)
+        cls.server.start()
+
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False)
+        cls.events = EventsService(cls.api)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.close()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+        self.deliveries = Deliveries()
+
+    def make_event(self, device_id='device'):
+        return {'event_id': str(uuid.uuid4()), 'x_object': {'x_device_id': device_id}, 'x_event_type': 'producer'}
+
+    def test_flush_on_count(self):
+        sender = BatchingEventSender(self.events, max_batch_size=10, linger=60, on_delivery=self.deliveries)
+        for _ in range(25):
+            sender.send(self.make_event())
+
+        time.sleep(0.2)
+        self.assertEquals(self.server.server.backend.event_batches, [10, 10])
+
+        self.assertTrue(sender.flush())
+        self.assertEquals(self.server.server.backend.event_batches, [10, 10, 5])
+        self.assertEquals(len(self.deliveries.deliveries), 25)
+        sender.close()
+
+    def test_flush_on_linger(self):
+        sender = BatchingEventSender(self.events, linger=0.1, on_delivery=self.deliveries)
+        for _ in range(3):
+            sender.send(self.make_event())
+
+        time.sleep(0.5)
+        self.assertEquals(self.server.server.backend.event_batches, [3])
+        self.assertEquals(len(self.deliveries.deliveries), 3)
+        sender.close()
+
+    def test_flush_on_bytes(self):
+        sender = BatchingEventSender(self.events, max_batch_bytes=1000, linger=60)
+        for _ in range(50):
+            sender.send(self.make_event())
+        sender.close()
+
+        batches = self.server.server.backend.event_batches
+        self.assertGreater(len(batches), 3)
+        self.assertEquals(sum(batches), 50)
+
+    def test_delivery_results(self):
+        self.server.server.backend.objects['known'] = {'x_device_id': 'known'}
+        known, unknown = self.make_event('known'), self.make_event('unknown')
+
+        with BatchingEventSender(self.events, must_exist=True, on_delivery=self.deliveries) as sender:
+            sender.send(known)
+            sender.send(unknown)
+
+        results = {event['event_id']: result for event, result, error in self.deliveries.deliveries}
+        self.assertEquals(results[known['event_id']].result, "success")
+        self.assertEquals(results[known['event_id']].id, uuid.UUID(known['event_id']))
+        self.assertEquals(results[unknown['event_id']].result, "error")
+        self.assertEquals(sender.stats()['sent'], 1)
+        self.assertEquals(sender.stats()['failed'], 1)
+
+    def test_per_event_callback(self):
+        other = Deliveries()
+        with BatchingEventSender(self.events, on_delivery=self.deliveries) as sender:
+            sender.send(self.make_event())
+            sender.send(self.make_event(), callback=other)
+
+        self.assertEquals(len(self.deliveries.deliveries), 1)
+        self.assertEquals(len(other.deliveries), 1)
+
+    def test_request_failure(self):
+        self.server.server.backend.transient_failures = [(500, {})]
+
+        with BatchingEventSender(self.events, on_delivery=self.deliveries) as sender:
+            sender.send(self.make_event())
+
+        event, result, error = self.deliveries.deliveries[0]
+        self.assertIsNone(result)
+        self.assertIsNotNone(error)
+        self.assertEquals(sender.stats()['failed'], 1)
+
+    def test_duplicated_event_id(self):
+        events = [self.make_event() for _ in range(3)]
+        with BatchingEventSender(self.events, linger=60, on_delivery=self.deliveries) as sender:
+            for event in events + [events[1]]:
+                sender.send(event)
+
+        self.assertEquals(len(self.server.server.backend.events), 3)
+        self.assertEquals((sender.stats()['sent'], sender.stats()['failed']), (3, 1))
+        errors = [error.message for _, _, error in self.deliveries.deliveries if error is not None]
+        self.assertEquals(errors, ["The event_id [{}] is duplicated in the batch".format(events[1]['event_id'])])
+
+    def test_duplicated_uuid_event_id(self):
+        event_id = uuid.uuid4()
+        events = [self.make_event(), dict(self.make_event(), event_id=event_id),
+                  dict(self.make_event(), event_id=str(event_id))]
+        with BatchingEventSender(self.events, linger=60, on_delivery=self.deliveries) as sender:
+            for event in events:
+                sender.send(event)
+
+        self.assertEquals(len(self.server.server.backend.events), 2)
+        self.assertEquals((sender.stats()['sent'], sender.stats()['failed']), (2, 1))
+        failed = [event for event, _, error in self.deliveries.deliveries if error is not None]
+        self.assertEquals(failed, [events[2]])
+
+    def test_exit_timeout(self):
+        release = threading.Event()
+        sender = BatchingEventSender(self.events, max_batch_size=1, linger=0, workers=1, exit_timeout=0.2)
+        # the only worker is kept busy by the callback of the first event
+        sender.send(self.make_event(), callback=lambda event, result, error: release.wait(5))
+        sender.send(self.make_event(), callback=self.deliveries)
+        sender.send(self.make_event(), callback=self.deliveries)
+
+        start = time.time()
+        _close_open_senders()
+        self.assertLess(time.time() - start, 1)
+        release.set()
+
+        self.assertEquals(sender.stats()['dropped'], 2)
+        self.assertEquals(len(self.deliveries.deliveries), 2)
+        self.assertTrue(all(result is None and isinstance(error, ValueError)
+                            for _, result, error in self.deliveries.deliveries))
+
+    def test_failing_callback(self):
+        def failing(event, result, error):
+            raise RuntimeError("callback bug")
+
+        with BatchingEventSender(self.events, max_batch_size=1, on_delivery=failing) as sender:
+            sender.send(self.make_event())
+            sender.send(self.make_event())
+        self.assertEquals(sender.stats()['sent'], 2)
+
+    def test_backpressure_raise(self):
+        sender = BatchingEventSender(self.events, max_batch_size=100, linger=60, max_queue_size=5, backpressure='raise')
+        for _ in range(5):
+            sender.send(self.make_event())
+
+        with self.assertRaises(Queue.Full):
+            sender.send(self.make_event())
+        sender.close()
+        self.assertEquals(len(self.server.server.backend.events), 5)
+
+    def test_backpressure_drop_oldest(self):
+        sender = BatchingEventSender(self.events, max_batch_size=100, linger=60, max_queue_size=5,
+                                     backpressure='drop_oldest', on_delivery=self.deliveries)
+        events = [self.make_event() for _ in range(6)]
+        for event in events:
+            sender.send(event)
+        sender.close()
+
+        dropped = [(event, error) for event, result, error in self.deliveries.deliveries if isinstance(error, Queue.Full)]
+        self.assertEquals(dropped[0][0], events[0])
+        self.assertEquals(sender.stats()['dropped'], 1)
+        self.assertEquals(self.server.server.backend.event_batches, [5])
+
+    def test_backpressure_block_timeout(self):
+        sender = BatchingEventSender(self.events, max_batch_size=100, linger=60, max_queue_size=5)
+        for _ in range(5):
+            sender.send(self.make_event())
+
+        start = time.time()
+        with self.assertRaises(Queue.Full):
+            sender.send(self.make_event(), timeout=0.1)
+        self.assertGreaterEqual(time.time() - start, 0.1)
+        sender.close()
+
+    def test_backpressure_block(self):
+        with BatchingEventSender(self.events, max_batch_size=5, linger=60, max_queue_size=5) as sender:
+            for _ in range(50):
+                sender.send(self.make_event())
+        self.assertEquals(len(self.server.server.backend.events), 50)
+
+    def test_send_after_close(self):
+        sender = BatchingEventSender(self.events)
+        sender.close()
+
+        with self.assertRaises(ValueError) as ctx:
+            sender.send(self.make_event())
+        self.assertEquals(ctx.exception.message, "The sender is closed.")
+
+    def test_invalid_event(self):
+        with BatchingEventSender(self.events) as sender:
+            with self.assertRaises(ValueError) as ctx:
+                sender.send({'x_event_type': 'invalid event'})
+        self.assertEquals(ctx.exception.message, "x_object.x_device_id cannot be null or empty.")
+
+    def test_invalid_backpressure(self):
+        with self.assertRaises(ValueError) as ctx:
+            BatchingEventSender(self.events, backpressure='wait')
+        self.assertEquals(ctx.exception.message, "Invalid 'backpressure' argument, must be one of: block, drop_oldest, raise")
@@ -0,0 +1,118 @@
+import unittest
+
+import requests
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion import Result
+from smartobjects.ingestion.owners import OwnersService
+from smartobjects.ingestion.resend import Resender, ResendPolicy
+from smartobjects.retry import RetryPolicy
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class ScriptedSend(object):
+    """ Answers each item with the next result scripted for it, records the items of each call """
+    def __init__(self, script, errors=None):
+        self.script = dict((item, list(results)) for item, results in script.items())
+        self.errors = list(errors or [])
+        self.calls = []
+
+    def __call__(self, items):
+        self.calls.append(list(items))
+        if self.errors:
+            raise self.errors.pop(0)
+        return [Result(id=item, result=self.script[item].pop(0)) for item in items]
+
+
+class TestResender(unittest.TestCase):
+    def setUp(self):
+        self.policy = ResendPolicy(backoff_base=0)
+
+    def test_only_retryable_items_sent_again(self):
+        send = ScriptedSend({
+            'a': ['success'],
+            'b': ['failure', 'success'],
+            'c': ['conflict'],
+            'd': ['notfound'],
+            'e': ['failure', 'failure', 'conflict'],
+        })
+        report = Resender(send, self.policy).send(['a', 'b', 'c', 'd', 'e'])
+
+        self.assertEquals(send.calls, [['a', 'b', 'c', 'd', 'e'], ['b', 'e'], ['e']])
+        self.assertEquals(report.attempts, 3)
+        self.assertEquals([(index, item, result.result) for index, item, result, _ in report.delivered],
+                          [(0, 'a', 'success'), (1, 'b', 'success'), (2, 'c', 'conflict'), (4, 'e', 'conflict')])
+        self.assertEquals([(index, item, result.result) for index, item, result, _ in report.failed],
+                          [(3, 'd', 'notfound')])
+        self.assertEquals(report.failed_items(), ['d'])
+        self.assertFalse(report.all_delivered)
+
+    def test_max_attempts(self):
+        send = ScriptedSend({'a': ['failure'] * 5, 'b': ['success']})
+        report = Resender(send, ResendPolicy(max_attempts=2, backoff_base=0)).send(['a', 'b'])
+
+        self.assertEquals(send.calls, [['a', 'b'], ['a']])
+        self.assertEquals([(index, result.result) for index, _, result, _ in report.failed], [(0, 'failure')])
+
+    def test_custom_policy(self):
+        send = ScriptedSend({'a': ['notfound', 'success'], 'b': ['conflict']})
+        policy = ResendPolicy(retryable=('failure', 'notfound'), delivered=('success',), backoff_base=0)
+        report = Resender(send, policy).send(['a', 'b'])
+
+        self.assertEquals([item for _, item, _, _ in report.delivered], ['a'])
+        self.assertEquals(report.failed_items(), ['b'])
+
+    def test_request_errors(self):
+        reset = requests.exceptions.ConnectionError("reset")
+        send = ScriptedSend({'a': ['success']}, errors=[reset])
+        report = Resender(send, self.policy).send(['a'])
+        self.assertEquals(len(send.calls), 2)
+        self.assertTrue(report.all_delivered)
+
+        send = ScriptedSend({'a': ['success']}, errors=[reset])
+        report = Resender(send, ResendPolicy(retry_errors=False)).send(['a'])
+        self.assertEquals(report.failed, [(0, 'a', None, reset)])
+
+        send = ScriptedSend({}, errors=[ValueError("refused")])
+        with self.assertRaises(ValueError):
+            Resender(send, self.policy).send(['a'])
+        self.assertEquals(len(send.calls), 1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError) as ctx:
+            ResendPolicy(max_attempts=0)
+        self.assertEquals(ctx.exception.message, "max_attempts must be greater than 0.")
+
+        with self.assertRaises(ValueError) as ctx:
+            Resender(lambda items: [], self.policy).send(['a'])
+        self.assertEquals(ctx.exception.message, "Expected 1 results, got 0")
+
+
+class TestResenderOwners(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer()
+        cls.server.start()
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False,
+                             retry_policy=RetryPolicy(statuses={}, connection_errors=0))
+        cls.owners = OwnersService(cls.api)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.close()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+
+    def test_create_update(self):
+        self.server.server.backend.transient_failures = [(503, {})]
+        owners = [{'username': 'alice'}, {'username': 'bob', 'invalid_property': 1}, {'username': 'carol'}]
+        report = Resender(self.owners.create_update, ResendPolicy(backoff_base=0)).send(owners)
+
+        self.assertEquals(report.attempts, 2)
+        self.assertEquals([(index, result.id) for index, _, result, _ in report.delivered], [(0, 'alice'), (2, 'carol')])
+        self.assertEquals([(index, result.message) for index, _, result, _ in report.failed],
+                          [(1, "Unknown field 'invalid_property'")])
+        self.assertEquals(sorted(self.server.server.backend.owners), ['alice', 'carol'])
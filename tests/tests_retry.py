@@ -0,0 +1,173 @@
+import unittest
+import email.utils
+import time
+
+import requests
+from requests.packages.urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.events import EventsService
+from smartobjects.retry import RetryPolicy, RetryBudget, Retrier
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_per_status_rules(self):
+        policy = RetryPolicy(statuses={429: 4, 503: 2})
+        self.assertEquals(policy.max_retries('GET', None, status=429), 4)
+        self.assertEquals(policy.max_retries('GET', None, status=503), 2)
+        self.assertEquals(policy.max_retries('GET', None, status=502), 0)
+        self.assertEquals(policy.max_retries('GET', None, status=500), 0)
+
+    def test_idempotency(self):
+        policy = RetryPolicy()
+        self.assertEquals(policy.max_retries('POST', None, status=502), 0)
+        self.assertEquals(policy.max_retries('POST', None, status=429), 5)
+        self.assertEquals(policy.max_retries('POST', True, status=502), 3)
+        self.assertEquals(policy.max_retries('PUT', None, status=502), 3)
+
+        reset = requests.exceptions.ConnectionError()
+        self.assertEquals(policy.max_retries('POST', None, error=reset), 0)
+        self.assertEquals(policy.max_retries('DELETE', None, error=reset), 3)
+        self.assertEquals(policy.max_retries('POST', None, error=requests.exceptions.ConnectTimeout()), 3)
+        refused = requests.exceptions.ConnectionError(
+            MaxRetryError(None, '/api/v3/events', NewConnectionError(None, "Connection refused")))
+        self.assertEquals(policy.max_retries('POST', None, error=refused), 3)
+
+    def test_full_jitter_backoff(self):
+        policy = RetryPolicy(backoff_base=1, backoff_max=5)
+        for attempt in range(10):
+            delay = policy.backoff(attempt)
+            self.assertTrue(0 <= delay <= min(5, 2 ** attempt))
+
+    def test_parse_retry_after(self):
+        self.assertEquals(RetryPolicy.parse_retry_after("120"), 120)
+        self.assertIsNone(RetryPolicy.parse_retry_after(None))
+        self.assertIsNone(RetryPolicy.parse_retry_after("soon"))
+
+        in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(RetryPolicy.parse_retry_after(in_a_minute), 60, delta=2)
+        past = email.utils.formatdate(time.time() - 60, usegmt=True)
+        self.assertEquals(RetryPolicy.parse_retry_after(past), 0)
+
+    def test_negative_backoff(self):
+        with self.assertRaises(ValueError) as ctx:
+            RetryPolicy(backoff_base=-1)
+        self.assertEquals(ctx.exception.message, "Backoff delays cannot be negative.")
+
+
+class TestRetryBudget(unittest.TestCase):
+    def test_budget_exhausted(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0)
+
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    def test_retrier_counters(self):
+        class Response(object):
+            def __init__(self, status, headers=None):
+                self.status_code = status
+                self.headers = headers or {}
+
+        retrier = Retrier(RetryPolicy(statuses={503: 1}, budget_min_per_second=0, budget_ratio=0))
+        self.assertIsNotNone(retrier.next_delay('GET', 0, response=Response(503)))
+        self.assertIsNone(retrier.next_delay('GET', 1, response=Response(503)))
+        self.assertIsNone(retrier.next_delay('GET', 0, response=Response(503)))
+        self.assertIsNone(retrier.next_delay('GET', 0, response=Response(404)))
+
+        self.assertEquals(retrier.stats(), {'retries': 1, 'give_ups': 2, 'budget_exhausted': 1})
+
+    def test_retry_after_too_long(self):
+        class Response(object):
+            status_code = 429
+            headers = {'Retry-After': '3600'}
+
+        retrier = Retrier(RetryPolicy())
+        self.assertIsNone(retrier.next_delay('POST', 0, response=Response()))
+        self.assertEquals(retrier.stats()['give_ups'], 1)
+
+
+class TestApiManagerRetries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer()
+        cls.server.start()
+        cls.policy = RetryPolicy(backoff_base=0.01)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+        self.api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, retry_policy=self.policy)
+
+    def test_retry_transient_statuses(self):
+        self.server.server.backend.transient_failures = [(503, {}), (502, {}), (504, {})]
+
+        r = self.api.get("api_manager")
+
+        self.assertEquals(r.status_code, 200)
+        self.assertEquals(self.api.retry_stats()['retries'], 3)
+
+    def test_retry_after_header(self):
+        self.server.server.backend.transient_failures = [(429, {'Retry-After': '1'})]
+
+        start = time.time()
+        self.api.post("api_manager", {})
+        self.assertGreaterEqual(time.time() - start, 1)
+
+    def test_post_not_retried_on_gateway_error(self):
+        self.server.server.backend.transient_failures = [(502, {})]
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.api.post("api_manager", {})
+        self.assertEquals(self.api.retry_stats()['retries'], 0)
+
+    def test_idempotent_post_retried(self):
+        self.server.server.backend.transient_failures = [(502, {})]
+
+        r = self.api.post("api_manager", {}, idempotent=True)
+        self.assertEquals(r.status_code, 200)
+
+    def test_events_with_ids_retried(self):
+        events = EventsService(self.api)
+        self.server.server.backend.transient_failures = [(502, {})]
+        results = events.send([{'event_id': '3f1c3c42-4b8d-4bd1-92b4-7e4b7a2b4f11', 'x_event_type': 'retry',
+                                'x_object': {'x_device_id': 'device'}}])
+        self.assertEquals(results[0].result, 'success')
+        self.assertEquals(self.api.retry_stats()['retries'], 1)
+
+        # without an id, the platform could ingest an event twice
+        self.server.server.backend.transient_failures = [(502, {})]
+        with self.assertRaises(requests.exceptions.HTTPError):
+            events.send([{'x_event_type': 'retry', 'x_object': {'x_device_id': 'device'}}])
+        self.assertEquals(self.api.retry_stats()['retries'], 1)
+
+    def test_retry_connection_reset(self):
+        self.server.server.backend.transient_failures = [(0, {})]
+
+        r = self.api.get("api_manager")
+        self.assertEquals(r.status_code, 200)
+        self.assertEquals(self.api.retry_stats()['retries'], 1)
+
+    def test_give_up(self):
+        self.server.server.backend.transient_failures = [(504, {})] * 4
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.api.get("api_manager")
+        self.assertEquals(self.api.retry_stats(), {'retries': 3, 'give_ups': 1, 'budget_exhausted': 0})
+
+    def test_no_retry_by_default(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False)
+        self.server.server.backend.transient_failures = [(503, {})]
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            api.get("api_manager")
+        self.assertIsNone(api.retry_stats())
@@ -0,0 +1,220 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from smartobjects.api_manager import APIManager
+from smartobjects.ingestion.dedup import LruEventIdIndex
+from smartobjects.ingestion.events import EventsService
+from smartobjects.ingestion.spool import EventSpool
+from smartobjects.retry import RetryPolicy
+
+from tests.mocks.deliveries import Deliveries
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class TestEventSpool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer(threaded=True)
+        cls.server.start()
+
+        # failures are retried by the spool, not by the API manager
+        cls.api = APIManager("CLIENT_ID", "CLIENT_SECRET", cls.server.path, False,
+                             retry_policy=RetryPolicy(statuses={}, connection_errors=0))
+        cls.events = EventsService(cls.api)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.close()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+        self.deliveries = Deliveries()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_event(self, device_id='device', **kwargs):
+        event = {'x_object': {'x_device_id': device_id}, 'x_event_type': 'spool'}
+        event.update(kwargs)
+        return event
+
+    def segment_files(self):
+        return sorted(name for name in os.listdir(self.directory) if name.startswith('segment-'))
+
+    def test_append_and_deliver(self):
+        spool = EventSpool(self.events, self.directory, max_batch_size=10, on_delivery=self.deliveries)
+        event = self.make_event()
+        spool.append(event)
+        spool.append_many([self.make_event(index=i) for i in range(24)])
+
+        self.assertTrue(spool.flush(timeout=5))
+        spool.close()
+
+        self.assertEquals(len(self.server.server.backend.events), 25)
+        self.assertEquals(len(self.deliveries.deliveries), 25)
+        self.assertTrue(all(result.result == 'success' and error is None
+                            for _, result, error in self.deliveries.deliveries))
+        # an id is given to the events, the caller's dict is not modified
+        self.assertNotIn('event_id', event)
+        self.assertEquals(set(str(result.id) for _, result, _ in self.deliveries.deliveries),
+                          set(event['event_id'] for event, _, _ in self.deliveries.deliveries))
+
+        stats = spool.stats()
+        self.assertEquals(stats['appended'], 25)
+        self.assertEquals(stats['delivered'], 25)
+        self.assertEquals(stats['rejected'], 0)
+        self.assertEquals(stats['pending_bytes'], 0)
+
+    def test_retry_during_outage(self):
+        self.server.server.backend.transient_failures = [(500, {})] * 3
+        spool = EventSpool(self.events, self.directory, retry_backoff=0.01)
+        spool.append_many([self.make_event() for _ in range(5)])
+
+        self.assertTrue(spool.flush(timeout=5))
+        spool.close()
+
+        self.assertEquals(len(self.server.server.backend.events), 5)
+        self.assertEquals(spool.stats()['retries'], 3)
+        self.assertEquals(spool.stats()['delivered'], 5)
+
+    def test_chunks_acknowledged_separately(self):
+        # one of the 3 chunks of the window is refused, another one fails once
+        self.server.server.backend.transient_failures = [(400, {}), (503, {})]
+        spool = EventSpool(self.events, self.directory, max_batch_size=10, max_concurrency=3, retry_backoff=0.01,
+                           on_delivery=self.deliveries)
+        spool.append_many([self.make_event(index=i) for i in range(30)])
+
+        self.assertTrue(spool.flush(timeout=5))
+        spool.close()
+
+        stats = spool.stats()
+        self.assertEquals((stats['delivered'], stats['rejected'], stats['retries']), (20, 10, 1))
+        self.assertEquals(len(self.server.server.backend.events), 20)
+        self.assertEquals(sorted(error is None for _, _, error in self.deliveries.deliveries), [False] * 10 + [True] * 20)
+
+    def test_conflict_delivered(self):
+        # already sent: the dedup index answers with a conflict
+        events = EventsService(self.api, dedup_index=LruEventIdIndex(100))
+        event = self.make_event(event_id=str(uuid.uuid4()))
+        events.send([event])
+        spool = EventSpool(events, self.directory, on_delivery=self.deliveries)
+        spool.append_many([event, self.make_event()])
+
+        self.assertTrue(spool.flush(timeout=5))
+        spool.close()
+
+        self.assertEquals((spool.stats()['delivered'], spool.stats()['rejected']), (2, 0))
+        self.assertEquals(sorted(result.result for _, result, _ in self.deliveries.deliveries), ['conflict', 'success'])
+
+    def test_outage_does_not_hold_the_api_pool(self):
+        self.server.server.backend.transient_failures = [(503, {})] * 1000
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False, pool_maxsize=2,
+                         retry_policy=RetryPolicy(statuses={}, connection_errors=0))
+        spool = EventSpool(EventsService(api), self.directory, max_batch_size=1, retry_backoff=1)
+        spool.append_many([self.make_event() for _ in range(4)])
+        time.sleep(0.2)
+        self.assertGreater(spool.stats()['retries'], 0)
+
+        # the other calls of the client still get a thread of the pool
+        self.assertEquals(api.executor.submit(lambda: 'done').result(timeout=0.5), 'done')
+        spool.close()
+        api.close()
+
+    def test_resume_after_restart(self):
+        self.server.server.backend.transient_failures = [(500, {})] * 1000
+        spool = EventSpool(self.events, self.directory, retry_backoff=0.01, fsync=EventSpool.ALWAYS)
+        spool.append_many([self.make_event(index=i) for i in range(10)])
+        self.assertFalse(spool.close(timeout=0.1))
+        self.assertEquals(len(self.server.server.backend.events), 0)
+
+        # a record torn by a crash in the middle of a write
+        with open(os.path.join(self.directory, self.segment_files()[-1]), 'ab') as f:
+            f.write('0badc0de {"x_object": {"x_dev')
+
+        self.server.server.backend.transient_failures = []
+        spool = EventSpool(self.events, self.directory, on_delivery=self.deliveries)
+        self.assertGreater(spool.stats()['pending_bytes'], 0)
+        self.assertTrue(spool.flush(timeout=5))
+        spool.append(self.make_event(index=10))
+        self.assertTrue(spool.flush(timeout=5))
+        spool.close()
+
+        self.assertEquals(sorted(event['index'] for event, _, _ in self.deliveries.deliveries), range(11))
+        self.assertEquals(len(self.server.server.backend.events), 11)
+
+    def test_segments_rotated_and_compacted(self):
+        spool = EventSpool(self.events, self.directory, segment_size=1000, max_batch_size=5)
+        for i in range(50):
+            spool.append(self.make_event(index=i))
+        self.assertGreater(len(self.segment_files()), 1)
+
+        self.assertTrue(spool.flush(timeout=5))
+        spool.close()
+
+        self.assertEquals(len(self.server.server.backend.events), 50)
+        self.assertEquals(len(self.segment_files()), 1)
+
+        # nothing is sent twice once acknowledged
+        spool = EventSpool(self.events, self.directory)
+        self.assertEquals(spool.stats()['pending_bytes'], 0)
+        spool.close()
+        self.assertEquals(sum(self.server.server.backend.event_batches), 50)
+
+    def test_rotated_segment_larger_than_a_window(self):
+        spool = EventSpool(self.events, self.directory, segment_size=2000, max_batch_size=2, max_concurrency=1)
+        for i in range(40):
+            spool.append(self.make_event(index=i))
+        self.assertGreater(len(self.segment_files()), 1)
+
+        self.assertTrue(spool.flush(timeout=5))
+        spool.close()
+
+        self.assertEquals(len(self.server.server.backend.events), 40)
+        self.assertEquals(spool.stats()['delivered'], 40)
+
+    def test_rejected_events(self):
+        self.server.server.backend.objects['known'] = {'x_device_id': 'known'}
+        event_id = str(uuid.uuid4())
+        spool = EventSpool(self.events, self.directory, must_exist=True, on_delivery=self.deliveries)
+        spool.append_many([self.make_event('known'), self.make_event('unknown'),
+                           self.make_event('known', event_id=event_id), self.make_event('known', event_id=event_id)])
+
+        self.assertTrue(spool.flush(timeout=5))
+        spool.close()
+
+        self.assertEquals(spool.stats()['delivered'], 2)
+        self.assertEquals(spool.stats()['rejected'], 2)
+        outcomes = sorted((event['x_object']['x_device_id'], result.result if result else None, error is not None)
+                          for event, result, error in self.deliveries.deliveries)
+        self.assertEquals(outcomes, [('known', None, True), ('known', 'success', False), ('known', 'success', False),
+                                     ('unknown', 'error', False)])
+
+    def test_directory_used_once(self):
+        spool = EventSpool(self.events, self.directory)
+        with self.assertRaises(ValueError) as ctx:
+            EventSpool(self.events, self.directory)
+        self.assertEquals(ctx.exception.message, "Spool directory {} is used by another spool.".format(self.directory))
+        spool.close()
+
+        EventSpool(self.events, self.directory).close()
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError) as ctx:
+            EventSpool(self.events, self.directory, fsync='sometimes')
+        self.assertEquals(ctx.exception.message, "Invalid 'fsync' argument, must be one of: always, interval, never")
+
+        spool = EventSpool(self.events, self.directory)
+        with self.assertRaises(ValueError) as ctx:
+            spool.append({'x_event_type': 'spool'})
+        self.assertEquals(ctx.exception.message, "x_object.x_device_id cannot be null or empty.")
+        spool.close()
+
+        with self.assertRaises(ValueError) as ctx:
+            spool.append(self.make_event())
+        self.assertEquals(ctx.exception.message, "The spool is closed.")
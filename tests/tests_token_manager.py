@@ -0,0 +1,138 @@
+import unittest
+import datetime
+import threading
+import time
+
+from smartobjects.api_manager import APIManager
+from smartobjects.token_manager import TokenManager
+
+from tests.mocks.local_api_server import LocalApiServer
+
+
+class FakeFetch(object):
+    def __init__(self, expires_in=3600, delay=0):
+        self.calls = 0
+        self.expires_in = expires_in
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {
+            'access_token': 'token-{}'.format(self.calls),
+            'expires_in': datetime.timedelta(0, self.expires_in),
+            'requested_at': datetime.datetime.now()
+        }
+
+
+class TestTokenManager(unittest.TestCase):
+    def test_get_token_fetches_once(self):
+        fetch = FakeFetch()
+        manager = TokenManager(fetch, background_refresh=False)
+
+        self.assertEquals(manager.get_token()['access_token'], 'token-1')
+        self.assertEquals(manager.get_token()['access_token'], 'token-1')
+        self.assertEquals(fetch.calls, 1)
+
+    def test_single_flight_refresh(self):
+        fetch = FakeFetch(delay=0.1)
+        manager = TokenManager(fetch, background_refresh=False)
+
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(manager.get_token())) for _ in range(10)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+
+        self.assertEquals(fetch.calls, 1)
+        self.assertEquals(set(t['access_token'] for t in tokens), {'token-1'})
+
+    def test_invalidate_single_flight(self):
+        fetch = FakeFetch()
+        manager = TokenManager(fetch, background_refresh=False)
+        rejected = manager.get_token()
+
+        # every thread saw the same token rejected: a single new token is requested
+        new_tokens = [manager.invalidate(rejected) for _ in range(5)]
+
+        self.assertEquals(fetch.calls, 2)
+        self.assertEquals(set(t['access_token'] for t in new_tokens), {'token-2'})
+
+    def test_proactive_refresh_in_margin(self):
+        fetch = FakeFetch(expires_in=30)
+        manager = TokenManager(fetch, margin=60, background_refresh=False)
+
+        manager.get_token()
+        manager.get_token()
+        self.assertEquals(fetch.calls, 2)
+
+    def test_background_refresh(self):
+        fetch = FakeFetch(expires_in=0.2)
+        manager = TokenManager(fetch, margin=0.1, jitter=0, background_refresh=True)
+        manager.get_token()
+
+        time.sleep(0.35)
+        manager.stop()
+
+        self.assertGreaterEqual(fetch.calls, 2)
+        self.assertTrue(manager.is_valid(margin=0))
+
+    def test_stats(self):
+        manager = TokenManager(FakeFetch(delay=0.01), background_refresh=False)
+        self.assertEquals(manager.stats()['refresh_count'], 0)
+        self.assertIsNone(manager.stats()['average_latency'])
+
+        manager.get_token()
+        stats = manager.stats()
+        self.assertEquals(stats['refresh_count'], 1)
+        self.assertEquals(stats['failure_count'], 0)
+        self.assertGreaterEqual(stats['last_latency'], 0.01)
+
+    def test_failure_count(self):
+        def failing():
+            raise ValueError("unreachable")
+
+        manager = TokenManager(failing, background_refresh=False)
+        with self.assertRaises(ValueError):
+            manager.get_token()
+        self.assertEquals(manager.stats()['failure_count'], 1)
+
+    def test_negative_margin(self):
+        with self.assertRaises(ValueError) as ctx:
+            TokenManager(FakeFetch(), margin=-1)
+        self.assertEquals(ctx.exception.message, "Token refresh margin and jitter cannot be negative.")
+
+
+class TestApiManagerReauthentication(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer(threaded=True)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+
+    def test_reauthenticate_on_401(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False)
+        self.server.server.backend.revoked_tokens.add(api.access_token['access_token'])
+
+        r = api.get("api_manager")
+
+        self.assertEquals(r.status_code, 200)
+        self.assertEquals(self.server.server.backend.token_requests, 2)
+        api.close()
+
+    def test_single_reauthentication_across_threads(self):
+        api = APIManager("CLIENT_ID", "CLIENT_SECRET", self.server.path, False)
+        self.server.server.backend.revoked_tokens.add(api.access_token['access_token'])
+
+        threads = [threading.Thread(target=api.get, args=("api_manager",)) for _ in range(8)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+
+        self.assertEquals(self.server.server.backend.token_requests, 2)
+        self.assertEquals(api.token_manager.stats()['refresh_count'], 2)
+        api.close()
@@ -0,0 +1,137 @@
+import unittest
+import datetime
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+
+from smartobjects.api_manager import APIManager
+from smartobjects.token_manager import TokenManager
+from smartobjects.token_store import FileTokenStore
+
+from tests.mocks.local_api_server import LocalApiServer
+from tests.tests_token_manager import FakeFetch
+
+
+class TestFileTokenStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = FileTokenStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_load(self):
+        token = {
+            'access_token': 'token-1',
+            'expires_in': datetime.timedelta(0, 3600),
+            'requested_at': datetime.datetime(2017, 5, 1, 12, 30, 15, 250000)
+        }
+        self.store.save('CLIENT_ID@host', token)
+
+        self.assertEquals(self.store.load('CLIENT_ID@host'), token)
+        self.assertIsNone(self.store.load('OTHER_CLIENT_ID@host'))
+
+    def test_file_private(self):
+        self.store.save('CLIENT_ID@host', FakeFetch()())
+
+        files = os.listdir(self.directory)
+        self.assertEquals(len(files), 1)
+        self.assertNotIn('CLIENT_ID', files[0])
+        self.assertEquals(stat.S_IMODE(os.stat(os.path.join(self.directory, files[0])).st_mode), 0o600)
+
+    def test_corrupted_file(self):
+        self.store.save('CLIENT_ID@host', FakeFetch()())
+        with open(os.path.join(self.directory, os.listdir(self.directory)[0]), 'w') as f:
+            f.write('{"access_token": ')
+
+        self.assertIsNone(self.store.load('CLIENT_ID@host'))
+
+    def test_invalid_directory(self):
+        with self.assertRaises(ValueError) as ctx:
+            FileTokenStore(os.path.join(self.directory, 'missing'))
+        self.assertEquals(ctx.exception.message, "Token store directory {} does not exist.".format(
+            os.path.join(self.directory, 'missing')))
+
+
+class TestTokenManagerWithStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = FileTokenStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def manager(self, fetch, key='CLIENT_ID@host'):
+        return TokenManager(fetch, background_refresh=False, store=self.store, store_key=key)
+
+    def test_token_shared(self):
+        first, second = FakeFetch(), FakeFetch()
+
+        self.assertEquals(self.manager(first).get_token()['access_token'], 'token-1')
+        manager = self.manager(second)
+        self.assertEquals(manager.get_token()['access_token'], 'token-1')
+
+        self.assertEquals(second.calls, 0)
+        self.assertEquals(manager.stats()['shared_count'], 1)
+        self.assertEquals(manager.stats()['refresh_count'], 0)
+
+    def test_keys_isolated(self):
+        fetch = FakeFetch()
+        self.manager(fetch).get_token()
+        self.manager(fetch, 'OTHER_CLIENT_ID@host').get_token()
+        self.assertEquals(fetch.calls, 2)
+
+    def test_invalidated_token_replaced_once(self):
+        first, second = FakeFetch(), FakeFetch()
+        manager1, manager2 = self.manager(first), self.manager(second)
+        rejected1, rejected2 = manager1.get_token(), manager2.get_token()
+
+        # both processes see the token rejected: the second one reuses the token requested by the first one
+        new_token = manager1.invalidate(rejected1)
+        self.assertEquals(manager2.invalidate(rejected2)['access_token'], new_token['access_token'])
+        self.assertEquals(first.calls + second.calls, 2)
+
+    def test_token_in_margin_not_reused(self):
+        self.manager(FakeFetch(expires_in=30)).get_token()
+
+        fetch = FakeFetch()
+        manager = TokenManager(fetch, margin=60, background_refresh=False, store=self.store, store_key='CLIENT_ID@host')
+        manager.get_token()
+        self.assertEquals(fetch.calls, 1)
+
+
+def _create_api_manager(path, directory):
+    api = APIManager("CLIENT_ID", "CLIENT_SECRET", path, False, background_token_refresh=False,
+                     token_store=FileTokenStore(directory))
+    api.get("api_manager")
+
+
+class TestTokenShareAcrossProcesses(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalApiServer(threaded=True, latency=0.05)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.server.backend.clear()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_single_token_request(self):
+        processes = [
+            multiprocessing.Process(target=_create_api_manager, args=(self.server.path, self.directory))
+            for _ in range(8)
+        ]
+        [p.start() for p in processes]
+        [p.join() for p in processes]
+
+        self.assertTrue(all(p.exitcode == 0 for p in processes))
+        self.assertEquals(self.server.server.backend.token_requests, 1)